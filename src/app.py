@@ -1,4 +1,4 @@
-from copy import deepcopy
+import logging
 import pickle
 import mesa
 import solara
@@ -9,12 +9,21 @@ from mesa.visualization import (
     SolaraViz,
     Slider,
     make_space_component,
-    make_plot_component,
 )
 
 from model import GentrificationModel, CellAgent, ResidentAgent, DeveloperAgent, LandlordAgent
-import threading
-
+from convergence import run_steps
+from run_cache import RunCache, run_key
+from scenarios import SCENARIOS, unwrap_params
+from results_catalog import ResultsCatalog
+from plot_components import make_downsampled_plot_component
+
+# --- SETUP LOGGING ---
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s %(levelname)-8s %(message)s",
+    datefmt="%Y-%m-%d %H:%M:%S",
+)
 
 def agent_portrayal(agent):
     """Defines how each agent is drawn, mapping data to visual properties."""
@@ -87,75 +96,75 @@ def post_process_lines(ax):
     ax.set_xlabel("Step")
     ax.set_ylabel("Value")
 
-average_sell_price = make_plot_component(
+average_sell_price = make_downsampled_plot_component(
     {"AverageSellPrice": "red"},
     post_process=post_process_lines,
 )
 
-economic_plot = make_plot_component(
+economic_plot = make_downsampled_plot_component(
     {"AverageRent": "red"},
     post_process=post_process_lines,
 )
 
-population_plot = make_plot_component(
+population_plot = make_downsampled_plot_component(
     {"SettledResidents": "green", "DisplacedResidents": "cyan"},
     post_process=post_process_lines,
 )
 
-stability_plot = make_plot_component(
+stability_plot = make_downsampled_plot_component(
     {
         #"AverageTenure": "blue", 
         "AverageHappiness": "lime"},
     post_process=post_process_lines,
 )
 
-homeownership_plot = make_plot_component(
+homeownership_plot = make_downsampled_plot_component(
     {"HomelessnessRate": "red", "HouseOwnershipRate": "green", "RentRate": "black"},
     post_process=post_process_lines,
 )
 
-homeownership_top10_plot = make_plot_component(
+homeownership_top10_plot = make_downsampled_plot_component(
     {"HomelessnessTop10Percent": "red", "HouseOwnershipTop10Percent": "green", "RentRateTop10Percent": "black"},
     post_process=post_process_lines,
 )
 
-homeownership_bottom10_plot = make_plot_component(
+homeownership_bottom10_plot = make_downsampled_plot_component(
     {"HomelessnessBottom10Percent": "red", "HouseOwnershipBottom10Percent": "green", "RentRateBottom10Percent": "black"},
     post_process=post_process_lines,
 )
 
-market_plot = make_plot_component(
+market_plot = make_downsampled_plot_component(
     {"HousesToRent": "red", "HousesToSell": "green"},
     post_process=post_process_lines,
 )
 
-inequality_plot = make_plot_component(
+inequality_plot = make_downsampled_plot_component(
     {"PropertyValueGini": "magenta"},
     post_process=post_process_lines,
 )
 
-developers_capital = make_plot_component(
+developers_capital = make_downsampled_plot_component(
     {"DeveloperCapital": "purple"},
     post_process=post_process_lines,
 )
 
-landlords_capital = make_plot_component(
+landlords_capital = make_downsampled_plot_component(
     {"LandlordCapital": "green"},
     post_process=post_process_lines,
 )
 
-landlords_owned_properties = make_plot_component(
+landlords_owned_properties = make_downsampled_plot_component(
     {"LandlordOwnedProperties": "blue"},
     post_process=post_process_lines,   
 )
 
-residents_count = make_plot_component(
+residents_count = make_downsampled_plot_component(
     {"ResidentsCount": "orange"},
     post_process=post_process_lines,
 )
 
 
-# developer_plot = make_plot_component(
+# developer_plot = make_downsampled_plot_component(
 #     {"DeveloperCapitalAM": "green", "DeveloperCapitalBM": "purple"},
 #     post_process=post_process_lines,
 # )
@@ -184,42 +193,60 @@ renderer = make_space_component(
 )
 renderer.post_process = post_process_space
 
-for i in range(6,10):
-    model_instance = GentrificationModel(**model_params)
-
-    for _ in range(2500):
-        model_instance.step()
+WARMUP_STEPS = 2500
+SCENARIO_STEPS = 10000
+# fixed-horizon runs; {"convergence": "stop"} or {"convergence": "sparse"} opts into steady-state detection
+RUN_OPTIONS = {}
 
-    model_instance_gov_intervention = deepcopy(model_instance)
-    model_instance_gov_intervention.add_gov_developer()
+run_cache = RunCache()
+results_catalog = ResultsCatalog()
 
-    model_instance_ad_valorem = deepcopy(model_instance)
-    model_instance_ad_valorem.ad_valorem_tax = True
 
-    model_instance_both = deepcopy(model_instance)
-    model_instance_both.add_gov_developer()
-    model_instance_both.ad_valorem_tax = True
+def results(model):
+    # run metadata (e.g. where the run became stationary) travels with the pickled DataFrame
+    df = model.datacollector.get_model_vars_dataframe()
+    if model.memory is not None:
+        model.run_metadata["memory"] = model.memory.report(model)
+    df.attrs["run_metadata"] = model.run_metadata
+    df.attrs["model_params"] = unwrap_params(model_params)
+    return df
 
-    def run_steps(model, steps):
-        for _ in range(steps):
-            model.step()
 
-    threads = [
-        threading.Thread(target=run_steps, args=(model_instance_gov_intervention, 10000)),
-        threading.Thread(target=run_steps, args=(model_instance_ad_valorem, 10000)),
-        threading.Thread(target=run_steps, args=(model_instance_both, 10000)),
-        threading.Thread(target=run_steps, args=(model_instance, 10000)),
-    ]
-
-    for t in threads:
-        t.start()
-    for t in threads:
-        t.join()
-
-    pickle.dump(model_instance_gov_intervention.datacollector.get_model_vars_dataframe(), open(f"results/{i}/results_gov.pkl", "wb"))
-    pickle.dump(model_instance.datacollector.get_model_vars_dataframe(), open(f"results/{i}/results_no_gov.pkl", "wb"))
-    pickle.dump(model_instance_ad_valorem.datacollector.get_model_vars_dataframe(), open(f"results/{i}/results_ad_valorem.pkl", "wb"))
-    pickle.dump(model_instance_both.datacollector.get_model_vars_dataframe(), open(f"results/{i}/results_both.pkl", "wb"))
+for i in range(6,10):
+    warmup_key = run_key(model_params, seed=i, warmup=WARMUP_STEPS)
+    cached = run_cache.get(warmup_key)
+    model_instance = cached if cached is not None else GentrificationModel(**model_params, seed=i)
+    try:
+        if cached is None:
+            for _ in range(WARMUP_STEPS):
+                model_instance.step()
+            run_cache.put(warmup_key, model_instance)
+
+        keys = {
+            scenario: run_key(model_params, scenario, seed=i, warmup=WARMUP_STEPS, steps=SCENARIO_STEPS, options=RUN_OPTIONS)
+            for scenario in SCENARIOS
+        }
+        scenario_results = {scenario: run_cache.get(key) for scenario, key in keys.items()}
+        missing = [scenario for scenario, df in scenario_results.items() if df is None]
+
+        # the scenarios continue the warmed-up model in forked processes, sharing its memory copy-on-write
+        def collect(model):
+            return results(model), model.panel.arrays() if model.panel is not None else None
+
+        branches = model_instance.branch(missing, run=lambda model: run_steps(model, SCENARIO_STEPS, RUN_OPTIONS), collect=collect)
+        panels = {}
+        for scenario, [(df, panel)] in zip(missing, branches):
+            scenario_results[scenario] = df
+            run_cache.put(keys[scenario], df)
+            if panel is not None:
+                panels[scenario] = panel
+
+        for scenario, df in scenario_results.items():
+            pickle.dump(df, open(f"results/{i}/results_{scenario}.pkl", "wb"))
+            results_catalog.add(str(i), scenario, df, params={"seed": i}, panel=panels.get(scenario))
+    finally:
+        # the warmed-up model's search workers and shared memory are released once its branches are done
+        model_instance.close()
 
 
 
@@ -0,0 +1,121 @@
+import logging
+import multiprocessing
+import os
+import random
+from copy import deepcopy
+
+import numpy as np
+
+from scenarios import SCENARIOS, apply_scenario
+
+# set in the parent right before forking; the children inherit them instead of receiving pickled copies
+_parent = None
+_parent_random_state = None
+_branches = None
+
+
+def intervention_label(intervention) -> str:
+    intervention, delay = intervention if isinstance(intervention, tuple) else (intervention, 0)
+    name = intervention if isinstance(intervention, str) else getattr(intervention, "__name__", repr(intervention))
+    return f"{name}@{delay}" if delay else name
+
+
+def _apply(model, intervention):
+    if isinstance(intervention, str):
+        if intervention not in SCENARIOS:
+            raise ValueError(f"Unknown scenario: {intervention}")
+        apply_scenario(model, intervention)
+    elif intervention is not None:
+        intervention(model)
+
+
+def _reseed(model, seed):
+    random.seed(seed)
+    np.random.seed(seed)
+    model.random.seed(seed)
+    model.rng.reseed(seed)
+
+
+def _run_branch(model, task):
+    index, replicate = task
+    interventions, steps, run, collect, seed = _branches
+    intervention, delay = interventions[index] if isinstance(interventions[index], tuple) else (interventions[index], 0)
+
+    if seed is not None:
+        # replicate r of every intervention continues with the same random numbers
+        _reseed(model, int(np.random.SeedSequence([seed, replicate]).generate_state(1)[0]))
+    for _ in range(delay):
+        model.step()
+    _apply(model, intervention)
+    model.run_metadata["branch"] = {"intervention": intervention_label(interventions[index]), "replicate": replicate, "seed": seed}
+
+    try:
+        if run is not None:
+            run(model)
+        else:
+            for _ in range(steps):
+                model.step()
+        return collect(model)
+    finally:
+        # the branch's own copy of the model, its workers and shared memory are not the parent's (see parallel_search)
+        model.close()
+
+
+def _run_forked_branch(task):
+    # the forked child owns its copy of the parent model, nothing has to be copied;
+    # the random module reseeds itself after a fork, so the parent's state is restored
+    random.setstate(_parent_random_state)
+    return _run_branch(_parent, task)
+
+
+def default_collect(model):
+    df = model.datacollector.get_model_vars_dataframe()
+    df.attrs["run_metadata"] = model.run_metadata
+    return df
+
+
+def branch(model, interventions, n: int = 1, steps: int = 0, run=None, collect=None, seed: int = None, processes: int = None) -> list:
+    """
+    Runs continuations of a (warmed-up) model in forked worker processes, `n` per intervention.
+
+    An intervention is a scenario name, a callable taking the model, None (plain continuation), or
+    `(intervention, delay)` to apply it after `delay` further steps. Every child applies its intervention
+    and steps the model `steps` times, or calls `run(model)`; `collect(model)` (by default the collected
+    metrics) is sent back to the parent. The children start from the parent's memory copy-on-write,
+    so the warm-up state is neither pickled nor deep-copied; only the pages a child modifies are copied.
+
+    With n=1 and no seed every branch continues the parent's random state, like a deepcopy would.
+    Otherwise replicate r of every intervention is reseeded from (seed, r), the seed defaulting to the model's.
+    Returns a list with one list of n results per intervention.
+    """
+    global _parent, _parent_random_state, _branches
+    if n > 1 and seed is None:
+        seed = model._seed if model._seed is not None else random.randrange(2**32)
+    collect = collect if collect is not None else default_collect
+    tasks = [(index, replicate) for index in range(len(interventions)) for replicate in range(n)]
+
+    _branches = (list(interventions), steps, run, collect, seed)
+    try:
+        if "fork" in multiprocessing.get_all_start_methods() and len(tasks) > 1:
+            # explicitly fork: importing mesa makes spawn the default start method
+            context = multiprocessing.get_context("fork")
+            _parent, _parent_random_state = model, random.getstate()
+            processes = processes or min(len(tasks), os.cpu_count() or 1)
+            logging.info("Branching %d continuations into %d forked processes.", len(tasks), processes)
+            # one task per child: a child that ran a branch no longer holds the parent's state
+            with context.Pool(processes, maxtasksperchild=1) as pool:
+                results = pool.map(_run_forked_branch, tasks, chunksize=1)
+        else:
+            # without fork every branch starts from a deep copy and the parent's random state, as a forked child would
+            state = random.getstate(), np.random.get_state()
+            results = []
+            for task in tasks:
+                random.setstate(state[0])
+                np.random.set_state(state[1])
+                results.append(_run_branch(deepcopy(model), task))
+            random.setstate(state[0])
+            np.random.set_state(state[1])
+    finally:
+        _parent = _parent_random_state = _branches = None
+
+    return [results[index * n:(index + 1) * n] for index in range(len(interventions))]
@@ -0,0 +1,161 @@
+from collections import deque
+
+import numpy as np
+
+DEFAULT_METRICS = ("HomelessnessRate", "AverageRent", "LandlordOwnedProperties")
+
+
+class ConvergenceDetector:
+    """
+    Online steady-state detector over a set of collected metrics.
+
+    Every `check_every` steps the last `window` values of each watched metric are tested:
+    - trend: the drift of a least-squares line over the window must stay below `drift_tolerance` standard deviations,
+    - variance: the variances of the two halves of the window must not differ more than `variance_ratio` times.
+    The run is stationary once every watched metric passes both tests.
+    """
+
+    def __init__(
+        self,
+        metrics: tuple[str, ...] = DEFAULT_METRICS,
+        window: int = 500,
+        check_every: int = 50,
+        drift_tolerance: float = 0.5,
+        variance_ratio: float = 2.0,
+    ):
+        self.metrics = tuple(metrics)
+        self.window = window
+        self.check_every = check_every
+        self.drift_tolerance = drift_tolerance
+        self.variance_ratio = variance_ratio
+
+        self.history = {metric: deque(maxlen=window) for metric in self.metrics}
+        self.updates = 0
+        self.stationary = False
+        self.last_diagnostics: dict[str, dict] = {}
+
+    def update(self, row: dict) -> bool:
+        """Feed the metric values of one step; returns True once all watched metrics are stationary."""
+        for metric in self.metrics:
+            self.history[metric].append(row[metric])
+        self.updates += 1
+
+        if self.due(self.updates):
+            self.last_diagnostics = {metric: self._test(np.asarray(self.history[metric], dtype=np.float64))
+                                     for metric in self.metrics}
+            self.stationary = all(result["stationary"] for result in self.last_diagnostics.values())
+        return self.stationary
+
+    def due(self, updates: int) -> bool:
+        """Whether the watched metrics are tested once `updates` steps have been fed."""
+        return updates >= self.window and updates % self.check_every == 0
+
+    def _test(self, values):
+        values = values[~np.isnan(values)]
+        if len(values) < self.window // 2:
+            return {"stationary": False, "drift": np.nan, "variance_ratio": np.nan}
+
+        std = values.std()
+        if std == 0:
+            return {"stationary": True, "drift": 0.0, "variance_ratio": 1.0}
+
+        steps = np.arange(len(values))
+        slope = np.polyfit(steps, values, 1)[0]
+        drift = abs(slope) * len(values) / std
+
+        first, second = np.array_split(values, 2)
+        low, high = sorted((first.var(), second.var()))
+        ratio = high / low if low > 0 else np.inf
+
+        return {
+            "stationary": bool(drift <= self.drift_tolerance and ratio <= self.variance_ratio),
+            "drift": float(drift),
+            "variance_ratio": float(ratio),
+        }
+
+    def diagnostics(self) -> dict:
+        return {
+            "metrics": self.metrics,
+            "window": self.window,
+            "drift_tolerance": self.drift_tolerance,
+            "variance_ratio": self.variance_ratio,
+            "tests": self.last_diagnostics,
+        }
+
+
+RUN_OPTION_DEFAULTS = {"convergence": None, "sparse_every": 50}
+CONVERGENCE_MODES = (None, "stop", "sparse")
+
+
+def run_options(options: dict = None) -> dict:
+    """
+    Validated run options with the defaults left out, so that equal runs have equal options (and cache keys):
+    "convergence" is None (fixed horizon), "stop" or "sparse" (see run_until_stationary), "sparse_every" the
+    collection interval of sparse mode. Unknown options are rejected rather than silently ignored.
+    """
+    options = dict(options or {})
+    unknown = set(options) - set(RUN_OPTION_DEFAULTS)
+    if unknown:
+        raise ValueError(f"Unknown run options: {sorted(unknown)}")
+    if options.get("convergence") not in CONVERGENCE_MODES:
+        raise ValueError(f"Unknown convergence mode: {options['convergence']}")
+    return {name: value for name, value in options.items() if value != RUN_OPTION_DEFAULTS[name]}
+
+
+def run_until_stationary(model, max_steps: int, detector: ConvergenceDetector = None, mode: str = None, sparse_every: int = 50,
+                         on_step=None):
+    """
+    Steps the model up to `max_steps` times, feeding the collected metrics to the detector.
+    Once the watched metrics are stationary the run either stops (mode="stop") or continues
+    collecting only every `sparse_every` steps (mode="sparse"); with mode=None it runs the fixed horizon
+    without watching the metrics. `on_step(model)` is called after every step.
+    The outcome of a watched run is recorded in `model.run_metadata["convergence"]`.
+    """
+    if mode not in CONVERGENCE_MODES:
+        raise ValueError(f"Unknown convergence mode: {mode}")
+
+    if mode is None:
+        for _ in range(max_steps):
+            model.step()
+            if on_step is not None:
+                on_step(model)
+        return model
+
+    detector = detector if detector is not None else ConvergenceDetector()
+    first_row = len(model.datacollector.model_vars[detector.metrics[0]])
+    start_step = model.step_count
+    fed = 0
+
+    for _ in range(max_steps):
+        model.step()
+        if on_step is not None:
+            on_step(model)
+        if detector.stationary:
+            continue
+
+        # the detector decides only at its checks, so the rows are read (which waits for a pipelined
+        # collector) only then; until stationary every step is collected
+        pending = model.step_count - start_step - fed
+        if not detector.due(detector.updates + pending):
+            continue
+        model_vars = model.datacollector.model_vars
+        for row in range(first_row + fed, first_row + fed + pending):
+            stationary = detector.update({metric: model_vars[metric][row] for metric in detector.metrics})
+        fed += pending
+        if stationary:
+            model.run_metadata["convergence"] = dict(
+                detector.diagnostics(), mode=mode, stationary_step=model.step_count, steps_to_stationary=model.step_count - start_step
+            )
+            if mode == "stop":
+                break
+            model.collect_every = sparse_every
+
+    model.run_metadata.setdefault("convergence", dict(detector.diagnostics(), mode=mode, stationary_step=None))
+    model.run_metadata["convergence"]["stopped_step"] = model.step_count
+    return model
+
+
+def run_steps(model, steps: int, options: dict = None, on_step=None):
+    """Steps the model `steps` times under the given run options (see run_options)."""
+    options = dict(RUN_OPTION_DEFAULTS, **run_options(options))
+    return run_until_stationary(model, steps, mode=options["convergence"], sparse_every=options["sparse_every"], on_step=on_step)
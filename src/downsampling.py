@@ -0,0 +1,78 @@
+import numpy as np
+
+
+def _merge(a, b):
+    # buckets are (x of the minimum, minimum, x of the maximum, maximum); NaN samples lose against numbers
+    low_x, low = (b[0], b[1]) if a[1] != a[1] or b[1] < a[1] else (a[0], a[1])
+    high_x, high = (b[2], b[3]) if a[3] != a[3] or b[3] > a[3] else (a[2], a[3])
+    return low_x, low, high_x, high
+
+
+class MinMaxPyramid:
+    """
+    Multi-resolution min/max summary of a growing time series.
+
+    Level k holds the minimum and maximum (with their x, by default the position of the sample) of
+    consecutive buckets of 2**k samples and is updated incrementally: every appended sample completes at
+    most one bucket per level.
+    `points(budget)` draws the finest level that fits the point budget, so spikes stay visible while
+    the number of plotted points does not grow with the length of the series.
+    """
+
+    def __init__(self):
+        self.levels: list[list[tuple]] = [[]]
+        self.count = 0
+
+    def __len__(self):
+        return self.count
+
+    def append(self, value, x=None):
+        x = self.count if x is None else x
+        self.count += 1
+        value = float(value) if value is not None else np.nan
+        bucket = (x, value, x, value)
+        level = 0
+        while True:
+            buckets = self.levels[level]
+            buckets.append(bucket)
+            if len(buckets) % 2:
+                break
+            bucket = _merge(buckets[-2], buckets[-1])
+            level += 1
+            if level == len(self.levels):
+                self.levels.append([])
+
+    def extend(self, values, xs=None):
+        if xs is None:
+            for value in values:
+                self.append(value)
+        else:
+            for value, x in zip(values, xs, strict=True):
+                self.append(value, x)
+
+    def points(self, budget: int = 1000) -> tuple[np.ndarray, np.ndarray]:
+        """x and values of at most about `budget` points (two per bucket of the chosen level)."""
+        level = 0
+        while level + 1 < len(self.levels) and 2 * len(self.levels[level]) > budget:
+            level += 1
+
+        buckets = list(self.levels[level])
+        # the samples after the last complete bucket of the level are covered by finer levels, one bucket each
+        covered = len(buckets) << level
+        for finer in range(level - 1, -1, -1):
+            tail = self.levels[finer][covered >> finer:]
+            buckets.extend(tail)
+            covered += len(tail) << finer
+
+        xs, ys = [], []
+        for low_x, low, high_x, high in buckets:
+            if low_x == high_x:
+                xs.append(low_x)
+                ys.append(low)
+            elif low_x < high_x:
+                xs += (low_x, high_x)
+                ys += (low, high)
+            else:
+                xs += (high_x, low_x)
+                ys += (high, low)
+        return np.array(xs), np.array(ys, dtype=np.float64)
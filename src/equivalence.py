@@ -0,0 +1,249 @@
+import logging
+
+import numpy as np
+import pandas as pd
+from scipy import stats
+
+from model import GentrificationModel
+from scenarios import SCENARIOS, apply_scenario, unwrap_params
+
+BASELINE_SCENARIO = "no_gov"
+IGNORED_METRICS = ("Step",)
+
+
+def model_vars(model) -> pd.DataFrame:
+    """Collected metrics of a GentrificationModel or of an engine exposing get_model_vars_dataframe()."""
+    if hasattr(model, "get_model_vars_dataframe"):
+        return model.get_model_vars_dataframe()
+    return model.datacollector.get_model_vars_dataframe()
+
+
+def run_replicates(engine, model_params: dict, scenario: str, seeds, warmup: int, steps: int, burn_in: int) -> pd.DataFrame:
+    """
+    Runs one replicate per seed: `warmup` steps, the scenario's interventions, then `steps` steps.
+    Returns the replicate means of every metric after warm-up + burn-in, one row per seed.
+    """
+    means = []
+    for seed in seeds:
+        model = engine(seed=seed, **model_params)
+        try:
+            for _ in range(warmup):
+                model.step()
+            apply_scenario(model, scenario)
+            for _ in range(steps):
+                model.step()
+            frame = model_vars(model)
+        finally:
+            if hasattr(model, "close"):
+                model.close()
+
+        frame = frame.iloc[warmup + burn_in:].drop(columns=[name for name in IGNORED_METRICS if name in frame.columns])
+        frame = frame.apply(pd.to_numeric, errors="coerce")
+        means.append(frame.mean())
+    return pd.DataFrame(means, index=list(seeds))
+
+
+def cohens_d(a, b) -> float:
+    """Standardized difference of the means of b and a (pooled standard deviation)."""
+    a, b = np.asarray(a, dtype=np.float64), np.asarray(b, dtype=np.float64)
+    a, b = a[~np.isnan(a)], b[~np.isnan(b)]
+    if len(a) < 2 or len(b) < 2:
+        return np.nan
+    pooled = np.sqrt(((len(a) - 1) * a.var(ddof=1) + (len(b) - 1) * b.var(ddof=1)) / (len(a) + len(b) - 2))
+    difference = b.mean() - a.mean()
+    if pooled == 0:
+        return 0.0 if difference == 0 else np.copysign(np.inf, difference)
+    return difference / pooled
+
+
+def _tost(reference, candidate, tolerance) -> float:
+    """
+    Two one-sided Welch tests of equivalence: the p-value of the hypothesis that the means differ by
+    `tolerance` pooled standard deviations or more. Small values are evidence that the engines agree.
+    """
+    if len(reference) < 2 or len(candidate) < 2:
+        return np.nan
+    difference = candidate.mean() - reference.mean()
+    margin = tolerance * np.sqrt((reference.var() + candidate.var()) / 2)
+    variances = reference.var() / len(reference), candidate.var() / len(candidate)
+    standard_error = np.sqrt(sum(variances))
+    if standard_error == 0:
+        return 0.0 if abs(difference) < margin or difference == 0 else 1.0
+    # Welch-Satterthwaite degrees of freedom
+    df = standard_error ** 4 / sum(variance ** 2 / (len(group) - 1) for variance, group in zip(variances, (reference, candidate)) if variance > 0)
+    lower = stats.t.sf((difference + margin) / standard_error, df)
+    upper = stats.t.cdf((difference - margin) / standard_error, df)
+    return float(max(lower, upper))
+
+
+def _test_metric(reference, candidate, tolerance):
+    reference, candidate = reference.dropna(), candidate.dropna()
+    welch_p = ks_p = np.nan
+    if len(reference) >= 2 and len(candidate) >= 2:
+        if reference.var() + candidate.var() > 0:
+            welch_p = stats.ttest_ind(reference, candidate, equal_var=False).pvalue
+        else:
+            welch_p = 1.0 if reference.mean() == candidate.mean() else 0.0
+        ks_p = stats.ks_2samp(reference, candidate).pvalue
+
+    return {
+        "reference_mean": reference.mean(),
+        "candidate_mean": candidate.mean(),
+        "standardized_difference": cohens_d(reference, candidate),
+        "welch_p": welch_p,
+        "ks_p": ks_p,
+        "tost_p": _tost(reference, candidate, tolerance),
+    }
+
+
+def _test_effect(reference_baseline, reference_scenario, candidate_baseline, candidate_scenario):
+    """Welch-type test of the difference between the candidate's and the reference's policy effect (difference of means)."""
+    groups = [group.dropna() for group in (reference_baseline, reference_scenario, candidate_baseline, candidate_scenario)]
+    reference_effect = groups[1].mean() - groups[0].mean()
+    candidate_effect = groups[3].mean() - groups[2].mean()
+    difference = candidate_effect - reference_effect
+
+    if any(len(group) < 2 for group in groups):
+        return {"reference_effect": reference_effect, "candidate_effect": candidate_effect, "p": np.nan, "standardized_difference": np.nan}
+
+    variances = [group.var() / len(group) for group in groups]
+    standard_error = np.sqrt(sum(variances))
+    pooled = np.sqrt(np.mean([group.var() for group in groups]))
+    if standard_error == 0:
+        p = 1.0 if difference == 0 else 0.0
+    else:
+        # Welch-Satterthwaite degrees of freedom
+        df = standard_error ** 4 / sum(variance ** 2 / (len(group) - 1) for variance, group in zip(variances, groups) if variance > 0)
+        p = 2 * stats.t.sf(abs(difference) / standard_error, df)
+    return {
+        "reference_effect": reference_effect,
+        "candidate_effect": candidate_effect,
+        "p": p,
+        "standardized_difference": difference / pooled if pooled > 0 else (0.0 if difference == 0 else np.inf),
+    }
+
+
+class EquivalenceReport:
+    """Outcome of compare_engines: per-metric tests and per-scenario policy effects, with a pass/fail verdict."""
+
+    def __init__(self, metrics: pd.DataFrame, effects: pd.DataFrame, settings: dict):
+        self.metrics = metrics
+        self.effects = effects
+        self.settings = settings
+
+    @property
+    def passed(self) -> bool:
+        return bool(self.metrics["passed"].all() and (self.effects.empty or self.effects["passed"].all()))
+
+    def failures(self) -> dict:
+        return {
+            "metrics": self.metrics[~self.metrics["passed"]],
+            "effects": self.effects[~self.effects["passed"]] if not self.effects.empty else self.effects,
+        }
+
+    def format(self) -> str:
+        failures = self.failures()
+        lines = [
+            f"Equivalence {'PASSED' if self.passed else 'FAILED'}: "
+            f"{len(self.metrics) - len(failures['metrics'])}/{len(self.metrics)} metric comparisons and "
+            f"{len(self.effects) - len(failures['effects'])}/{len(self.effects)} policy effects agree "
+            f"({len(self.settings['seeds'])} seeds, alpha={self.settings['alpha']} Bonferroni-corrected over "
+            f"{self.settings['tests']} tests, tolerance={self.settings['tolerance']})."
+        ]
+        if not failures["metrics"].empty:
+            lines.append("Metrics that differ:")
+            lines.append(failures["metrics"][["reference_mean", "candidate_mean", "standardized_difference", "welch_p", "ks_p", "tost_p", "missing"]].to_string())
+        if not failures["effects"].empty:
+            lines.append("Policy effects that differ:")
+            lines.append(failures["effects"][["reference_effect", "candidate_effect", "reference_effect_size", "candidate_effect_size", "p"]].to_string())
+        return "\n".join(lines)
+
+
+def compare_engines(
+    candidate,
+    model_params: dict,
+    reference=GentrificationModel,
+    scenarios=tuple(SCENARIOS),
+    seeds=range(10),
+    warmup: int = 100,
+    steps: int = 300,
+    burn_in: int = 100,
+    alpha: float = 0.01,
+    tolerance: float = 0.5,
+) -> EquivalenceReport:
+    """
+    Runs the reference and the candidate engine (callables taking seed= and the model parameters) on the
+    same seeds in every scenario and compares, for every collected metric, the distributions of the
+    replicate means with Welch's t-test and a two-sample Kolmogorov-Smirnov test. Replicates are the
+    independent samples: the steps of one run are autocorrelated and would overstate the evidence.
+
+    For every scenario other than the baseline the policy effect (difference of means against the baseline)
+    is compared between the engines with a Welch-type test; effect sizes (Cohen's d) are reported.
+
+    A comparison fails only when a test rejects at `alpha` Bonferroni-corrected over every test of the
+    report (two per metric, one per effect) and the difference exceeds `tolerance` pooled standard
+    deviations: with many metrics, some differ by chance and with few seeds, a test that rejects may still
+    flag a difference too small to matter. The reference compared with itself on other seeds passes. A
+    metric the candidate does not collect fails, and so does a difference that cannot be computed (fewer
+    than two replicates with a value) unless neither engine has a value. The p-value of two one-sided tests
+    of equivalence within the tolerance (TOST) is reported; it falls below `alpha` only once enough seeds
+    are run to show equivalence.
+    """
+    model_params = unwrap_params(model_params)
+    seeds = list(seeds)
+    runs = {}
+    for scenario in scenarios:
+        for name, engine in (("reference", reference), ("candidate", candidate)):
+            logging.info("Equivalence: running %s engine in scenario %s.", name, scenario)
+            runs[name, scenario] = run_replicates(engine, model_params, scenario, seeds, warmup, steps, burn_in)
+
+    rows = []
+    for scenario in scenarios:
+        reference_run, candidate_run = runs["reference", scenario], runs["candidate", scenario]
+        for metric in reference_run.columns:
+            if metric not in candidate_run.columns:
+                rows.append({"reference_mean": reference_run[metric].mean(), "scenario": scenario, "metric": metric, "missing": True})
+                continue
+            row = _test_metric(reference_run[metric], candidate_run[metric], tolerance)
+            row.update(scenario=scenario, metric=metric, missing=False,
+                       undefined=reference_run[metric].isna().all() and candidate_run[metric].isna().all())
+            rows.append(row)
+    metric_report = pd.DataFrame(rows).set_index(["scenario", "metric"])
+
+    rows = []
+    if BASELINE_SCENARIO in scenarios:
+        for scenario in scenarios:
+            if scenario == BASELINE_SCENARIO:
+                continue
+            metrics = metric_report.loc[scenario].index[~metric_report.loc[scenario, "missing"]]
+            for metric in metrics:
+                groups = [runs[name, key][metric] for name in ("reference", "candidate") for key in (BASELINE_SCENARIO, scenario)]
+                row = _test_effect(*groups)
+                row.update(
+                    scenario=scenario,
+                    metric=metric,
+                    reference_effect_size=cohens_d(groups[0], groups[1]),
+                    candidate_effect_size=cohens_d(groups[2], groups[3]),
+                    undefined=all(group.isna().all() for group in groups),
+                )
+                rows.append(row)
+    effect_report = pd.DataFrame(rows, columns=["scenario", "metric", "reference_effect", "candidate_effect", "reference_effect_size",
+                                                "candidate_effect_size", "standardized_difference", "p", "undefined"]).set_index(["scenario", "metric"])
+
+    tests = 2 * int((~metric_report["missing"]).sum()) + len(effect_report)
+    corrected_alpha = alpha / max(tests, 1)
+
+    def passed(p_values, standardized_difference, undefined):
+        if np.isnan(standardized_difference):
+            return bool(undefined)
+        return not (min(p_values) < corrected_alpha and abs(standardized_difference) > tolerance)
+
+    metric_report["passed"] = [
+        not row.missing and passed((row.welch_p, row.ks_p), row.standardized_difference, row.undefined)
+        for row in metric_report.itertuples()
+    ]
+    effect_report["passed"] = [passed((row.p,), row.standardized_difference, row.undefined) for row in effect_report.itertuples()]
+
+    settings = {"model_params": model_params, "scenarios": list(scenarios), "seeds": seeds, "warmup": warmup,
+                "steps": steps, "burn_in": burn_in, "alpha": alpha, "tests": tests, "corrected_alpha": corrected_alpha, "tolerance": tolerance}
+    return EquivalenceReport(metric_report, effect_report, settings)
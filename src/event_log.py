@@ -0,0 +1,77 @@
+import logging
+from collections import Counter, deque
+
+
+class EventLog:
+    """
+    Structured simulation event log used in the agents' hot paths.
+
+    Every event is counted and kept in a ring buffer with its unformatted arguments. Only the first
+    `max_per_window` events of each type in a window of `window` steps are passed on to the logger,
+    which formats them lazily, so the logging cost stays bounded however often agents misbehave.
+    """
+
+    def __init__(
+        self,
+        logger: logging.Logger = None,
+        max_per_window: int = 5,
+        window: int = 100,
+        buffer_size: int = 1000,
+    ):
+        self.logger = logger if logger is not None else logging.getLogger("gentrification.events")
+        self.max_per_window = max_per_window
+        self.window = window
+
+        self.step = 0
+        self.counts: Counter = Counter()
+        self.suppressed: Counter = Counter()
+        self.buffer: deque = deque(maxlen=buffer_size)
+
+        self._emitted: Counter = Counter()
+        self._window_index = 0
+
+    def log(self, event_type: str, message: str, *args, level: int = logging.INFO):
+        """Record an event; `message` is a %-style format string formatted only if the event is emitted."""
+        self.counts[event_type] += 1
+        self.buffer.append((self.step, event_type, level, message, args))
+
+        window_index = self.step // self.window
+        if window_index != self._window_index:
+            self._flush_suppressed()
+            self._window_index = window_index
+
+        if self._emitted[event_type] >= self.max_per_window:
+            self.suppressed[event_type] += 1
+            return
+
+        self._emitted[event_type] += 1
+        if self.logger.isEnabledFor(level):
+            self.logger.log(level, message, *args)
+
+    def warning(self, event_type: str, message: str, *args):
+        self.log(event_type, message, *args, level=logging.WARNING)
+
+    def _flush_suppressed(self, last_step: int = None):
+        window_end = (self._window_index + 1) * self.window - 1
+        last_step = window_end if last_step is None else min(last_step, window_end)
+        for event_type, count in self.suppressed.items():
+            self.logger.info("Suppressed %d '%s' events in steps %d-%d.", count, event_type,
+                             self._window_index * self.window, last_step)
+        self.suppressed.clear()
+        self._emitted.clear()
+
+    def close(self):
+        """Report the events suppressed in the current window, which no later event will flush."""
+        self._flush_suppressed(last_step=self.step)
+
+    def records(self):
+        """Formatted (step, event_type, level, message) tuples currently held in the ring buffer."""
+        return [(step, event_type, level, message % args if args else message)
+                for step, event_type, level, message, args in self.buffer]
+
+    def dump(self, logger: logging.Logger = None, level: int = logging.ERROR):
+        """Write the whole ring buffer to the logger, e.g. when the simulation fails."""
+        logger = logger if logger is not None else self.logger
+        logger.log(level, "Dumping last %d simulation events (event counts: %s).", len(self.buffer), dict(self.counts))
+        for step, event_type, _, message in self.records():
+            logger.log(level, "[step %d] %s: %s", step, event_type, message)
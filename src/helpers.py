@@ -1,5 +1,10 @@
+from pathlib import Path
+
 import numpy as np
 
+# the results directory of the repository, whatever the working directory of a run
+RESULTS_DIR = Path(__file__).resolve().parent.parent / "results"
+
 def gini_coefficient(x):
     x = np.asarray(x, dtype=np.float64)
     if np.amin(x) < 0:
@@ -9,3 +14,22 @@ def gini_coefficient(x):
     index = np.arange(1, x.shape[0] + 1)
     n = x.shape[0]
     return (np.sum((2 * index - n - 1) * x)) / (n * np.sum(x))
+
+
+def apportion(total, weights, minimum=0):
+    """Largest-remainder split of an integer total proportionally to weights, at least `minimum` each; the counts sum to total."""
+    weights = np.asarray(weights, dtype=np.float64)
+    if total < minimum * len(weights):
+        raise ValueError(f"Cannot give {len(weights)} shares of at least {minimum} out of {total}.")
+    shares = weights / weights.sum() * total
+    counts = np.maximum(np.floor(shares).astype(int), minimum)
+    remainders = shares - np.floor(shares)
+    for index in np.argsort(-remainders):
+        if counts.sum() >= total:
+            break
+        counts[index] += 1
+    # raising shares to the minimum may have handed out too many, taken back from the largest shares
+    while counts.sum() > total:
+        index = np.argmax(np.where(counts > minimum, counts - shares, -np.inf))
+        counts[index] -= 1
+    return counts.tolist()
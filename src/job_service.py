@@ -0,0 +1,326 @@
+import asyncio
+import json
+import logging
+import multiprocessing
+import pickle
+import socket
+import traceback
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from helpers import RESULTS_DIR
+from metrics_pipeline import collected_model_vars
+from run_cache import RunCache
+from work_queue import DONE, FAILED, QUEUED, execute_spec, make_spec, spec_key
+
+RUNNING, CANCELLED = "running", "cancelled"
+FINISHED = (DONE, FAILED, CANCELLED)
+DEFAULT_SOCKET = RESULTS_DIR / "jobs.sock"
+LINE_LIMIT = 2**24  # longest request line accepted by the service
+
+
+class JobServiceError(Exception):
+    pass
+
+
+def _encode(message: dict) -> bytes:
+    return json.dumps(message, default=lambda value: value.item() if isinstance(value, np.generic) else str(value)).encode() + b"\n"
+
+
+def _rows(model_vars: dict, start: int) -> list[dict]:
+    # the rows complete in every column (a pipelined collector may be appending one)
+    count = min((len(values) for values in model_vars.values()), default=0)
+    return [{name: values[i] for name, values in model_vars.items()} for i in range(start, count)]
+
+
+def _run_job(spec: dict, connection, store: RunCache):
+    """
+    Body of a job process: sends ("rows", [...]) whenever the datacollector collected new steps,
+    then ("done", None) or ("error", traceback). A job found in the store is replayed from it.
+    """
+    sent = 0
+
+    def send_rows(model):
+        nonlocal sent
+        # streams what is collected, without waiting for a pipelined collector every step
+        rows = _rows(collected_model_vars(model.datacollector), sent)
+        if rows:
+            connection.send(("rows", rows))
+            sent += len(rows)
+
+    try:
+        key = spec_key(spec)
+        df = store.get(key) if store is not None else None
+        if df is None:
+            df = execute_spec(spec, on_step=send_rows)
+            if store is not None:
+                store.put(key, df)
+        rows = df.iloc[sent:].to_dict("records")
+        if rows:
+            connection.send(("rows", rows))
+        connection.send(("done", None))
+    except Exception:
+        connection.send(("error", traceback.format_exc()))
+    finally:
+        connection.close()
+
+
+class Job:
+    def __init__(self, key: str, spec: dict):
+        self.key = key
+        self.spec = spec
+        self.state = QUEUED
+        self.error = None
+        self.rows: list[dict] = []  # every collected step, replayed to late subscribers
+        self.subscribers: list[asyncio.Queue] = []
+        self.process = None
+
+    def summary(self) -> dict:
+        return {"key": self.key, "state": self.state, "scenario": self.spec["scenario"], "seed": self.spec["seed"],
+                "rows": len(self.rows), "error": self.error}
+
+    def publish(self, message: dict):
+        for subscriber in self.subscribers:
+            subscriber.put_nowait(message)
+
+
+class JobService:
+    """
+    Local job service: runs submitted specs (see work_queue.make_spec) in forked processes, at most `workers`
+    at a time, and streams the metric row of every collected step to subscribers.
+
+    Clients talk JSON lines over a Unix socket or TCP, one request per line:
+    {"op": "submit", "model_params": {...}, "scenario": ..., "seed": ..., "warmup": ..., "steps": ..., "options": {...}},
+    {"op": "status"[, "key": ...]}, {"op": "cancel", "key": ...} and {"op": "subscribe", "key": ...[, "since": n]}.
+    A subscription replays the rows collected so far, then sends {"event": "rows", "rows": [...]} messages
+    as the job runs and ends with {"event": "end", ...summary}. Invalid requests are answered with
+    {"ok": false, "error": ...}. Jobs are keyed like the run cache, so
+    submitting a spec twice returns the existing job and finished jobs are served from the store.
+    """
+
+    def __init__(self, workers: int = 1, store: RunCache = None):
+        self.jobs: dict[str, Job] = {}
+        self.store = store
+        self._slots = asyncio.Semaphore(workers)
+        # explicitly fork: importing mesa makes spawn the default start method
+        self._context = multiprocessing.get_context("fork")
+        self._tasks = set()
+
+    def submit(self, spec: dict) -> Job:
+        key = spec_key(spec)
+        job = self.jobs.get(key)
+        if job is not None and job.state not in (FAILED, CANCELLED):
+            return job
+        job = self.jobs[key] = Job(key, spec)
+        task = asyncio.get_running_loop().create_task(self._run(job))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return job
+
+    def cancel(self, key: str) -> Job:
+        job = self.jobs[key]
+        if job.state == QUEUED:
+            job.state = CANCELLED
+            job.publish({"event": "end", **job.summary()})
+        elif job.state == RUNNING:
+            job.state = CANCELLED
+            job.process.terminate()  # the closed pipe ends the job
+        return job
+
+    async def _run(self, job: Job):
+        async with self._slots:
+            if job.state != QUEUED:
+                return
+            loop = asyncio.get_running_loop()
+            receiver, sender = self._context.Pipe(duplex=False)
+            job.process = self._context.Process(target=_run_job, args=(job.spec, sender, self.store), daemon=True)
+            job.state = RUNNING
+            job.process.start()
+            sender.close()
+            logging.info("Job %s started (scenario %s, seed %s).", job.key, job.spec["scenario"], job.spec["seed"])
+
+            finished = loop.create_future()
+            loop.add_reader(receiver.fileno(), self._receive, job, receiver, finished)
+            try:
+                await finished
+            finally:
+                loop.remove_reader(receiver.fileno())
+                receiver.close()
+                await loop.run_in_executor(None, job.process.join)
+            logging.info("Job %s %s.", job.key, job.state)
+
+    def _receive(self, job: Job, receiver, finished):
+        if finished.done():
+            return
+        try:
+            kind, payload = receiver.recv()
+        except (EOFError, OSError, pickle.UnpicklingError):
+            kind, payload = "error", "job process exited unexpectedly"
+        if kind == "rows":
+            job.rows.extend(payload)
+            job.publish({"event": "rows", "rows": payload})
+            return
+
+        if job.state == RUNNING:
+            job.state = DONE if kind == "done" else FAILED
+            job.error = payload
+        job.publish({"event": "end", **job.summary()})
+        finished.set_result(None)
+
+    async def shutdown(self):
+        """Cancels the queued and running jobs and waits until their processes are gone."""
+        for job in self.jobs.values():
+            if job.state in (QUEUED, RUNNING):
+                self.cancel(job.key)
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    def _respond(self, request: dict) -> dict:
+        op = request.get("op")
+        if op == "submit":
+            spec = make_spec(request["model_params"], request.get("scenario", "no_gov"), request.get("seed"),
+                             request.get("warmup", 0), request.get("steps", 0), request.get("options"))
+            return self.submit(spec).summary()
+        if op == "status":
+            if request.get("key") is None:
+                return {"jobs": [job.summary() for job in self.jobs.values()]}
+            return self.jobs[request["key"]].summary()
+        if op == "cancel":
+            return self.cancel(request["key"]).summary()
+        raise ValueError(f"Unknown operation: {op}")
+
+    async def _subscribe(self, job: Job, since: int, writer):
+        subscriber = asyncio.Queue()
+        job.subscribers.append(subscriber)
+        try:
+            if job.rows[since:]:
+                writer.write(_encode({"event": "rows", "rows": job.rows[since:]}))
+            if job.state in FINISHED:
+                writer.write(_encode({"event": "end", **job.summary()}))
+                return
+            while True:
+                message = await subscriber.get()
+                writer.write(_encode(message))
+                await writer.drain()
+                if message["event"] == "end":
+                    return
+        finally:
+            job.subscribers.remove(subscriber)
+
+    async def handle(self, reader, writer):
+        try:
+            while line := await reader.readline():
+                try:
+                    request = json.loads(line)
+                    if request.get("op") == "subscribe":
+                        await self._subscribe(self.jobs[request["key"]], request.get("since", 0), writer)
+                    else:
+                        writer.write(_encode(self._respond(request)))
+                except KeyError as error:
+                    writer.write(_encode({"ok": False, "error": f"Unknown job or missing field: {error}"}))
+                except (ValueError, TypeError) as error:
+                    writer.write(_encode({"ok": False, "error": str(error)}))
+                await writer.drain()
+        except ConnectionError:
+            pass  # the client went away
+        finally:
+            writer.close()
+
+
+async def serve(path=DEFAULT_SOCKET, host: str = None, port: int = None, workers: int = 1, store: RunCache = None):
+    """Runs the job service on a Unix socket at `path`, or on TCP if a `port` is given, until cancelled."""
+    service = JobService(workers, store)
+    if port is not None:
+        server = await asyncio.start_server(service.handle, host or "127.0.0.1", port, limit=LINE_LIMIT)
+        logging.info("Job service listening on %s:%d.", host or "127.0.0.1", port)
+    else:
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.unlink(missing_ok=True)  # a socket left behind by a previous service
+        server = await asyncio.start_unix_server(service.handle, path, limit=LINE_LIMIT)
+        logging.info("Job service listening on %s.", path)
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        await service.shutdown()
+
+
+class JobClient:
+    """Blocking client of the job service; every call uses its own connection, so threads can share a client."""
+
+    def __init__(self, path=DEFAULT_SOCKET, host: str = None, port: int = None, timeout: float = None):
+        self.path = str(path)
+        self.host = host or "127.0.0.1"
+        self.port = port
+        self.timeout = timeout
+
+    def _connect(self):
+        if self.port is not None:
+            return socket.create_connection((self.host, self.port), timeout=self.timeout)
+        connection = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        connection.settimeout(self.timeout)
+        connection.connect(self.path)
+        return connection
+
+    def _request(self, request: dict) -> dict:
+        with self._connect() as connection, connection.makefile("rwb") as stream:
+            stream.write(_encode(request))
+            stream.flush()
+            response = json.loads(stream.readline())
+        if response.get("ok") is False:
+            raise JobServiceError(response["error"])
+        return response
+
+    def submit(self, model_params: dict, scenario: str = "no_gov", seed: int = None, warmup: int = 0, steps: int = 0,
+               options: dict = None) -> str:
+        spec = make_spec(model_params, scenario, seed, warmup, steps, options)
+        return self._request({"op": "submit", **spec})["key"]
+
+    def status(self, key: str = None):
+        """Summary of one job, or of all jobs if no key is given."""
+        response = self._request({"op": "status", "key": key})
+        return response["jobs"] if key is None else response
+
+    def cancel(self, key: str) -> dict:
+        return self._request({"op": "cancel", "key": key})
+
+    def stream(self, key: str, since: int = 0):
+        """Yields the metric rows of a job as they are collected, from row `since` on, until the job ends."""
+        with self._connect() as connection, connection.makefile("rwb") as stream:
+            stream.write(_encode({"op": "subscribe", "key": key, "since": since}))
+            stream.flush()
+            for line in stream:
+                message = json.loads(line)
+                if message.get("ok") is False:
+                    raise JobServiceError(message["error"])
+                if message["event"] == "rows":
+                    yield from message["rows"]
+                elif message["event"] == "end":
+                    if message["state"] == FAILED:
+                        raise JobServiceError(f"Job {key} failed: {message['error']}")
+                    return
+        raise JobServiceError(f"Connection closed while streaming job {key}.")
+
+    def results(self, key: str) -> pd.DataFrame:
+        """Waits for the job and returns its metrics like the datacollector's model vars dataframe."""
+        return pd.DataFrame(list(self.stream(key)))
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Runs the local job service for submitting simulation runs and streaming their metrics.")
+    parser.add_argument("--socket", default=DEFAULT_SOCKET, help="Unix socket path")
+    parser.add_argument("--host", default=None, help="TCP host (with --port)")
+    parser.add_argument("--port", type=int, default=None, help="listen on TCP instead of the Unix socket")
+    parser.add_argument("--workers", type=int, default=max(multiprocessing.cpu_count() - 1, 1), help="jobs run at the same time")
+    parser.add_argument("--store", default=RESULTS_DIR / "cache", help="results store (run cache) for finished jobs")
+    arguments = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)-8s %(message)s", datefmt="%Y-%m-%d %H:%M:%S")
+    try:
+        asyncio.run(serve(arguments.socket, arguments.host, arguments.port, arguments.workers, RunCache(arguments.store)))
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,198 @@
+import gc
+import os
+import sys
+import tracemalloc
+import types
+from collections import Counter
+
+from model_elements.apartment import Apartment
+from model_elements.cell_agent import CellAgent
+from model_elements.developer_agent import DeveloperAgent
+from model_elements.gov_developer import GovDeveloper
+from model_elements.landlord_agent import LandlordAgent
+from model_elements.resident_agent import ResidentAgent
+
+# Allocation sites (path fragments) attributed to each subsystem, first match wins
+SUBSYSTEMS = {
+    "apartments": ("model_elements/apartment.py",),
+    "residents": ("model_elements/resident_agent.py",),
+    "landlords": ("model_elements/landlord_agent.py",),
+    "developers": ("model_elements/developer_agent.py", "model_elements/gov_developer.py"),
+    "cells": ("model_elements/cell_agent.py",),
+    "grid": ("mesa/space.py",),
+    "collector": ("mesa/datacollection.py",),
+    "mesa agents": ("mesa/agent.py", "mesa/model.py"),
+    "logs": ("event_log.py", "transaction_log.py"),
+    "model": ("src/model.py",),
+}
+MODEL_CLASSES = (Apartment, ResidentAgent, LandlordAgent, DeveloperAgent, GovDeveloper, CellAgent)
+
+
+def current_rss() -> int:
+    """Resident set size of the process in bytes (peak RSS where /proc is not available, 0 on Windows)."""
+    try:
+        with open("/proc/self/statm") as file:
+            return int(file.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        pass
+    try:
+        import resource  # POSIX only
+    except ImportError:
+        return 0
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def subsystem_of(traceback) -> str:
+    # the innermost frame that belongs to a known subsystem owns the allocation
+    for frame in reversed(traceback):
+        filename = frame.filename.replace(os.sep, "/")
+        for subsystem, fragments in SUBSYSTEMS.items():
+            if any(fragment in filename for fragment in fragments):
+                return subsystem
+    return "other"
+
+
+def _list_bytes(lists):
+    return sum(sys.getsizeof(items) for items in lists)
+
+
+def _objects_bytes(objects):
+    return sum(sys.getsizeof(obj) + sys.getsizeof(obj.__dict__) for obj in objects)
+
+
+def structural_sizes(model) -> dict:
+    """Shallow size estimates of the model's main containers, in bytes."""
+    cells = list(model.cell_agents_layer.data.flatten())
+    apartments = [apartment for cell in cells for apartment in cell.apartments]
+    return {
+        "apartments": _objects_bytes(apartments),
+        "residents": _objects_bytes(model.agents_by_type.get(ResidentAgent, [])),
+        "landlords": _objects_bytes(model.agents_by_type.get(LandlordAgent, []))
+        + _list_bytes(landlord.owned_properties for landlord in model.agents_by_type.get(LandlordAgent, [])),
+        "cells": _objects_bytes(cells),
+        "listing lists": _list_bytes(cell.apartments_to_rent for cell in cells) + _list_bytes(cell.apartments_to_sell for cell in cells)
+        + _list_bytes(cell.apartments for cell in cells),
+        "grid": _list_bytes(column for column in model.grid._grid) + _list_bytes(content for column in model.grid._grid for content in column),
+        "collector": _list_bytes(model.datacollector.model_vars.values())
+        + sum(sys.getsizeof(value) for values in model.datacollector.model_vars.values() for value in values),
+    }
+
+
+def live_object_counts() -> dict:
+    """Number of live instances of every model class in the whole process (all models together)."""
+    counts = Counter()
+    for obj in gc.get_objects():
+        if isinstance(obj, MODEL_CLASSES):
+            counts[type(obj).__name__] += 1
+    return dict(counts)
+
+
+def model_object_counts(model) -> dict:
+    """Number of instances of every model class reachable from the model's own structures."""
+    counts = {agent_type.__name__: len(agents) for agent_type, agents in model.agents_by_type.items()}
+    counts["Apartment"] = sum(len(cell.apartments) for cell in model.cell_agents_layer.data.flatten())
+    return counts
+
+
+def _referrer_kind(referrer, model):
+    if isinstance(referrer, list):
+        for cell in model.cell_agents_layer.data.flatten():
+            if referrer is cell.apartments_to_rent or referrer is cell.apartments_to_sell:
+                return "cell listing"
+            if referrer is cell.apartments:
+                return "cell apartments"
+        return "list (e.g. owned_properties)"
+    if isinstance(referrer, dict):
+        return "object attribute"
+    return type(referrer).__name__
+
+
+def find_deleted_apartment_leaks(model, max_inspected: int = 100) -> dict:
+    """
+    Apartments detached with `deleted = True` that are still alive, with what keeps them alive
+    (inspected for at most `max_inspected` of them, as gc.get_referrers scans the whole heap).
+    """
+    gc.collect()
+    deleted = [obj for obj in gc.get_objects() if isinstance(obj, Apartment) and obj.deleted]
+    inspected = deleted[:max_inspected]
+    referrers = Counter()
+    for apartment in inspected:
+        for referrer in gc.get_referrers(apartment):
+            # the lists built here refer to every inspected apartment as well
+            if referrer is deleted or referrer is inspected or isinstance(referrer, types.FrameType):
+                continue
+            referrers[_referrer_kind(referrer, model)] += 1
+    return {"deleted_alive": len(deleted), "inspected": len(inspected), "referrers": dict(referrers)}
+
+
+class MemoryMonitor:
+    """
+    Opt-in memory accounting of a model: every `every` steps it takes a tracemalloc snapshot grouped
+    by subsystem, counts live model objects and measures the RSS.
+    """
+
+    def __init__(self, every: int = 500, frames: int = 10, top: int = 10):
+        self.every = every
+        self.frames = frames
+        self.top = top
+        self.samples: list[dict] = []
+        # tracing started by someone else is left running when the monitor is closed
+        self._started_tracing = not tracemalloc.is_tracing()
+        if self._started_tracing:
+            tracemalloc.start(frames)
+
+    def close(self):
+        """Stops tracemalloc if this monitor started it; tracing slows every allocation of the process."""
+        if self._started_tracing:
+            tracemalloc.stop()
+            self._started_tracing = False
+
+    def step(self, model):
+        if model.step_count % self.every == 0:
+            self.sample(model)
+
+    def sample(self, model):
+        snapshot = tracemalloc.take_snapshot().filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, __file__),
+        ))
+        by_subsystem = Counter()
+        for statistic in snapshot.statistics("traceback"):
+            by_subsystem[subsystem_of(statistic.traceback)] += statistic.size
+
+        self.samples.append({
+            "step": model.step_count,
+            "rss": current_rss(),
+            "traced": dict(by_subsystem.most_common()),
+            "structural": structural_sizes(model),
+            "model_objects": model_object_counts(model),
+            "live_objects": live_object_counts(),
+        })
+
+    def report(self, model=None) -> dict:
+        report = {"samples": self.samples}
+        if self.samples:
+            report["peak_rss"] = max(sample["rss"] for sample in self.samples)
+        if model is not None:
+            report["deleted_apartment_leaks"] = find_deleted_apartment_leaks(model)
+        return report
+
+    def format_report(self, model=None) -> str:
+        report = self.report(model)
+        if not self.samples:
+            return "No memory samples were taken."
+
+        last = self.samples[-1]
+        lines = [f"Memory at step {last['step']}: RSS {last['rss'] / 2**20:.1f} MiB (peak sampled {report['peak_rss'] / 2**20:.1f} MiB)"]
+        lines.append("Traced allocations by subsystem:")
+        for subsystem, size in list(last["traced"].items())[:self.top]:
+            lines.append(f"  {subsystem:<16} {size / 2**20:10.2f} MiB")
+        lines.append("Structural estimates:")
+        for subsystem, size in last["structural"].items():
+            lines.append(f"  {subsystem:<16} {size / 2**20:10.2f} MiB")
+        lines.append(f"Model objects: {last['model_objects']}")
+        lines.append(f"Live objects in process: {last['live_objects']}")
+        if "deleted_apartment_leaks" in report:
+            lines.append(f"Deleted apartments still alive: {report['deleted_apartment_leaks']}")
+        return "\n".join(lines)
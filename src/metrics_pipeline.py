@@ -0,0 +1,218 @@
+import os
+import queue
+import threading
+import weakref
+
+import numpy as np
+from mesa import DataCollector
+
+from model_elements.developer_agent import DeveloperAgent
+from model_elements.landlord_agent import LandlordAgent
+from model_elements.resident_agent import ResidentAgent
+
+
+def _tenure(residents) -> dict:
+    return {
+        "weights": np.array([a.weight for a in residents], dtype=np.int64),
+        "rented": np.array([bool(a.rented_apartment) for a in residents], dtype=bool),
+        "owned": np.array([bool(a.owned_apartment) for a in residents], dtype=bool),
+    }
+
+
+def capture(model) -> dict:
+    """
+    Copy of everything the model reporters read, taken at the step boundary: arrays of the residents' tenure,
+    income and happiness, of the listings and of the landlords' and developers' books. The order statistics
+    are read here, they are kept up to date by the agents and cost O(1) or O(log bins) to query.
+    """
+    cells = model.cell_agents_layer.data.flatten()
+    residents = model.agents_by_type.get(ResidentAgent, [])
+    landlords = model.agents_by_type.get(LandlordAgent, [])
+    developers = model.agents_by_type.get(DeveloperAgent, [])
+    stats = model.inequality
+    return {
+        "step": model.step_count,
+        "households": model.num_households,
+        "households_per_resident": model.households_per_resident,
+        "occupied_rents": np.array([a.rent for cell in cells for a in cell.apartments if isinstance(a.owner, LandlordAgent) and a.occupied], dtype=np.float64),
+        "listed_rents": np.array([a.rent for cell in cells for a in cell.apartments_to_rent], dtype=np.float64),
+        "listed_units": np.array([a.units for cell in cells for a in cell.apartments_to_rent], dtype=np.int64),
+        "sale_prices": np.array([a.price for cell in cells for a in cell.apartments_to_sell], dtype=np.float64),
+        "sale_units": np.array([a.units for cell in cells for a in cell.apartments_to_sell], dtype=np.int64),
+        "landlord_margins": np.array([a.profit_margin for a in landlords], dtype=np.float64),
+        "landlord_capital": np.array([a.capital for a in landlords], dtype=np.float64),
+        "landlord_properties": np.array([a.owned_units() for a in landlords], dtype=np.int64),
+        "developer_margins": np.array([a.profit_margin for a in developers], dtype=np.float64),
+        "developer_capital": np.array([a.capital for a in developers], dtype=np.float64),
+        "happiness": np.array([a.happiness_factor for a in residents], dtype=np.float64),
+        "income": np.array([a.income for a in residents], dtype=np.float64),
+        **_tenure(residents),
+        "top": _tenure(model.income_decile(top=True)),
+        "bottom": _tenure(model.income_decile(top=False)),
+        "PropertyValueGini": stats.property_values.gini(),
+        "PropertyValueMedian": stats.property_values.quantile(0.5),
+        "PropertyValueTop10PercentShare": stats.property_values.top_share(max(1, len(stats.property_values) // 10)),
+        "RentGini": stats.rents.gini(),
+        "LandlordCapitalGini": stats.landlord_capital.gini(),
+    }
+
+
+def _households(tenure: dict, mask) -> int:
+    return int(tenure["weights"][mask].sum())
+
+
+def _homeless(tenure: dict):
+    return ~tenure["rented"] & ~tenure["owned"]
+
+
+def _household_average(s: dict, values) -> float:
+    return np.average(values, weights=s["weights"]) if len(values) else np.nan
+
+
+def _decile_share(s: dict, decile: str, mask) -> float:
+    tenure = s[decile]
+    return _households(tenure, mask(tenure)) / max(1, int(tenure["weights"].sum()))
+
+
+def snapshot_reporters() -> dict:
+    """The model reporters of GentrificationModel computed from a capture() snapshot, giving the same values."""
+    return {
+        "Step": lambda s: s["step"],
+        "AverageRent": lambda s: np.mean(np.concatenate([s["occupied_rents"], s["listed_rents"]])),
+        "AverageSellPrice": lambda s: np.mean(s["sale_prices"]),
+        "AverageRentProfitMargin": lambda s: np.mean(s["landlord_margins"]),
+        "AverageDeveloperProfitMargin": lambda s: np.mean(s["developer_margins"]),
+        "PropertyValueGini": lambda s: s["PropertyValueGini"],
+        "PropertyValueMedian": lambda s: s["PropertyValueMedian"],
+        "PropertyValueTop10PercentShare": lambda s: s["PropertyValueTop10PercentShare"],
+        "RentGini": lambda s: s["RentGini"],
+        "LandlordCapitalGini": lambda s: s["LandlordCapitalGini"],
+        "AverageHappiness": lambda s: _household_average(s, s["happiness"]),
+        "HomelessnessRate": lambda s: _households(s, _homeless(s)) / s["households"],
+        "HouseOwnershipRate": lambda s: _households(s, s["owned"]) / s["households"],
+        "RentRate": lambda s: _households(s, s["rented"]) / s["households"],
+        "HomelessnessTop10Percent": lambda s: _decile_share(s, "top", _homeless),
+        "HouseOwnershipTop10Percent": lambda s: _decile_share(s, "top", lambda t: t["owned"]),
+        "RentRateTop10Percent": lambda s: _decile_share(s, "top", lambda t: t["rented"]),
+        "HomelessnessBottom10Percent": lambda s: _decile_share(s, "bottom", _homeless),
+        "HouseOwnershipBottom10Percent": lambda s: _decile_share(s, "bottom", lambda t: t["owned"]),
+        "RentRateBottom10Percent": lambda s: _decile_share(s, "bottom", lambda t: t["rented"]),
+        "HousesToRent": lambda s: int(s["listed_units"].sum()),
+        "HousesToSell": lambda s: int(s["sale_units"].sum()),
+        "DeveloperCapital": lambda s: np.mean(s["developer_capital"]),
+        "LandlordCapital": lambda s: np.mean(s["landlord_capital"]),
+        "LandlordOwnedProperties": lambda s: np.mean(s["landlord_properties"]) / s["households_per_resident"],
+        "ResidentsCount": lambda s: int(s["weights"].sum()),
+        "AverageIncome": lambda s: _household_average(s, s["income"]),
+    }
+
+
+_collectors = weakref.WeakSet()
+
+
+def _before_fork():
+    # a forked child (see branching) starts from the metrics collected so far
+    for collector in list(_collectors):
+        collector.flush()
+
+
+def _after_fork_in_child():
+    for collector in list(_collectors):
+        collector._queue = collector._worker = None
+
+
+os.register_at_fork(before=_before_fork, after_in_child=_after_fork_in_child)
+
+
+def collected_model_vars(datacollector) -> dict:
+    """
+    The model vars collected so far, without waiting for the pending snapshots of a pipelined collector.
+    While a row is being appended its columns differ in length by one.
+    """
+    if isinstance(datacollector, PipelinedDataCollector):
+        return datacollector._model_vars
+    return datacollector.model_vars
+
+
+class PipelinedDataCollector(DataCollector):
+    """
+    DataCollector whose collect() only captures a snapshot of the model (see capture); a background thread
+    computes the reporters from it and appends the values while the simulation goes on. At most
+    `max_pending` snapshots wait, collect() blocks while the queue is full.
+
+    Reading model_vars (and so the dataframe) first waits for the pending snapshots, so readers see exactly
+    what the synchronous collector would have stored. The model reporters are kept for their names and
+    for the model's pickling; they are not called.
+    """
+
+    def __init__(self, model_reporters: dict, max_pending: int = 4):
+        self._model_vars = {}
+        self._queue = None
+        self._worker = None
+        self._error = None
+        super().__init__(model_reporters=model_reporters)
+        self.max_pending = max_pending
+        self.snapshot_reporters = snapshot_reporters()
+        if list(self.snapshot_reporters) != list(self.model_reporters):
+            raise ValueError("The snapshot reporters do not match the model reporters.")
+        _collectors.add(self)
+
+    @property
+    def model_vars(self) -> dict:
+        self.flush()
+        self._raise_error()
+        return self._model_vars
+
+    @model_vars.setter
+    def model_vars(self, value: dict):
+        self._model_vars = value
+
+    def __getstate__(self):
+        self.flush()
+        state = self.__dict__.copy()
+        # threads, queues and the reporter lambdas are rebuilt for the restored collector
+        state.update(_queue=None, _worker=None, snapshot_reporters=None)
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.snapshot_reporters = snapshot_reporters()
+        _collectors.add(self)
+
+    def collect(self, model):
+        self._raise_error()
+        if self._worker is None:
+            self._queue = queue.Queue(self.max_pending)
+            self._worker = threading.Thread(target=self._work, args=(self._queue,), name="metrics", daemon=True)
+            self._worker.start()
+        self._queue.put(capture(model))
+
+    def _work(self, snapshots):
+        while True:
+            snapshot = snapshots.get()
+            try:
+                if snapshot is None:
+                    return
+                if self._error is None:
+                    row = {name: reporter(snapshot) for name, reporter in self.snapshot_reporters.items()}
+                    for name, value in row.items():
+                        self._model_vars[name].append(value)
+            except Exception as error:
+                self._error = error
+            finally:
+                snapshots.task_done()
+
+    def _raise_error(self):
+        if self._error is not None:
+            raise RuntimeError("Metric collection failed.") from self._error
+
+    def flush(self):
+        """Waits until the pending snapshots are collected."""
+        if self._queue is not None:
+            self._queue.join()
+
+    def close(self):
+        if self._worker is not None:
+            self._queue.put(None)
+            self._worker.join()
+            self._queue = self._worker = None
@@ -1,9 +1,9 @@
 import logging
+from copy import copy
 from mesa import Model
 from mesa.space import MultiGrid
 from mesa.datacollection import DataCollector
 from mesa.space import PropertyLayer
-from mesa.visualization import Slider
 import random
 import numpy as np
 
@@ -12,15 +12,19 @@ from model_elements.resident_agent import ResidentAgent
 from model_elements.developer_agent import DeveloperAgent
 from model_elements.landlord_agent import LandlordAgent
 from model_elements.gov_developer import GovDeveloper
+from model_elements.tax_policy import TAX_SEMANTICS_VERSION, AdValoremTax, TaxPolicy
 from model_elements.constants import *
-from helpers import gini_coefficient
-
-# --- SETUP LOGGING ---
-logging.basicConfig(
-    level=logging.INFO,
-    format="%(asctime)s %(levelname)-8s %(message)s",
-    datefmt="%Y-%m-%d %H:%M:%S",
-)
+from helpers import apportion, gini_coefficient
+from event_log import EventLog
+from transaction_log import TransactionLog
+from memory_report import MemoryMonitor
+from order_statistics import InequalityStats
+from timer_wheel import TimerWheel
+from panel import PanelRecorder
+from branching import branch
+from parallel_search import ParallelSearch
+from random_streams import CommonRandomNumbers, GlobalRandom
+from metrics_pipeline import PipelinedDataCollector
 
 class GentrificationModel(Model):
     def __init__(
@@ -31,32 +35,74 @@ class GentrificationModel(Model):
         num_landlords: int = 5,
         gov_developer: int = 0,
         residents_income: list[float] = None,
+        households: int | list[int] = None,
         ad_valorem_tax: bool = False,
+        tax_rules: list = None,
+        grid_height: int = None,
+        seed: int = None,
+        transaction_log: bool = False,
+        memory_interval: int = 0,
+        panel_interval: int = 0,
+        panel_residents_per_decile: int = 10,
+        search_workers: int = 0,
+        common_random_numbers: bool = False,
+        metrics_pipeline: int = 0,
     ):
-        super().__init__()
+        super().__init__(seed=seed)
+        if seed is not None:
+            # agents draw from the global generators, so they have to be seeded as well
+            random.seed(seed)
+            np.random.seed(seed)
+        # stochastic decisions draw from self.rng; common random numbers key the draws instead of consuming streams
+        self.rng = CommonRandomNumbers(self, seed if seed is not None else random.getrandbits(64)) if common_random_numbers else GlobalRandom(self)
+
         self.step_count = 0
-        self.grid_size = grid_size.value if isinstance(grid_size, Slider) else grid_size
-        self.num_residents = num_residents.value if isinstance(num_residents, Slider) else num_residents
-        self.num_developers = num_developers.value if isinstance(num_developers, Slider) else num_developers
-        self.num_landlords = num_landlords.value if isinstance(num_landlords, Slider) else num_landlords
+        self.apartment_count = 0  # apartments ever built, the next apartment uid
+        # the app passes Slider objects; unwrapped by duck typing so that headless runs never import mesa.visualization
+        self.grid_size = getattr(grid_size, "value", grid_size)
+        self.grid_width = self.grid_size
+        self.grid_height = grid_height if grid_height is not None else self.grid_size
+        self.num_residents = getattr(num_residents, "value", num_residents)
+        self.num_developers = getattr(num_developers, "value", num_developers)
+        self.num_landlords = getattr(num_landlords, "value", num_landlords)
         self.residents_income = residents_income if residents_income is not None else [10000, 20000, 30000]
+        # target population: households in total or per income bracket, represented by the resident agents
+        # (see _create_resident_agents); None for one household per agent
+        self.households = getattr(households, "value", households)
+        self.tax_policy = TaxPolicy(tax_rules or [])
         self.ad_valorem_tax = ad_valorem_tax
+        gov_developer = getattr(gov_developer, "value", gov_developer)
 
         self.recent_sell_prices: list[float] = []
         self.recent_rent_prices: list[float] = []
         self.max_recent_prices = 20
 
-        self.grid = MultiGrid(self.grid_size, self.grid_size, torus=False)
+        self.events = EventLog()
+        self.transactions = TransactionLog() if transaction_log else None
+
+        self.inequality = InequalityStats()
+        self.timer_wheel = TimerWheel()  # residents register here; only awake ones are stepped
+        self._income_order = None  # residents sorted by income (ascending, descending); incomes do not change during a run
+        self._num_households = None
+
+        self.collect_every = 1  # switched to sparse collection once the run is stationary
+        self.max_searching_radius = None  # widest search of a resident, None for no limit (see partitioning)
+        self.run_metadata: dict = {"tax_semantics": TAX_SEMANTICS_VERSION}
+        self.memory = MemoryMonitor(memory_interval) if memory_interval else None
+        # residents score listings in parallel and commit serially (see parallel_search); 0 keeps the serial step
+        self.parallel_search = ParallelSearch(search_workers) if search_workers else None
+
+        self.grid = MultiGrid(self.grid_width, self.grid_height, torus=False)
 
         logging.info(
-            f"Initializing GentrificationModel with {num_residents} residents and {self.num_developers} developers."
+            "Initializing GentrificationModel with %d residents and %d developers.", self.num_residents, self.num_developers
         )
 
         # --- Property layers ---
         self.cell_agents_layer = PropertyLayer(
             "cell_agents",
-            self.grid_size,
-            self.grid_size,
+            self.grid_width,
+            self.grid_height,
             default_value=None,
             dtype=CellAgent,
         )
@@ -71,130 +117,263 @@ class GentrificationModel(Model):
         if gov_developer:
             self.add_gov_developer()
 
-        # --- Data Collector ---
-        self.datacollector = DataCollector(
-             model_reporters={
-                "AverageRent": lambda m: np.mean(
-                        [a.rent for cell_agent in m.cell_agents_layer.data.flatten() for a in cell_agent.apartments if isinstance(a.owner, LandlordAgent) and a.occupied] + [a.rent for cell_agent in m.cell_agents_layer.data.flatten() for a in cell_agent.apartments_to_rent]
-                ),
-                "AverageSellPrice": lambda m: np.mean(
-                        [a.price for cell_agent in m.cell_agents_layer.data.flatten() for a in cell_agent.apartments_to_sell]
-                ),  
-
-                "AverageRentProfitMargin": lambda m: np.mean(
-                        [landlord.profit_margin for landlord in m.agents_by_type.get(LandlordAgent, [])]
-                ), 
-                "AverageDeveloperProfitMargin": lambda m: np.mean(
-                        [developer.profit_margin for developer in m.agents_by_type.get(DeveloperAgent, [])]
-                ),
-
-
-                
-            #     "PropertyValueGini": lambda m: gini_coefficient(
-            #         [a.property_value for a in m.agents_by_type.get(cell_agent, [])]
-            #     ),
-            #     "VacancyRate": lambda m: sum(
-            #         len(s) for s in m.empty_apartments_layer.data.flatten()
-            #     )
-            #     / sum(len(a) for a in m.apartments_layer.data.flatten()),
-            #     # Social
-            #     "SettledResidents": lambda m: sum(
-            #         1 for a in m.agents_by_type.get(resident_agent, []) if a.is_settled
-            #     ),
-            #     "DisplacedResidents": lambda m: sum(
-            #         1
-            #         for a in m.agents_by_type.get(resident_agent, [])
-            #         if not a.is_settled
-            #     ),
-                "AverageHappiness": lambda m: np.mean(
-                    [
-                        a.happiness_factor
-                        for a in m.agents_by_type.get(ResidentAgent, [])
-                    ]
-                ),
-                "HomelessnessRate": lambda m: sum(1 for a in m.agents_by_type.get(ResidentAgent, []) if not a.rented_apartment and not a.owned_apartment)
-                    / m.num_residents,
-                "HouseOwnershipRate": lambda m: sum(1 for a in m.agents_by_type.get(ResidentAgent, []) if a.owned_apartment)
-                    / m.num_residents,
-                "RentRate": lambda m: np.sum(1 for a in m.agents_by_type.get(ResidentAgent, []) if a.rented_apartment)
-                    / m.num_residents,
-
-                "HomelessnessTop10Percent": lambda m: sum(1 for a in sorted(m.agents_by_type.get(ResidentAgent, []), key=lambda x: x.income, reverse=True)[:max(1, m.num_residents // 10)] if not a.rented_apartment and not a.owned_apartment)/ max(1, m.num_residents // 10),
-                "HouseOwnershipTop10Percent": lambda m: sum(1 for a in sorted(m.agents_by_type.get(ResidentAgent, []), key=lambda x: x.income, reverse=True)[:max(1, m.num_residents // 10)] if a.owned_apartment)/ max(1, m.num_residents // 10),
-                "RentRateTop10Percent": lambda m: sum(1 for a in sorted(m.agents_by_type.get(ResidentAgent, []), key=lambda x: x.income, reverse=True)[:max(1, m.num_residents // 10)] if a.rented_apartment)/ max(1, m.num_residents // 10),
-
-                "HomelessnessBottom10Percent": lambda m: sum(1 for a in sorted(m.agents_by_type.get(ResidentAgent, []), key=lambda x: x.income)[:max(1, m.num_residents // 10)] if not a.rented_apartment and not a.owned_apartment)/ max(1, m.num_residents // 10),
-                "HouseOwnershipBottom10Percent": lambda m: sum(1 for a in sorted(m.agents_by_type.get(ResidentAgent, []), key=lambda x: x.income)[:max(1, m.num_residents // 10)] if a.owned_apartment)/ max(1, m.num_residents // 10),
-                "RentRateBottom10Percent": lambda m: sum(1 for a in sorted(m.agents_by_type.get(ResidentAgent, []), key=lambda x: x.income)[:max(1, m.num_residents // 10)] if a.rented_apartment)/ max(1, m.num_residents // 10),
-                
-                "HousesToRent": lambda m: sum(len(cell.apartments_to_rent) for cell in self.cell_agents_layer.data.flatten()),
-                "HousesToSell": lambda m: sum(len(cell.apartments_to_sell) for cell in self.cell_agents_layer.data.flatten()),
-                
-                "DeveloperCapital": lambda m: np.mean(
-                    [a.capital for a in m.agents_by_type.get(DeveloperAgent, [])]
-                ),
-                "LandlordCapital": lambda m: np.mean(
-                    [a.capital for a in m.agents_by_type.get(LandlordAgent, [])]
-                ),
-                "LandlordOwnedProperties": lambda m: np.mean(
-                    [len(a.owned_properties) for a in m.agents_by_type.get(LandlordAgent, [])]
-                ),
-
-                "ResidentsCount": lambda m: len(m.agents_by_type.get(ResidentAgent, [])),
-
-                "AverageIncome": lambda m: np.mean(
-                    [a.income for a in m.agents_by_type.get(ResidentAgent, [])]
-                ),
-                
-                # "DeveloperCapitalAM": lambda m: np.mean(
-                #     [
-                #         a.capital
-                #         for a in m.agents_by_type.get(DeveloperAgent, []) if a.flag == 'AM'
-                #     ]
-                # ),
-                # "DeveloperCapitalBM": lambda m: np.mean(
-                #     [
-                #         a.capital
-                #         for a in m.agents_by_type.get(DeveloperAgent, []) if a.flag == 'BM'
-                #     ]
-                # ),
-
-
-
-            #     "AverageTenure": lambda m: np.mean(
-            #         [
-            #             a.time_since_last_move
-            #             for a in m.agents_by_type.get(resident_agent, [])
-            #             if a.is_settled
-            #         ]
-            #     ),
-            #     # Development
-            #     "UpgradedProperties": lambda m: sum(
-            #         1 for a in m.agents_by_type.get(cell_agent, []) if a.is_upgraded
-            #     ),
-             }
-        )
+        # trajectories of a sample of residents (stratified by income decile) and all landlords
+        self.panel = PanelRecorder(self, panel_interval, panel_residents_per_decile, seed=seed) if panel_interval else None
 
-    def add_gov_developer(self):
-        gov_dev = GovDeveloper(self)
+        # --- Data Collector ---
+        if metrics_pipeline:
+            # reporters run on a background thread from snapshots, at most `metrics_pipeline` of them pending
+            self.datacollector = PipelinedDataCollector(self._model_reporters(), max_pending=metrics_pipeline)
+        else:
+            self.datacollector = DataCollector(model_reporters=self._model_reporters())
+
+    def _model_reporters(self):
+        return {
+            "Step": lambda m: m.step_count,
+            "AverageRent": lambda m: np.mean(
+                    [a.rent for cell_agent in m.cell_agents_layer.data.flatten() for a in cell_agent.apartments if isinstance(a.owner, LandlordAgent) and a.occupied] + [a.rent for cell_agent in m.cell_agents_layer.data.flatten() for a in cell_agent.apartments_to_rent]
+            ),
+            "AverageSellPrice": lambda m: np.mean(
+                    [a.price for cell_agent in m.cell_agents_layer.data.flatten() for a in cell_agent.apartments_to_sell]
+            ),  
+
+            "AverageRentProfitMargin": lambda m: np.mean(
+                    [landlord.profit_margin for landlord in m.agents_by_type.get(LandlordAgent, [])]
+            ), 
+            "AverageDeveloperProfitMargin": lambda m: np.mean(
+                    [developer.profit_margin for developer in m.agents_by_type.get(DeveloperAgent, [])]
+            ),
+
+
+            "PropertyValueGini": lambda m: m.inequality.property_values.gini(),
+            "PropertyValueMedian": lambda m: m.inequality.property_values.quantile(0.5),
+            "PropertyValueTop10PercentShare": lambda m: m.inequality.property_values.top_share(max(1, len(m.inequality.property_values) // 10)),
+            "RentGini": lambda m: m.inequality.rents.gini(),
+            "LandlordCapitalGini": lambda m: m.inequality.landlord_capital.gini(),
+        #     "VacancyRate": lambda m: sum(
+        #         len(s) for s in m.empty_apartments_layer.data.flatten()
+        #     )
+        #     / sum(len(a) for a in m.apartments_layer.data.flatten()),
+        #     # Social
+        #     "SettledResidents": lambda m: sum(
+        #         1 for a in m.agents_by_type.get(resident_agent, []) if a.is_settled
+        #     ),
+        #     "DisplacedResidents": lambda m: sum(
+        #         1
+        #         for a in m.agents_by_type.get(resident_agent, [])
+        #         if not a.is_settled
+        #     ),
+            "AverageHappiness": lambda m: m.household_average(lambda a: a.happiness_factor),
+            "HomelessnessRate": lambda m: sum(a.weight for a in m.agents_by_type.get(ResidentAgent, []) if not a.rented_apartment and not a.owned_apartment)
+                / m.num_households,
+            "HouseOwnershipRate": lambda m: sum(a.weight for a in m.agents_by_type.get(ResidentAgent, []) if a.owned_apartment)
+                / m.num_households,
+            "RentRate": lambda m: sum(a.weight for a in m.agents_by_type.get(ResidentAgent, []) if a.rented_apartment)
+                / m.num_households,
+
+            "HomelessnessTop10Percent": lambda m: sum(a.weight for a in m.income_decile(top=True) if not a.rented_apartment and not a.owned_apartment) / m.decile_households(top=True),
+            "HouseOwnershipTop10Percent": lambda m: sum(a.weight for a in m.income_decile(top=True) if a.owned_apartment) / m.decile_households(top=True),
+            "RentRateTop10Percent": lambda m: sum(a.weight for a in m.income_decile(top=True) if a.rented_apartment) / m.decile_households(top=True),
+
+            "HomelessnessBottom10Percent": lambda m: sum(a.weight for a in m.income_decile(top=False) if not a.rented_apartment and not a.owned_apartment) / m.decile_households(top=False),
+            "HouseOwnershipBottom10Percent": lambda m: sum(a.weight for a in m.income_decile(top=False) if a.owned_apartment) / m.decile_households(top=False),
+            "RentRateBottom10Percent": lambda m: sum(a.weight for a in m.income_decile(top=False) if a.rented_apartment) / m.decile_households(top=False),
+            
+            "HousesToRent": lambda m: sum(a.units for cell in m.cell_agents_layer.data.flatten() for a in cell.apartments_to_rent),
+            "HousesToSell": lambda m: sum(a.units for cell in m.cell_agents_layer.data.flatten() for a in cell.apartments_to_sell),
+            
+            "DeveloperCapital": lambda m: np.mean(
+                [a.capital for a in m.agents_by_type.get(DeveloperAgent, [])]
+            ),
+            "LandlordCapital": lambda m: np.mean(
+                [a.capital for a in m.agents_by_type.get(LandlordAgent, [])]
+            ),
+            # per landlord represented, as a landlord agent stands for households_per_resident landlords
+            "LandlordOwnedProperties": lambda m: np.mean(
+                [a.owned_units() for a in m.agents_by_type.get(LandlordAgent, [])]
+            ) / m.households_per_resident,
+
+            "ResidentsCount": lambda m: sum(a.weight for a in m.agents_by_type.get(ResidentAgent, [])),
+
+            "AverageIncome": lambda m: m.household_average(lambda a: a.income),
+            
+            # "DeveloperCapitalAM": lambda m: np.mean(
+            #     [
+            #         a.capital
+            #         for a in m.agents_by_type.get(DeveloperAgent, []) if a.flag == 'AM'
+            #     ]
+            # ),
+            # "DeveloperCapitalBM": lambda m: np.mean(
+            #     [
+            #         a.capital
+            #         for a in m.agents_by_type.get(DeveloperAgent, []) if a.flag == 'BM'
+            #     ]
+            # ),
+
+
+
+        #     "AverageTenure": lambda m: np.mean(
+        #         [
+        #             a.time_since_last_move
+        #             for a in m.agents_by_type.get(resident_agent, [])
+        #             if a.is_settled
+        #         ]
+        #     ),
+        #     # Development
+        #     "UpgradedProperties": lambda m: sum(
+        #         1 for a in m.agents_by_type.get(cell_agent, []) if a.is_upgraded
+        #     ),
+        }
+
+    def __getstate__(self):
+        # reporters are lambdas, which cannot be pickled; they are rebuilt for the restored model
+        state = self.__dict__.copy()
+        state["datacollector"] = copy(self.datacollector)
+        state["datacollector"].model_reporters = {}
+        # the agents draw from the global generators, whose state is part of the model's: a restored
+        # (e.g. cached) model continues exactly like the original would have
+        state["_global_random_state"] = random.getstate(), np.random.get_state()
+        return state
+
+    def __setstate__(self, state):
+        python_state, numpy_state = state.pop("_global_random_state")
+        self.__dict__.update(state)
+        self.datacollector.model_reporters = self._model_reporters()
+        random.setstate(python_state)
+        np.random.set_state(numpy_state)
+
+    @property
+    def tax_rules(self) -> list:
+        return list(self.tax_policy.rules)
+
+    @tax_rules.setter
+    def tax_rules(self, rules):
+        # recompiled once per policy change, landlords only read the tables
+        self.tax_policy = TaxPolicy(rules)
+
+    @property
+    def ad_valorem_tax(self) -> bool:
+        return any(isinstance(rule, AdValoremTax) for rule in self.tax_policy.rules)
+
+    @ad_valorem_tax.setter
+    def ad_valorem_tax(self, value: bool):
+        if value == self.ad_valorem_tax:
+            return
+        rules = [rule for rule in self.tax_policy.rules if not isinstance(rule, AdValoremTax)]
+        self.tax_rules = rules + [AdValoremTax()] if value else rules
+
+    def branch(self, interventions, n: int = 1, steps: int = 0, **options) -> list:
+        """Continuations of this model with each intervention, run in forked processes (see branching.branch)."""
+        return branch(self, interventions, n=n, steps=steps, **options)
+
+    def close(self):
+        self.events.close()
+        if self.memory is not None:
+            self.memory.close()
+        if self.parallel_search is not None:
+            self.parallel_search.close()
+        if isinstance(self.datacollector, PipelinedDataCollector):
+            self.datacollector.close()
+
+    def next_apartment_uid(self) -> int:
+        self.apartment_count += 1
+        return self.apartment_count - 1
+
+    def residents_changed(self):
+        self._income_order = None
+        self._num_households = None
+
+    def income_decile(self, top: bool) -> list:
+        """The 10% richest (top=True) or poorest residents, from a cached income order instead of sorting every step."""
+        residents = self.agents_by_type.get(ResidentAgent, [])
+        if self._income_order is None or len(self._income_order[0]) != len(residents):
+            # two stable sorts, so residents with equal incomes are picked exactly as before
+            self._income_order = (sorted(residents, key=lambda x: x.income), sorted(residents, key=lambda x: x.income, reverse=True))
+        order = self._income_order[1 if top else 0]
+        # residents until they stand for a tenth of the households
+        target, households, count = max(1, self.num_households // 10), 0, 0
+        while count < len(order) and households < target:
+            households += order[count].weight
+            count += 1
+        return order[:max(1, count)]
+
+    @property
+    def num_households(self) -> int:
+        if self._num_households is None:
+            self._num_households = sum(a.weight for a in self.agents_by_type.get(ResidentAgent, []))
+        return self._num_households
+
+    def scaled_apartments(self, count: int) -> int:
+        """Number of apartments of apartment_units units holding as many households as `count` apartments of one household per agent."""
+        return max(1, round(count * self.households_per_resident / self.apartment_units))
+
+    def household_average(self, value) -> float:
+        """Mean of value(resident) over all households (residents weighted by the households they stand for)."""
+        residents = self.agents_by_type.get(ResidentAgent, [])
+        if not len(residents):
+            return np.nan
+        return np.average([value(a) for a in residents], weights=[a.weight for a in residents])
+
+    def decile_households(self, top: bool) -> int:
+        return max(1, sum(a.weight for a in self.income_decile(top)))
+
+    def record_transaction(self, event, apartment, actor=None, counterparty=None, amount=0.0):
+        if self.transactions is not None:
+            self.transactions.record(self.step_count, event, apartment, actor, counterparty, amount)
+
+    def add_gov_developer(self, **quota):
+        gov_dev = GovDeveloper(self, **quota)
         self.grid.place_agent(gov_dev, (0, 0))
         self.num_developers += 1
-        logging.info(f"🏛️ Government Developer added.")
+        self.events.log("gov_developer_added", "🏛️ Government Developer added.")
 
     def _create_cell_agents(self):
-        for x in range(self.grid_size):
-            for y in range(self.grid_size):
-                bills = np.random.normal(loc=1000.0, scale=100.0)
-                cell = CellAgent(self, (x,y), bills)
+        # one draw for the whole grid, the same numbers as drawing cell by cell
+        bills = np.random.normal(loc=1000.0, scale=100.0, size=(self.grid_width, self.grid_height)).tolist()
+        for x in range(self.grid_width):
+            for y in range(self.grid_height):
+                cell = CellAgent(self, (x,y), bills[x][y])
                 self.cell_agents_layer.set_cell((x, y), cell)
 
     def _create_resident_agents(self):
-        for _ in range(self.num_residents):
-            income = random.choice(self.residents_income)
-            x, y = random.randrange(self.grid_size), random.randrange(self.grid_size)
-            resident = ResidentAgent(self, income)
-
-            self.grid.place_agent(resident, (x, y))
+        # incomes and positions of all residents are drawn at once, the agents are then only constructed and placed
+        if self.households is None:
+            incomes = np.random.choice(self.residents_income, size=self.num_residents).tolist()
+            weights = [1] * self.num_residents
+        else:
+            incomes, weights = self._household_weights()
+        xs = np.random.randint(self.grid_width, size=self.num_residents).tolist()
+        ys = np.random.randint(self.grid_height, size=self.num_residents).tolist()
+
+        place_agent = self.grid.place_agent
+        for income, weight, x, y in zip(incomes, weights, xs, ys):
+            place_agent(ResidentAgent(self, income, weight=weight), (x, y))
+
+        # the calibration: apartments are built big enough for any resident, quotas scale with the households per agent
+        self.apartment_units = max(weights, default=1)
+        self.households_per_resident = sum(weights) / self.num_residents if self.num_residents else 1.0
+
+    def _household_weights(self):
+        """
+        Incomes and weights of the residents standing for the target population: the households of every
+        income bracket are split among the bracket's share of the agents, so weights differ between brackets
+        (and by at most one within a bracket) and add up to the target of every bracket.
+        """
+        if isinstance(self.households, int):
+            targets = apportion(self.households, [1] * len(self.residents_income))
+        else:
+            targets = list(self.households)
+            if len(targets) != len(self.residents_income):
+                raise ValueError(f"{len(targets)} household targets for {len(self.residents_income)} income brackets.")
+        # every bracket is represented by as many agents, as when incomes are drawn uniformly from the brackets
+        agents = apportion(self.num_residents, [1] * len(targets), minimum=1)
+        incomes, weights = [], []
+        for income, target, count in zip(self.residents_income, targets, agents):
+            if target < count:
+                raise ValueError(f"The income bracket {income} has {target} households for {count} resident agents.")
+            incomes += [income] * count
+            weights += apportion(target, [1] * count)
+        return incomes, weights
 
     def _create_developer_agents(self):
         for _ in range(self.num_developers):
@@ -209,7 +388,14 @@ class GentrificationModel(Model):
 
     def step(self):
         self.step_count += 1
-
+        self.events.step = self.step_count
+        try:
+            self._step_agents()
+        except Exception:
+            self.events.dump()
+            raise
+
+    def _step_agents(self):
         # if self.step_count % 10 == 0:
         #     for _ in range(random.randint(1, 3)):#int(self.num_residents + 1 - self.num_residents):
         #         income = random.choice(self.residents_income)
@@ -229,18 +415,26 @@ class GentrificationModel(Model):
             gov_dev.step(self.step_count)
 
         landlords = list(self.agents_by_type.get(LandlordAgent, []))
-        self.random.shuffle(landlords)
+        self.rng.shuffle(landlords, "landlord_order")
         for landlord in landlords:
             landlord.step()
             
         avg_rent = np.mean([cell.get_avg_rent() for cell in self.cell_agents_layer.data.flatten()])
         avg_price = np.mean([cell.get_avg_cost() for cell in self.cell_agents_layer.data.flatten()])
-        residents = list(self.agents_by_type.get(ResidentAgent, []))
-        self.random.shuffle(residents)
-        for resident in residents:
-            resident.step(self.step_count, avg_rent, avg_price)
-
-        self.datacollector.collect(self)
+        residents = self.timer_wheel.due(self.step_count)
+        self.rng.shuffle(residents, "resident_order")
+        if self.parallel_search is not None:
+            self.parallel_search.step(self, residents, self.step_count, avg_rent, avg_price)
+        else:
+            for resident in residents:
+                resident.step(self.step_count, avg_rent, avg_price)
+
+        if self.step_count % self.collect_every == 0:
+            self.datacollector.collect(self)
+        if self.memory is not None:
+            self.memory.step(self)
+        if self.panel is not None:
+            self.panel.step(self)
 
         if len(self.recent_sell_prices) > self.max_recent_prices:
             self.recent_sell_prices = self.recent_sell_prices[-self.max_recent_prices:]
@@ -1,17 +1,32 @@
+import itertools
 import logging
 import random
 from typing import Tuple
 
+from model_elements.constants import FRESHNESS_DECAY_RATE
+from transaction_log import MarketEvent
+
+_apartment_ids = itertools.count()
+
 class Apartment:
     def __init__(
-        self, position: Tuple[int, int], price: float, bills: float, owner = None, rent: float = 0, occupied: bool = False
+        self, position: Tuple[int, int], price: float, bills: float, owner = None, rent: float = 0, occupied: bool = False, model = None, units: int = 1
     ):
+        # numbered per model, so branches of a run number the apartments they build alike
+        self.uid = model.next_apartment_uid() if model is not None else next(_apartment_ids)
         self.position = position
-        self.freshness = random.uniform(0.95, 1.0)
-        
-        self.price = price # price for which apartment can be bought
+        self.units = units  # identical units, one per household; prices, rents and bills are per unit
+        self.model = model  # its step count is the clock of the lazily decaying freshness
+        self.freshness = model.rng.uniform(0.95, 1.0, "freshness", self.uid) if model is not None else random.uniform(0.95, 1.0)
+
+        self.stats = model.inequality if model is not None else None  # notified about price and rent changes
+        self.rent_tracked = False  # rent counted in the rent statistics (held by a landlord)
+        if self.stats is not None:
+            self.stats.property_values.add(price, units)
+
+        self.price = price # price for which apartment can be bought, changed through set_price
         self.bills = bills # monthly bills (utilities, maintenance, property tax, etc.) - paid to town
-        self.rent = rent # monthly rent - paid to landlord
+        self.rent = rent # monthly rent - paid to landlord, changed through set_rent
 
         self.occupied = occupied
         self.time_at_market = 0
@@ -23,6 +38,19 @@ class Apartment:
         #DEBUG: TODO: remove
         self.deleted = False  # Flag to indicate if the apartment has been deleted
 
+    # plain attributes are read in the residents' search loop, so changes go through setters instead of properties
+    def set_price(self, price: float):
+        if self.stats is not None:
+            self.stats.property_values.update(self.price, price, self.units)
+        self.price = price
+
+    def set_rent(self, rent: float):
+        if self.rent_tracked:
+            self.stats.rents.update(self.rent, rent, self.units)
+        self.rent = rent
+        if self.tenant is not None:
+            self.tenant.wake()
+
     # @property
     # def owner(self):
     #     return self._owner
@@ -32,11 +60,58 @@ class Apartment:
     #     # logging.info(f"Transferring ownership of apartment {self.position} from {self._owner} to {value}")
     #     self._owner = value
 
-    def update_freshness(self, decay_rate = 0.99):
-        self.freshness = self.freshness * decay_rate
+    @property
+    def freshness(self):
+        """Decays by FRESHNESS_DECAY_RATE every month; the months elapsed since the last write are applied on read."""
+        if self.model is not None and self.model.step_count != self._freshness_step:
+            # month by month, so the value is exactly the one of an eager per-step update
+            freshness = self._freshness
+            for _ in range(self.model.step_count - self._freshness_step):
+                freshness = freshness * FRESHNESS_DECAY_RATE
+            self._freshness = freshness
+            self._freshness_step = self.model.step_count
+        return self._freshness
+
+    @freshness.setter
+    def freshness(self, value):
+        self._freshness = value
+        self._freshness_step = self.model.step_count if self.model is not None else 0
 
     def reset_freshness(self):
-        self.freshness = random.uniform(0.85, 1.0)
+        self.freshness = self.model.rng.uniform(0.85, 1.0, "freshness", self.uid) if self.model is not None else random.uniform(0.85, 1.0)
+        if self.tenant is not None:
+            self.tenant.wake()
+
+    def split(self, units: int):
+        """
+        Splits `units` off into a new apartment of the same owner, listed wherever this one is, so that a
+        resident standing for fewer households than this apartment has units leaves the rest on the market.
+        The new listing is recorded like a new build or a landlord's listing, so replays of the transaction
+        log see its units.
+        """
+        part = Apartment(self.position, self.price, self.bills, owner=self.owner, rent=self.rent, model=self.model, units=units)
+        part.freshness = self.freshness
+        part.time_at_market, part.time_rented = self.time_at_market, self.time_rented
+        if self.stats is not None:
+            self.stats.property_values.remove(self.price, units)
+        if self.rent_tracked:
+            self.stats.rents.remove(self.rent, units)
+        self.units -= units
+        if self.rent_tracked:
+            self.stats.track_rent(part)
+
+        cell = self.model.cell_agents_layer.data[self.position]
+        cell.apartments.append(part)
+        if self in cell.apartments_to_sell:
+            cell.apartments_to_sell.append(part)
+            self.model.record_transaction(MarketEvent.BUILD, part, part.owner, amount=part.price)
+        if self in cell.apartments_to_rent:
+            cell.apartments_to_rent.append(part)
+            self.owner.apts_to_rent_count += 1  # rentals are listed by landlords
+            self.model.record_transaction(MarketEvent.LIST, part, part.owner, amount=part.rent)
+        if hasattr(self.owner, "owned_properties"):
+            self.owner.owned_properties.append(part)
+        return part
 
     def full_cost(self):
         return self.rent + self.bills
@@ -1,4 +1,3 @@
-import logging
 from typing import Tuple
 import numpy as np
 from mesa import Agent
@@ -21,6 +20,7 @@ class CellAgent(Agent):
         self.apartments_to_sell: list[Apartment] = []
 
     def remove_apartment(self, apartment: Apartment):
+        self.model.inequality.remove_apartment(apartment)
         apartment.position = None
         apartment.owner = None
         apartment.tenant = None
@@ -48,29 +48,28 @@ class CellAgent(Agent):
             # bills_change = np.random.normal(loc=0.03, scale=0.02)
             # self.bills *= (1 + bills_change)
         
+        events = self.model.events
         for apt in self.apartments:
             # apt.bills = self.bills
-            apt.update_freshness()
-            
+            # freshness decays lazily, see Apartment.freshness
             if apt.owner is None:
-                logging.info(f"‼️Warning: Apartment at {apt.position} has no owner.")
-                logging.info(f"Apartment.deleted = {apt.deleted}, Apartment.occupied = {apt.occupied}, Apartment.owner = {apt.owner}, Apartment.tenant = {apt.tenant}, Apartment.time_at_market = {apt.time_at_market}, Apartment.time_rented = {apt.time_rented}")
+                events.warning("apartment_without_owner", "‼️Warning: Apartment at %s has no owner. deleted = %s, occupied = %s, tenant = %s, time_at_market = %s, time_rented = %s",
+                               apt.position, apt.deleted, apt.occupied, apt.tenant, apt.time_at_market, apt.time_rented)
 
         for apt in self.apartments_to_rent:
             if apt not in self.apartments:
-                logging.info(f"‼️Warning: Apartment at {apt.position} listed for rent but not in cell apartments.")
+                events.warning("rent_listing_outside_cell", "‼️Warning: Apartment at %s listed for rent but not in cell apartments.", apt.position)
             if not isinstance(apt.owner, LandlordAgent):
-                logging.info(f"‼️Warning: Apartment at {apt.position} listed for rent but owner is not a landlord or developer.")
+                events.warning("rent_listing_not_landlord", "‼️Warning: Apartment at %s listed for rent but owner is not a landlord.", apt.position)
 
         for apt in self.apartments_to_sell:
             if apt not in self.apartments:
-                logging.info(f"‼️Warning: Apartment at {apt.position} listed for sale but not in cell apartments.")
+                events.warning("sale_listing_outside_cell", "‼️Warning: Apartment at %s listed for sale but not in cell apartments.", apt.position)
             if not isinstance(apt.owner, DeveloperAgent ) and not isinstance(apt.owner, GovDeveloper):
-                logging.info(f"‼️Warning: Apartment at {apt.position} listed for sale but owner is not a landlord or developer.")
-                logging.info(f"Apartment owner type: {type(apt.owner)}")
+                events.warning("sale_listing_not_developer", "‼️Warning: Apartment at %s listed for sale but owner is not a developer (owner type: %s).", apt.position, type(apt.owner))
             if apt.deleted:
-                logging.info(f"‼️Warning: Apartment at {apt.position} listed for sale but marked as deleted.")
+                events.warning("sale_listing_deleted", "‼️Warning: Apartment at %s listed for sale but marked as deleted.", apt.position)
             if apt.owner is None:
-                logging.info(f"‼️Warning: Apartment at {apt.position} listed for sale but has no owner.")
+                events.warning("sale_listing_without_owner", "‼️Warning: Apartment at %s listed for sale but has no owner.", apt.position)
         #print values of all atributes of the cell:
         # logging.info (f"Cell {self.position} - Bills: {self.bills:.2f}, Apartments: {(self.apartments)}, For Rent: {(self.apartments_to_rent)}, For Sale: {(self.apartments_to_sell)}")
@@ -1,6 +1,11 @@
 HAPPINESS_FACTOR_THRESHOLD = 0.4
 HAPPINESS_DECAY_RATE = 0.95  # check: 0.98
 SEARCHING_RADIUS_INCREASE_RATE = 1.1
+SEARCHING_RADIUS = 2  # cells a resident looks around itself, widened by find_apt_to_rent after a failed search
+FRESHNESS_DECAY_RATE = 0.99  # monthly decay of apartment freshness
+MIN_RENT_MONTHS = 6  # unhappy renters look for a new apartment after this many months
+MAX_RENT_MONTHS = 12  # renters look for a new apartment after this many months
+MAX_OWNERSHIP_MONTHS = 60  # owners sell and move out after this many months
 MORTGAGE_MONTHLY_FACTOR = 0.0067 # ~7% yearly interest rate for 30 years
 HOUSE_BUILD_COST = 350_000
 FULL_HOUSE_RENOVATION_COST = 50_000
@@ -13,4 +18,11 @@ START_RENT_PRICE = 1000
 
 DEVELOPER_CELL_LOOKUP_COUNT = 5
 
-AD_VALOREM_TAX = [(0.01, 4), (0.02, 6), (0.04, 8), (0.08, 12)] #(tax_rate, apts_threshold) - if owner has more apartments than threshold, tax_rate is applied to apartments
\ No newline at end of file
+DEVELOPER_MAX_UNITS = 25  # a developer stops building with this many units unsold (per household an agent stands for)
+GOV_DEVELOPER_MAX_PROPERTIES = 200  # the government developer stops building with this many units unsold (likewise)
+GOV_DEVELOPER_BUILD_SITES = 10  # cells built on in a building month
+GOV_DEVELOPER_SITE_APARTMENTS = 10  # apartments built on every site
+
+AD_VALOREM_TAX = [(0.01, 4), (0.02, 6), (0.04, 8), (0.08, 12)] #(tax_rate, apts_threshold) - if owner has more apartments than threshold, tax_rate is applied to apartments
+VACANCY_TAX_RATE = 0.02  # yearly, on the value of vacant rental apartments
+RENT_CAP_MAX_INCREASE = 0.03  # highest rent raise for a sitting tenant under a rent cap
@@ -1,4 +1,3 @@
-import logging
 import random
 from mesa import Agent
 import numpy as np
@@ -6,6 +5,7 @@ import numpy as np
 from model_elements.apartment import Apartment
 from model_elements.constants import *
 from model_elements.resident_agent import ResidentAgent
+from transaction_log import MarketEvent
 
 class DeveloperAgent(Agent):
     def __init__(self, model, profit_margin: float):
@@ -14,10 +14,12 @@ class DeveloperAgent(Agent):
         self.build_month = random.randint(0, 9)  # Random month to consider building new properties
 
         self.owned_properties: list[Apartment] = []
-        self.capital = START_DEVELOPERS_CAPITAL * np.random.normal(loc=1.0, scale=0.05)
+        # an agent stands for as many developers as a resident agent stands for households
+        self.capital = START_DEVELOPERS_CAPITAL * self.model.households_per_resident * np.random.normal(loc=1.0, scale=0.05)
 
     def build_house(self, cell):
-        self.capital -= HOUSE_BUILD_COST
+        units = self.model.apartment_units
+        self.capital -= HOUSE_BUILD_COST * units
 
         sell_prices = self.model.recent_sell_prices
         avg_price = np.mean(sell_prices) if sell_prices else HOUSE_BUILD_COST 
@@ -26,33 +28,38 @@ class DeveloperAgent(Agent):
             if tendention > 0:
                 avg_price *= 1 + tendention / avg_price
 
-        apartment = Apartment(position=cell.position, price = avg_price * (1 + self.profit_margin), bills=cell.bills, owner=self)
+        apartment = Apartment(position=cell.position, price = avg_price * (1 + self.profit_margin), bills=cell.bills, owner=self, model=self.model, units=units)
         
         cell.apartments.append(apartment)
         cell.apartments_to_sell.append(apartment)
         self.owned_properties.append(apartment)
+        self.model.record_transaction(MarketEvent.BUILD, apartment, self, amount=apartment.price)
+
+    def owned_units(self) -> int:
+        return sum(apartment.units for apartment in self.owned_properties)
 
     def manage_house_for_sale(self, apartment: Apartment):
         apartment.freshness = max(apartment.freshness, 0.90)  # Ensure minimum freshness for unused apartments
         
         apartment.time_at_market += 1
         if apartment.time_at_market % 3 == 0:
-            apartment.price = max(HOUSE_BUILD_COST, apartment.price * 0.98)  # Reduce price by 2% if not sold in 3 months
+            apartment.set_price(max(HOUSE_BUILD_COST, apartment.price * 0.98))  # Reduce price by 2% if not sold in 3 months
+            self.model.record_transaction(MarketEvent.PRICE_CHANGE, apartment, self, amount=apartment.price)
 
     def sell_house(self, apartment: Apartment):
-        self.capital += apartment.price
+        self.capital += apartment.price * apartment.units
         self.model.recent_sell_prices.append(apartment.price)
 
         if apartment in self.owned_properties:
             self.owned_properties.remove(apartment)
         else:
-            logging.warning(f"Warning: Developer {self.unique_id} tried to sell apartment {apartment.position} not in owned properties.")
+            self.model.events.warning("sold_unowned_apartment", "Warning: Developer %s tried to sell apartment %s not in owned properties.", self.unique_id, apartment.position)
 
         cell = self.model.cell_agents_layer.data[apartment.position]
         if apartment in cell.apartments_to_sell:
             cell.apartments_to_sell.remove(apartment)
         else:
-            logging.warning(f"Warning: Apartment {apartment.position} not found in cell's apartments_to_sell list during sale.")
+            self.model.events.warning("sold_unlisted_apartment", "Warning: Apartment %s not found in cell's apartments_to_sell list during sale.", apartment.position)
         
         apartment.owner = None
         apartment.occupied = False
@@ -63,9 +70,10 @@ class DeveloperAgent(Agent):
             self.manage_house_for_sale(house)
 
         if step % 10 == self.build_month:
-            homeless_residents = len([agent for agent in self.model.agents_by_type.get(ResidentAgent, []) if not agent.owned_apartment])
+            homeless_residents = sum(agent.weight for agent in self.model.agents_by_type.get(ResidentAgent, []) if not agent.owned_apartment)
 
-            if homeless_residents > self.model.num_residents * 0.1 and self.capital > HOUSE_BUILD_COST and len(self.owned_properties) < 25:
-                cell = random.choice(self.model.cell_agents_layer.data.flatten())
-                for _ in range(min(50, int(self.capital // HOUSE_BUILD_COST))):
+            build_cost = HOUSE_BUILD_COST * self.model.apartment_units
+            if homeless_residents > self.model.num_households * 0.1 and self.capital > build_cost and self.owned_units() < DEVELOPER_MAX_UNITS * self.model.households_per_resident:
+                cell = self.model.rng.choice(self.model.cell_agents_layer.data.flatten(), "build_cell", self.unique_id)
+                for _ in range(min(self.model.scaled_apartments(50), int(self.capital // build_cost))):
                     self.build_house(cell)
\ No newline at end of file
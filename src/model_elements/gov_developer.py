@@ -1,14 +1,17 @@
-import logging
 import random
 from mesa import Agent
 
 from model_elements.apartment import Apartment
 from model_elements.constants import *
 from model_elements.resident_agent import ResidentAgent
+from transaction_log import MarketEvent
 
 class GovDeveloper(Agent):
-    def __init__(self, model):
+    def __init__(self, model, max_properties: int = GOV_DEVELOPER_MAX_PROPERTIES, build_sites: int = GOV_DEVELOPER_BUILD_SITES):
         super().__init__(model)
+        # a share of the programme: a partitioned city splits the cap and the sites between its regions
+        self.max_properties = max_properties
+        self.build_sites = build_sites
         self.profit_margin = 0.05  # Starting desired profit margin for investments
         self.build_month = random.randint(0, 9)  # Random month to consider building new properties
 
@@ -16,10 +19,11 @@ class GovDeveloper(Agent):
         self.capital = 1  # Government developer has infinite capital
 
     def build_house(self, cell):
-        apartment = Apartment(position=cell.position, price=HOUSE_BUILD_COST * (1 + self.profit_margin), bills=cell.bills, owner=self)
+        apartment = Apartment(position=cell.position, price=HOUSE_BUILD_COST * (1 + self.profit_margin), bills=cell.bills, owner=self, model=self.model, units=self.model.apartment_units)
         cell.apartments.append(apartment)
         cell.apartments_to_sell.append(apartment)
         self.owned_properties.append(apartment)
+        self.model.record_transaction(MarketEvent.BUILD, apartment, self, amount=apartment.price)
 
     def manage_house_for_sale(self, apartment: Apartment):
         apartment.freshness = max(apartment.freshness, 0.9)  # Ensure minimum freshness for unsold apartments
@@ -28,13 +32,13 @@ class GovDeveloper(Agent):
         if apartment in self.owned_properties:
             self.owned_properties.remove(apartment)
         else:
-            logging.warning(f"Warning: Developer {self.unique_id} tried to sell apartment {apartment.position} not in owned properties.")
+            self.model.events.warning("sold_unowned_apartment", "Warning: Developer %s tried to sell apartment %s not in owned properties.", self.unique_id, apartment.position)
 
         cell = self.model.cell_agents_layer.data[apartment.position]
         if apartment in cell.apartments_to_sell:
             cell.apartments_to_sell.remove(apartment)
         else:
-            logging.warning(f"Warning: Apartment {apartment.position} not found in cell's apartments_to_sell list during sale.")
+            self.model.events.warning("sold_unlisted_apartment", "Warning: Apartment %s not found in cell's apartments_to_sell list during sale.", apartment.position)
         
         self.model.recent_sell_prices.append(apartment.price)
         apartment.owner = None
@@ -46,12 +50,13 @@ class GovDeveloper(Agent):
             self.manage_house_for_sale(house)
 
         if step % 10 == self.build_month:
-            homeless_residents = len([agent for agent in self.model.agents_by_type.get(ResidentAgent, []) if not agent.owned_apartment ])
+            homeless_residents = sum(agent.weight for agent in self.model.agents_by_type.get(ResidentAgent, []) if not agent.owned_apartment)
             
-            if homeless_residents > self.model.num_residents * 0.05 and len(self.owned_properties) < 200:
-                for _ in range(10):
-                    cell = random.choice(self.model.cell_agents_layer.data.flatten())
-                    for _ in range (10):
+            unsold = sum(apartment.units for apartment in self.owned_properties)
+            if homeless_residents > self.model.num_households * 0.05 and unsold < self.max_properties * self.model.households_per_resident:
+                for site in range(self.build_sites):
+                    cell = self.model.rng.choice(self.model.cell_agents_layer.data.flatten(), "build_cell", self.unique_id, site)
+                    for _ in range(self.model.scaled_apartments(GOV_DEVELOPER_SITE_APARTMENTS)):
                         self.build_house(cell)
 
         # logging.info(f"👷Developer {self.unique_id} has capital: {self.capital:.2f}, profit margin: {self.profit_margin:.2f}, and {len(self.owned_properties)} properties to sell.")
\ No newline at end of file
@@ -1,4 +1,3 @@
-import logging
 import random
 from mesa import Agent
 import numpy as np
@@ -7,6 +6,7 @@ from model_elements.apartment import Apartment
 from model_elements.constants import *
 from model_elements.developer_agent import DeveloperAgent
 from model_elements.gov_developer import GovDeveloper
+from transaction_log import MarketEvent
 
 class LandlordAgent(Agent):
     def __init__(self, model, profit_margin: float):
@@ -15,27 +15,40 @@ class LandlordAgent(Agent):
 
         self.owned_properties: list[Apartment] = []
         self.apts_to_rent_count = 0
-        self.starting_capital = START_LANDLORDS_CAPITAL * np.random.normal(loc=1.0, scale=0.05)
-        self.capital = self.starting_capital
+        # an agent stands for as many landlords as a resident agent stands for households
+        self.starting_capital = START_LANDLORDS_CAPITAL * model.households_per_resident * np.random.normal(loc=1.0, scale=0.05)
+        self._capital = self.starting_capital
+        model.inequality.landlord_capital.add(max(self._capital, 0))
+
+    @property
+    def capital(self):
+        return self._capital
+
+    @capital.setter
+    def capital(self, value):
+        # debts count as no wealth in the capital distribution
+        self.model.inequality.landlord_capital.update(max(self._capital, 0), max(value, 0))
+        self._capital = value
+
+    def owned_units(self) -> int:
+        return sum(apartment.units for apartment in self.owned_properties)
+
+    def portfolio_size(self, units: int) -> int:
+        """Portfolio of each of the landlords this agent stands for, the size the tax rates are looked up by."""
+        return max(1, round(units / self.model.households_per_resident))
 
     def calc_roi(self, apartment: Apartment):
-        full_buy_cost = apartment.price + ((1 - apartment.freshness) if apartment.freshness < 0.7 else 0) * FULL_HOUSE_RENOVATION_COST * random.uniform(0.8, 1.2)
+        full_buy_cost = apartment.price + ((1 - apartment.freshness) if apartment.freshness < 0.7 else 0) * FULL_HOUSE_RENOVATION_COST * self.model.rng.uniform(0.8, 1.2, "purchase_renovation", self.unique_id, apartment.uid)
         avg_rent = np.mean(self.model.recent_rent_prices) if self.model.recent_rent_prices else START_RENT_PRICE
 
-        tax = 0
-        if self.model.ad_valorem_tax and len(self.owned_properties) + 1 > AD_VALOREM_TAX[0][0]:
-                for index, (tax_rate, apts_threshold) in enumerate(AD_VALOREM_TAX[1:], start=1):
-                    if len(self.owned_properties) < apts_threshold:
-                        tax = apartment.price * AD_VALOREM_TAX[index - 1][0] / 12
-                        break
-                else:
-                    tax = apartment.price * AD_VALOREM_TAX[-1][0] / 12
+        # the apartment would be taxed as part of the portfolio including it
+        tax = self.model.tax_policy.unit_tax(self.portfolio_size(self.owned_units() + apartment.units), apartment.price)
 
         monthly_rent = avg_rent * (1 + self.profit_margin) - tax  # Adjusted for potential tax
         return full_buy_cost / monthly_rent   # ROI in months
 
     def buy_property(self):
-        cells = random.sample(list(self.model.cell_agents_layer.data.flatten()), DEVELOPER_CELL_LOOKUP_COUNT)
+        cells = self.model.rng.sample(list(self.model.cell_agents_layer.data.flatten()), DEVELOPER_CELL_LOOKUP_COUNT, "purchase_cells", self.unique_id)
         
         best_offer = None
         best_roi = np.inf
@@ -44,7 +57,7 @@ class LandlordAgent(Agent):
             apts_for_sale = cell.apartments_to_sell
 
             for apartment in apts_for_sale:
-                if apartment.price > self.capital:
+                if apartment.price * apartment.units > self.capital:
                     continue
 
                 roi = self.calc_roi(apartment)
@@ -60,11 +73,14 @@ class LandlordAgent(Agent):
             cell.apartments_to_rent.append(apartment)
 
 
+            self.model.record_transaction(MarketEvent.BUY, apartment, self, apartment.owner, apartment.price)
             if apartment.owner:
                 apartment.owner.sell_house(apartment)
 
-            full_buy_cost = apartment.price + ((1 - apartment.freshness) if apartment.freshness < 0.7 else 0) * FULL_HOUSE_RENOVATION_COST * random.uniform(0.8, 1.2)
-            self.capital -= full_buy_cost
+            full_buy_cost = apartment.price + ((1 - apartment.freshness) if apartment.freshness < 0.7 else 0) * FULL_HOUSE_RENOVATION_COST * self.model.rng.uniform(0.8, 1.2, "purchase_renovation", self.unique_id, apartment.uid)
+            self.capital -= full_buy_cost * apartment.units
+            if full_buy_cost > apartment.price:
+                self.model.record_transaction(MarketEvent.RENOVATION, apartment, self, amount=full_buy_cost - apartment.price)
 
             self.owned_properties.append(apartment)
             apartment.owner = self
@@ -72,12 +88,14 @@ class LandlordAgent(Agent):
             apartment.tenant = None
            
             apartment.reset_freshness()
+            self.model.inequality.track_rent(apartment)
             avg_rent = np.mean(self.model.recent_rent_prices) if self.model.recent_rent_prices else START_RENT_PRICE
             # if self.model.ad_valorem_tax:
             #     tax_rate, apts_threshold = AD_VALOREM_TAX
             #     if len(self.owned_properties) > apts_threshold:
             #         avg_rent += apartment.price * tax_rate / 12
-            apartment.rent = avg_rent * (1 + self.profit_margin)
+            apartment.set_rent(avg_rent * (1 + self.profit_margin))
+            self.model.record_transaction(MarketEvent.LIST, apartment, self, amount=apartment.rent)
             
             apartment.time_rented = 0   
             apartment.time_at_market = 0
@@ -88,25 +106,15 @@ class LandlordAgent(Agent):
     def manage_rental_house(self, apartment: Apartment):
         if apartment.occupied:
             apartment.time_rented += 1
-            tax = 0
-            
-            if self.model.ad_valorem_tax and len(self.owned_properties) > AD_VALOREM_TAX[0][0]:
-                avg_sell_price = np.mean(self.model.recent_sell_prices) if self.model.recent_sell_prices else START_HOUSE_PRICE
-                for index, (tax_rate, apts_threshold) in enumerate(AD_VALOREM_TAX[1:], start=1):
-                    if len(self.owned_properties) < apts_threshold:
-                        tax = avg_sell_price * AD_VALOREM_TAX[index - 1][0] / 12
-                        break
-                else:
-                    tax = avg_sell_price * AD_VALOREM_TAX[-1][0] / 12
-
-            self.capital += apartment.rent - tax
+            self.capital += apartment.rent * apartment.units
             #From time to time, increase rent if tenant stayed long enough
-            if apartment.time_rented % 12 == 0 and random.random() < 0.5:
-                apartment.rent *= np.random.normal(loc=1.05, scale=0.02)
+            if apartment.time_rented % 12 == 0 and self.model.rng.random("rent_raise", self.unique_id, apartment.uid) < 0.5:
+                raised_rent = apartment.rent * self.model.rng.normal(1.05, 0.02, "rent_bump", self.unique_id, apartment.uid)
                 avg_rent = np.mean(self.model.recent_rent_prices) if self.model.recent_rent_prices else START_RENT_PRICE
-                apartment.rent = max(apartment.rent, avg_rent)
+                apartment.set_rent(self.model.tax_policy.cap_rent(apartment.rent, max(raised_rent, avg_rent)))
+                self.model.record_transaction(MarketEvent.RENT_CHANGE, apartment, self, apartment.tenant, apartment.rent)
         else:
-            self.capital -= apartment.bills
+            self.capital -= apartment.bills * apartment.units
             apartment.time_at_market += 1
             # Looking for a new tenant, adjust rent
             # if apartment.time_at_market == 1:
@@ -117,11 +125,26 @@ class LandlordAgent(Agent):
             #         apartment.reset_freshness()
             if apartment.time_at_market > 2:
                 # self.profit_margin *= 0.98  # Decrease profit margin if it tooks too long to rent
-                apartment.rent = apartment.rent * 0.975  # Reduce rent by 2% if not rented in 3 months
+                apartment.set_rent(apartment.rent * 0.975)  # Reduce rent by 2% if not rented in 3 months
+                self.model.record_transaction(MarketEvent.RENT_CHANGE, apartment, self, amount=apartment.rent)
 
                 if apartment.freshness < 0.4:
-                    self.capital -= FULL_HOUSE_RENOVATION_COST * (1 - apartment.freshness) * random.uniform(0.8, 1.2)
+                    renovation_cost = FULL_HOUSE_RENOVATION_COST * (1 - apartment.freshness) * self.model.rng.uniform(0.8, 1.2, "renovation", self.unique_id, apartment.uid)
+                    self.capital -= renovation_cost * apartment.units
                     apartment.reset_freshness()
+                    self.model.record_transaction(MarketEvent.RENOVATION, apartment, self, amount=renovation_cost)
+
+    def pay_taxes(self):
+        """Taxes of the whole portfolio, one lookup in the model's compiled tax policy per step."""
+        policy = self.model.tax_policy
+        if not policy.taxed or not self.owned_properties:
+            return
+        units = self.owned_units()
+        occupied = sum(apartment.units for apartment in self.owned_properties if apartment.occupied)
+        avg_sell_price = np.mean(self.model.recent_sell_prices) if self.model.recent_sell_prices else START_HOUSE_PRICE
+        tax = policy.portfolio_tax(self.portfolio_size(units), occupied, units - occupied, avg_sell_price)
+        if tax:
+            self.capital -= tax
 
     def rent_house(self, apartment: Apartment):
         apartment.owner = self
@@ -130,10 +153,10 @@ class LandlordAgent(Agent):
         if apartment in cell.apartments_to_rent:
             cell.apartments_to_rent.remove(apartment)
         else:
-            logging.warning(f"⚠️ Apartment {apartment.index} at {apartment.position} was not listed for rent in cell data.")
+            self.model.events.warning("rented_unlisted_apartment", "⚠️ Apartment at %s was not listed for rent in cell data.", apartment.position)
         apartment.time_rented = 0
         apartment.time_at_market = 0
-        self.capital += apartment.rent
+        self.capital += apartment.rent * apartment.units
         self.apts_to_rent_count -= 1
         self.model.recent_rent_prices.append(apartment.rent)
 
@@ -148,19 +171,21 @@ class LandlordAgent(Agent):
         if apartment not in cell.apartments_to_rent:
             cell.apartments_to_rent.append(apartment)
         else:
-            logging.warning(f"⚠️ Apartment {apartment.index} at {apartment.position} was already listed for rent in cell data.")
+            self.model.events.warning("relisted_apartment", "⚠️ Apartment at %s was already listed for rent in cell data.", apartment.position)
         avg_rent = np.mean(self.model.recent_rent_prices) if self.model.recent_rent_prices else START_RENT_PRICE
-        apartment.rent = avg_rent * (1 + self.profit_margin)
+        apartment.set_rent(avg_rent * (1 + self.profit_margin))
+        self.model.record_transaction(MarketEvent.LIST, apartment, self, amount=apartment.rent)
         # logging.info(f"🏃 Tenant moved out of apartment {apartment.index} at {apartment.position}. Apartment is now available for rent.")
 
     def step(self):
         if self.capital < 0:
-            logging.info(f"💸 Landlord {self.unique_id} is out of capital and must sell a property.")
+            self.model.events.log("landlord_out_of_capital", "💸 Landlord %s is out of capital and must sell a property.", self.unique_id)
             if any(not apt.occupied for apt in self.owned_properties):
-                apt = random.choice([apt for apt in self.owned_properties if not apt.occupied])
+                apt = self.model.rng.choice([apt for apt in self.owned_properties if not apt.occupied], "forced_sale", self.unique_id)
                 cell = self.model.cell_agents_layer.data[apt.position]
                 cell.apartments_to_rent.remove(apt)
-                apt.owner = random.choice(self.model.agents_by_type.get(DeveloperAgent, []))
+                self.model.inequality.untrack_rent(apt)
+                apt.owner = self.model.rng.choice(self.model.agents_by_type.get(DeveloperAgent, []), "forced_sale_buyer", self.unique_id)
                 apt.owner.owned_properties.append(apt)
                 apt.occupied = False
                 apt.time_at_market = 0
@@ -170,8 +195,9 @@ class LandlordAgent(Agent):
                 self.apts_to_rent_count -= 1
                 avg_sell_price = np.mean(self.model.recent_sell_prices) if self.model.recent_sell_prices else START_HOUSE_PRICE
                 cell.apartments_to_sell.append(apt)
-                apt.price = avg_sell_price
-                self.capital += apt.price * 0.9  # Assume some selling cost
+                apt.set_price(avg_sell_price)
+                self.capital += apt.price * apt.units * 0.9  # Assume some selling cost
+                self.model.record_transaction(MarketEvent.FORCED_SALE, apt, self, apt.owner, apt.price)
 
             elif any(self.owned_properties) and False:
                 apt = random.choice(self.owned_properties)
@@ -186,7 +212,7 @@ class LandlordAgent(Agent):
                 self.apts_to_sell.append(apt)
                 avg_price = np.mean([apt.price for apt in cell.apartments if apt.index in cell.apartments_to_sell]) if cell.apartments_to_sell else HOUSE_BUILD_COST
                 cell.apartments_to_sell.add(apt.index)
-                apt.price = avg_price * random.uniform(1.05, 1.15)
+                apt.set_price(avg_price * random.uniform(1.05, 1.15))
             # else:
             #     logging.info(f"💀 Landlord {self.unique_id} went bankrupt and is removed from the simulation.")
             #     self.remove()
@@ -194,8 +220,9 @@ class LandlordAgent(Agent):
 
         for house in self.owned_properties:
             self.manage_rental_house(house)
+        self.pay_taxes()
 
-        if self.capital > HOUSE_BUILD_COST and random.random() < 0.7 and self.apts_to_rent_count <= 2:
+        if self.capital > HOUSE_BUILD_COST and self.model.rng.random("invest", self.unique_id) < 0.7 and self.apts_to_rent_count <= 2:
             self.buy_property()
 
         # logging.info(f"🐛 Landlord {self.unique_id} has capital: {self.capital:.2f} and {len(self.owned_properties) + len(self.apts_to_sell)} properties")
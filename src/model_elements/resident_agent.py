@@ -1,15 +1,16 @@
-import logging
 from mesa import Agent
 import random
-from math import log
+from math import ceil, exp, log
 
 import numpy as np
 from model_elements.constants import *
+from transaction_log import MarketEvent
 
 class ResidentAgent(Agent):
-    def __init__(self, model, income, searching_radius=2):
+    def __init__(self, model, income, searching_radius=SEARCHING_RADIUS, weight=1):
         super().__init__(model)
         self.income = income * 0.6  # assume residents spend 50% of income on housing
+        self.weight = weight  # identical households this agent stands for, housed in as many units
 
         self.rented_apartment = None
         self.time_apt_rented = 0
@@ -21,12 +22,30 @@ class ResidentAgent(Agent):
 
         self.happiness_factor = 0
 
+        self.last_step = None  # last step in which the resident was stepped
+        model.timer_wheel.add(self)
+
+    @property
+    def happiness_factor(self):
+        if self.wake_step is not None and self.rented_apartment:
+            # asleep: the happiness follows the freshness of the apartment, as if update_happiness ran every step
+            return self.rental_happiness(self.rented_apartment)
+        return self._happiness_factor
+
+    @happiness_factor.setter
+    def happiness_factor(self, value):
+        self._happiness_factor = value
+
+    def wake(self):
+        self.model.timer_wheel.wake(self)
+
     def __repr__(self):
         return f"Resident(unique_id={self.unique_id}, income={self.income}, happiness_factor={self.happiness_factor}, status = {'rented' if self.rented_apartment else 'owned' if self.owned_apartment else 'homeless'})"
 
     def assign_apartment(self, apartment, owned):
         #Selling the house
         if self.owned_apartment:
+                self.model.record_transaction(MarketEvent.VACATE, self.owned_apartment, self)
                 cell = self.model.cell_agents_layer.data[self.owned_apartment.position]
                 # Usuń apartament ze wszystkich list w komórce
                 cell.apartments.remove(self.owned_apartment)
@@ -36,11 +55,13 @@ class ResidentAgent(Agent):
                 #     cell.apartments_to_rent.remove(self.owned_apartment)
                 self.owned_apartment.owner = None
                 self.owned_apartment.deleted = True
+                self.model.inequality.remove_apartment(self.owned_apartment)
                 self.owned_apartment.occupied = False
                 self.owned_apartment.tenant = None
 
         #Moving out from rented apartment
         if self.rented_apartment:
+            self.model.record_transaction(MarketEvent.VACATE, self.rented_apartment, self, self.rented_apartment.owner, self.rented_apartment.rent)
             self.rented_apartment.tenant = None
             self.rented_apartment.occupied = False
             self.rented_apartment.time_at_market = 0
@@ -48,8 +69,9 @@ class ResidentAgent(Agent):
             try:
                 self.rented_apartment.owner.tenant_moved_out(self.rented_apartment) # notify landlord
             except:
-                logging.info(f"Error: Apartment {self.rented_apartment} at {self.rented_apartment.position} could not notify landlord about tenant move out.")
-                logging.info(f"Apartment.deleted = {self.rented_apartment.deleted}, Apartment.occupied = {self.rented_apartment.occupied}, Apartment.owner = {self.rented_apartment.owner}, Apartment.tenant = {self.rented_apartment.tenant}, Apartment.time_at_market = {self.rented_apartment.time_at_market}, Apartment.time_rented = {self.rented_apartment.time_rented}")
+                apt = self.rented_apartment
+                self.model.events.warning("tenant_move_out_failed", "Error: Apartment at %s could not notify landlord about tenant move out. deleted = %s, occupied = %s, owner = %s, time_at_market = %s, time_rented = %s",
+                                          apt.position, apt.deleted, apt.occupied, apt.owner, apt.time_at_market, apt.time_rented)
 
         self.rented_apartment = None
         self.time_apt_rented = 0
@@ -59,9 +81,12 @@ class ResidentAgent(Agent):
             
         """Move resident into an apartment."""
         if apartment:
+            if apartment.units > self.weight:
+                apartment.split(apartment.units - self.weight)
             if owned:
                 # if apartment.owner:
                 #     try:
+                self.model.record_transaction(MarketEvent.BUY, apartment, self, apartment.owner, apartment.price)
                 apartment.owner.sell_house(apartment)
                     # except:
                     #     logging.info(f"Error: Apartment {apartment} at {apartment.position} could not be sold to Resident {self.unique_id}.")
@@ -81,6 +106,7 @@ class ResidentAgent(Agent):
                 self.rented_apartment = apartment
                 apartment.occupied = True
                 apartment.tenant = self
+                self.model.record_transaction(MarketEvent.RENT, apartment, self, apartment.owner, apartment.rent)
 
         self.update_happiness()
 
@@ -90,8 +116,7 @@ class ResidentAgent(Agent):
         additionally if resident owns the apartment, happiness is boosted to log((1-(income / local rent)) * apr.freshness + 0.2) + 1
         """
         if self.rented_apartment:
-            temp = (1 - ((self.rented_apartment.full_cost()) / self.income)) * self.rented_apartment.freshness
-            self.happiness_factor = max(log(temp) + 1 if temp > 0 else 0, 0)
+            self.happiness_factor = self.rental_happiness(self.rented_apartment)
             return
         
         if self.owned_apartment:
@@ -102,6 +127,26 @@ class ResidentAgent(Agent):
         
         self.happiness_factor = -1
 
+    def rental_happiness(self, apartment):
+        temp = (1 - ((apartment.full_cost()) / self.income)) * apartment.freshness
+        return max(log(temp) + 1 if temp > 0 else 0, 0)
+
+    def rental_score(self, full_cost, freshness):
+        """Partial happiness of renting a listing, None if the resident cannot afford it."""
+        if full_cost > self.income:
+            return None
+        return (1 - (full_cost / self.income)) * freshness
+
+    def purchase_score(self, price, bills, freshness):
+        """Partial happiness of buying a listing, None if the mortgage is out of reach."""
+        if self.income < price * MORTGAGE_MONTHLY_FACTOR:
+            return None
+        return (1 - (bills / self.income)) * freshness
+
+    @staticmethod
+    def candidate_happiness(partial_happiness):
+        return max(log(partial_happiness) + 1 if partial_happiness > 0 else 0, 0)
+
     def find_apt_to_rent(self):
         x,y = self.pos
 
@@ -121,8 +166,10 @@ class ResidentAgent(Agent):
             apts_for_rental = cell_agent.apartments_to_rent
 
             for candidate_apartment in apts_for_rental:
-                if random.random() < 0.2:
+                if self.model.rng.random("skip_listing", self.unique_id, candidate_apartment.uid) < 0.2:
                     continue
+                if candidate_apartment.units < self.weight:
+                    continue  # too small for the households of this resident
 
                 partial_happiness = (1 - ((candidate_apartment.full_cost()) / self.income)) * candidate_apartment.freshness
                 # candidate_happiness = log(temp) + 1 if temp > 0 else 0
@@ -137,7 +184,7 @@ class ResidentAgent(Agent):
             # logging.info(
             #     f"✅ Resident {self.unique_id} FOUND a new home. Moving from {x, y} to {best_apartment[0].position} (happiness {self.happiness_factor:.2f})."
             # )
-        else:
+        elif self.model.max_searching_radius is None or self.searching_radius < self.model.max_searching_radius:
             self.searching_radius += 1
             # logging.info(
             #     f"❌ Resident {self.unique_id} at {x, y} has not moved. No better options found."
@@ -156,14 +203,13 @@ class ResidentAgent(Agent):
             include_center=True,
             radius=self.searching_radius,
         )
-        best_apartment = None
         best_rental_apartment = None
         best_purchase_apartment = None
         best_rental_happiness = float('-inf')
         best_purchase_happiness = float('-inf')
 
         for nx, ny in neighborhood:
-            if random.random() < 0.1:
+            if self.model.rng.random("skip_cell", self.unique_id, nx, ny) < 0.1:
                 continue
 
             cell_agent = self.model.cell_agents_layer.data[nx, ny]
@@ -172,33 +218,43 @@ class ResidentAgent(Agent):
             apts_for_sale = cell_agent.apartments_to_sell
 
             for candidate_apartment in apts_for_rental:
-                if random.random() < 0.2:
-                    continue
-                
-                if candidate_apartment.full_cost() > self.income:
+                if self.model.rng.random("skip_listing", self.unique_id, candidate_apartment.uid) < 0.2:
                     continue
+                if candidate_apartment.units < self.weight:
+                    continue  # too small for the households of this resident
+
+                full_cost = candidate_apartment.full_cost()
+                if full_cost > self.income:
+                    continue  # unaffordable, skipped before the (lazily decayed) freshness is read
+                temp = self.rental_score(full_cost, candidate_apartment.freshness)
 
-                temp = (1 - ((candidate_apartment.full_cost()) / self.income)) * candidate_apartment.freshness
                 # candidate_happiness = max(log(temp) + 1 if temp > 0 else 0, 0)
                 if temp > best_rental_happiness:
                     best_rental_apartment = candidate_apartment
                     best_rental_happiness = temp
 
             for candidate_apartment in apts_for_sale:
-                if random.random() < 0.2:
+                if self.model.rng.random("skip_listing", self.unique_id, candidate_apartment.uid) < 0.2:
                     continue
-                if self.income < candidate_apartment.price * MORTGAGE_MONTHLY_FACTOR:
+                if candidate_apartment.units < self.weight:
                     continue
+                if self.income < candidate_apartment.price * MORTGAGE_MONTHLY_FACTOR:
+                    continue  # unaffordable, as in purchase_score
+                temp = self.purchase_score(candidate_apartment.price, candidate_apartment.bills, candidate_apartment.freshness)
 
-                temp = (1 - (candidate_apartment.bills / self.income)) * candidate_apartment.freshness
                 # candidate_happiness = max(log(temp) + 1 if temp > 0 else 0, 0)
 
                 if temp > best_purchase_happiness:
                     best_purchase_apartment = candidate_apartment
                     best_purchase_happiness = temp
 
-        candidate_rental_happiness = max(log(best_rental_happiness) + 1 if best_rental_happiness > 0 else 0, 0)
-        candidate_purchase_happiness = max(log(best_purchase_happiness) + 1 if best_purchase_happiness > 0 else 0, 0)
+        self.choose_apartment(best_rental_apartment, best_rental_happiness, best_purchase_apartment, best_purchase_happiness)
+
+    def choose_apartment(self, best_rental_apartment, best_rental_happiness, best_purchase_apartment, best_purchase_happiness):
+        """Moves into the better of the best rental and the best purchase found, if it beats the current home."""
+        best_apartment = None
+        candidate_rental_happiness = self.candidate_happiness(best_rental_happiness)
+        candidate_purchase_happiness = self.candidate_happiness(best_purchase_happiness)
 
         if candidate_purchase_happiness >= candidate_rental_happiness and best_purchase_apartment:
             best_apartment = (best_purchase_apartment, True)
@@ -225,23 +281,38 @@ class ResidentAgent(Agent):
             self.update_happiness()
 
     def step(self, step, avg_rent, avg_price):
+        if self.begin_step(step, avg_rent, avg_price):
+            self.find_apt_to_rent_or_buy()
+        self.schedule_wakeup(step)
+
+    def begin_step(self, step, avg_rent, avg_price) -> bool:
+        """Everything a resident does in a step before searching; returns whether it searches for an apartment."""
+        if self.last_step is not None and step - self.last_step > 1:
+            # months spent asleep in the timer wheel
+            skipped = step - self.last_step - 1
+            if self.rented_apartment:
+                self.time_apt_rented += skipped
+            elif self.owned_apartment:
+                self.time_apt_owned += skipped
+        self.last_step = step
+
         if step % 12 == 0:
             pass
             # income_change = np.random.normal(loc=0.03, scale=0.02)
             # self.income *= (1 + income_change)
 
-        if not self.rented_apartment and not self.owned_apartment and (self.income > avg_rent * 0.8 or self.income > avg_price * MORTGAGE_MONTHLY_FACTOR * 0.8 or random.random() < 0.1):
-            self.find_apt_to_rent_or_buy()
+        if not self.rented_apartment and not self.owned_apartment and (self.income > avg_rent * 0.8 or self.income > avg_price * MORTGAGE_MONTHLY_FACTOR * 0.8 or self.model.rng.random("homeless_search", self.unique_id) < 0.1):
+            return True
 
         elif self.rented_apartment:
             self.time_apt_rented += 1
-            if (self.happiness_factor < HAPPINESS_FACTOR_THRESHOLD and random.random() > self.happiness_factor and self.time_apt_rented > 6) or self.time_apt_rented > 12:
-                self.find_apt_to_rent_or_buy()
+            if (self.happiness_factor < HAPPINESS_FACTOR_THRESHOLD and self.model.rng.random("renter_search", self.unique_id) > self.happiness_factor and self.time_apt_rented > MIN_RENT_MONTHS) or self.time_apt_rented > MAX_RENT_MONTHS:
+                return True
 
             elif self.rented_apartment.full_cost() > self.income * 1.2:
                 self.assign_apartment(None, False)
                 # logging.info(f"🏚️ Resident {self.unique_id} at {self.pos} moved out because of high rent cost")
-                self.find_apt_to_rent_or_buy()
+                return True
             else:
                 self.update_happiness()
         
@@ -249,7 +320,32 @@ class ResidentAgent(Agent):
             self.time_apt_owned += 1
             self.update_happiness()
 
-            if self.time_apt_owned > 60:
+            if self.time_apt_owned > MAX_OWNERSHIP_MONTHS:
                 self.assign_apartment(None, False)
                 # logging.info(f"🏚️ Resident {self.unique_id} at {self.pos} moved out because of long ownership. New agent takes his place")
 
+        return False
+
+    def schedule_wakeup(self, step):
+        """
+        Puts a settled resident to sleep until the step before its next possible decision:
+        the end of the lease or of the ownership, or the month its happiness drops below the threshold.
+        Unhappy renters draw a random number every step and stay awake; a rent change wakes the tenant early.
+        """
+        if self.rented_apartment:
+            apartment = self.rented_apartment
+            if self.happiness_factor < HAPPINESS_FACTOR_THRESHOLD or apartment.full_cost() > self.income * 1.2:
+                return
+            decision_step = step + MAX_RENT_MONTHS + 1 - self.time_apt_rented
+            base = (1 - apartment.full_cost() / self.income) * apartment.freshness
+            # freshness decays geometrically; one step of margin against rounding
+            months_happy = log(exp(HAPPINESS_FACTOR_THRESHOLD - 1) / base) / log(FRESHNESS_DECAY_RATE)
+            decision_step = min(decision_step, step + ceil(months_happy) - 1)
+        elif self.owned_apartment:
+            decision_step = step + MAX_OWNERSHIP_MONTHS + 1 - self.time_apt_owned
+        else:
+            return
+
+        # the step before the decision is taken for real, so that the decision sees an exact happiness
+        if decision_step - 1 > step + 1:
+            self.model.timer_wheel.sleep(self, decision_step - 1)
@@ -0,0 +1,106 @@
+from model_elements.constants import AD_VALOREM_TAX, RENT_CAP_MAX_INCREASE, VACANCY_TAX_RATE
+
+MAX_PORTFOLIO_SIZE = 64  # portfolio sizes beyond the tables are charged like the largest one
+# Bumped whenever a rule changes what it charges, recorded with every run so that results are only compared
+# within one version. 1: the original ad valorem brackets (a landlord paid the rate of the first threshold
+# not yet reached: 1% from one apartment on, 8% from 12); 2: a bracket applies above its threshold.
+TAX_SEMANTICS_VERSION = 2
+
+
+class PolicyRule:
+    """
+    A housing policy rule, declared once: the yearly tax rates it charges on occupied and vacant apartments
+    by portfolio size, and how it limits a rent raise of a sitting tenant. The defaults charge nothing and
+    cap nothing, so a rule overrides only the hooks it needs.
+    """
+
+    def occupied_rate(self, portfolio_size: int) -> float:
+        return 0.0
+
+    def vacant_rate(self, portfolio_size: int) -> float:
+        return 0.0
+
+    def cap_rent(self, rent: float, new_rent: float) -> float:
+        return new_rent
+
+
+class AdValoremTax(PolicyRule):
+    """
+    Yearly tax on the value of occupied rental apartments. `brackets` are (tax_rate, apts_threshold):
+    a landlord owning more apartments than apts_threshold pays tax_rate, the highest bracket reached applies.
+    """
+
+    def __init__(self, brackets=AD_VALOREM_TAX):
+        self.brackets = sorted(brackets, key=lambda bracket: bracket[1])
+
+    def occupied_rate(self, portfolio_size: int) -> float:
+        rate = 0.0
+        for tax_rate, apts_threshold in self.brackets:
+            if portfolio_size > apts_threshold:
+                rate = tax_rate
+        return rate
+
+    def __repr__(self):
+        return f"AdValoremTax({self.brackets})"
+
+
+class VacancyTax(PolicyRule):
+    """Yearly tax on the value of vacant rental apartments of landlords owning more than `min_portfolio` apartments."""
+
+    def __init__(self, rate: float = VACANCY_TAX_RATE, min_portfolio: int = 0):
+        self.rate = rate
+        self.min_portfolio = min_portfolio
+
+    def vacant_rate(self, portfolio_size: int) -> float:
+        return self.rate if portfolio_size > self.min_portfolio else 0.0
+
+    def __repr__(self):
+        return f"VacancyTax({self.rate}, min_portfolio={self.min_portfolio})"
+
+
+class RentCap(PolicyRule):
+    """Limits a rent raise of a sitting tenant to `max_increase` of the current rent."""
+
+    def __init__(self, max_increase: float = RENT_CAP_MAX_INCREASE):
+        self.max_increase = max_increase
+
+    def cap_rent(self, rent: float, new_rent: float) -> float:
+        return min(new_rent, rent * (1 + self.max_increase))
+
+    def __repr__(self):
+        return f"RentCap({self.max_increase})"
+
+
+class TaxPolicy:
+    """
+    The housing policy rules of a model (see PolicyRule), compiled into yearly tax rates per portfolio size,
+    so landlords look up their rates instead of evaluating every rule for every apartment.
+    Taxes are charged on the value of the apartments (the recent average sell price); the rent caps of all
+    rules are applied one after another.
+    """
+
+    def __init__(self, rules=()):
+        self.rules = list(rules)
+        sizes = range(MAX_PORTFOLIO_SIZE + 1)
+        self.occupied_rates = [sum(rule.occupied_rate(size) for rule in self.rules) for size in sizes]
+        self.vacant_rates = [sum(rule.vacant_rate(size) for rule in self.rules) for size in sizes]
+        self.taxed = any(self.occupied_rates) or any(self.vacant_rates)
+        # only the rules overriding the hook are chained
+        self.rent_caps = [rule.cap_rent for rule in self.rules if type(rule).cap_rent is not PolicyRule.cap_rent]
+
+    def __repr__(self):
+        return f"TaxPolicy({self.rules})"
+
+    def unit_tax(self, portfolio_size: int, value: float) -> float:
+        """Monthly tax on one occupied apartment worth `value` in a portfolio of the given size."""
+        return value * self.occupied_rates[min(portfolio_size, MAX_PORTFOLIO_SIZE)] / 12
+
+    def portfolio_tax(self, portfolio_size: int, occupied: int, vacant: int, value: float) -> float:
+        """Monthly tax of a whole portfolio, charged at once."""
+        size = min(portfolio_size, MAX_PORTFOLIO_SIZE)
+        return value * (occupied * self.occupied_rates[size] + vacant * self.vacant_rates[size]) / 12
+
+    def cap_rent(self, rent: float, new_rent: float) -> float:
+        for cap_rent in self.rent_caps:
+            new_rent = cap_rent(rent, new_rent)
+        return new_rent
@@ -0,0 +1,192 @@
+import math
+
+import numpy as np
+
+
+class OrderStatistics:
+    """
+    Multiset of values quantised into `bins` buckets over [low, high] (linear or log-spaced),
+    supporting insertions, removals and updates in O(log bins). A value may be inserted several
+    times at once (`count`), e.g. once per unit of an apartment.
+
+    Bucket counts and sums are kept in two Fenwick (binary indexed) trees walked together.
+
+    Bucket sums are exact, values within one bucket are treated as equal to the bucket mean,
+    so quantiles, top/bottom-k shares and the Gini coefficient are exact up to the bucket width.
+    The Gini coefficient is maintained incrementally and read in O(1).
+    """
+
+    def __init__(self, low: float, high: float, bins: int = 4096, scale: str = "linear"):
+        if scale not in ("linear", "log"):
+            raise ValueError(f"Unknown scale: {scale}")
+        if scale == "log" and low <= 0:
+            raise ValueError("A log-scaled OrderStatistics needs a positive lower bound.")
+
+        self.low, self.high, self.bins, self.scale = low, high, bins, scale
+        self._log_low = math.log(low) if scale == "log" else 0.0
+        self._width = ((math.log(high) - self._log_low) if scale == "log" else (high - low)) / bins
+
+        self._count_tree = [0] * (bins + 1)
+        self._sum_tree = [0.0] * (bins + 1)
+        self.bin_counts = [0] * bins
+        self.bin_sums = [0.0] * bins
+        self.count = 0
+        self.total = 0.0
+        # sum over items of value * rank, with the items of a bucket occupying consecutive ranks
+        self._rank_weighted_sum = 0.0
+
+    def __len__(self):
+        return self.count
+
+    def _bin(self, value: float) -> int:
+        if self.scale == "log":
+            position = (math.log(value) - self._log_low) / self._width if value > 0 else -1
+        else:
+            position = (value - self.low) / self._width
+        return min(max(int(position), 0), self.bins - 1)
+
+    def _tree_add(self, index: int, count: int, value: float):
+        index += 1
+        count_tree, sum_tree = self._count_tree, self._sum_tree
+        while index <= self.bins:
+            count_tree[index] += count
+            sum_tree[index] += value
+            index += index & -index
+
+    def _prefix(self, index: int):
+        """Count and sum of the buckets [0, index)."""
+        count, total = 0, 0.0
+        count_tree, sum_tree = self._count_tree, self._sum_tree
+        while index > 0:
+            count += count_tree[index]
+            total += sum_tree[index]
+            index -= index & -index
+        return count, total
+
+    def _search(self, k: float) -> int:
+        """The bucket holding the k-th smallest value (k >= 1)."""
+        position = 0
+        step = 1 << self.bins.bit_length()
+        while step:
+            next_position = position + step
+            if next_position <= self.bins and self._count_tree[next_position] < k:
+                position = next_position
+                k -= self._count_tree[next_position]
+            step >>= 1
+        return position
+
+    def _change(self, value: float, count: int):
+        index = self._bin(value)
+        count_below, sum_below = self._prefix(index)
+        sum_above = self.total - sum_below - self.bin_sums[index]
+
+        n, s = self.bin_counts[index], self.bin_sums[index]
+        before = s * (count_below + (n + 1) / 2)
+        n, s = n + count, s + count * value
+        after = s * (count_below + (n + 1) / 2) if n else 0.0
+        # items of the higher buckets move `count` ranks up (or down)
+        self._rank_weighted_sum += after - before + count * sum_above
+
+        self.bin_counts[index], self.bin_sums[index] = n, s
+        self._tree_add(index, count, count * value)
+        self.count += count
+        self.total += count * value
+
+    def add(self, value: float, count: int = 1):
+        self._change(value, count)
+
+    def remove(self, value: float, count: int = 1):
+        self._change(value, -count)
+
+    def update(self, old: float, new: float, count: int = 1):
+        index = self._bin(old)
+        if index == self._bin(new):
+            # same bucket: ranks do not change, only the bucket sum
+            count_below = self._prefix(index)[0]
+            delta = count * (new - old)
+            self._rank_weighted_sum += delta * (count_below + (self.bin_counts[index] + 1) / 2)
+            self.bin_sums[index] += delta
+            self._tree_add(index, 0, delta)
+            self.total += delta
+        else:
+            self._change(old, -count)
+            self._change(new, count)
+
+    def buckets(self) -> list[tuple[int, int, float]]:
+        """(bucket, count, sum) of the non-empty buckets, e.g. to merge the statistics of several models."""
+        return [(index, count, self.bin_sums[index]) for index, count in enumerate(self.bin_counts) if count]
+
+    def add_buckets(self, buckets):
+        """Adds the values of buckets() of statistics with the same bounds, bins and scale."""
+        for index, count, total in buckets:
+            self.bin_counts[index] += count
+            self.bin_sums[index] += total
+            self._tree_add(index, count, total)
+            self.count += count
+            self.total += total
+        # recomputed in one pass over the buckets, ranks of everything above a merged bucket shift
+        self._rank_weighted_sum, count_below = 0.0, 0
+        for count, total in zip(self.bin_counts, self.bin_sums):
+            if count:
+                self._rank_weighted_sum += total * (count_below + (count + 1) / 2)
+                count_below += count
+
+    def gini(self) -> float:
+        if self.count == 0 or self.total <= 0:
+            return np.nan
+        n = self.count
+        return 2 * self._rank_weighted_sum / (n * self.total) - (n + 1) / n
+
+    def _bottom_sum(self, k: float) -> float:
+        """Sum of the k smallest values."""
+        if k <= 0:
+            return 0.0
+        if k >= self.count:
+            return self.total
+        index = self._search(k)
+        count_below, sum_below = self._prefix(index)
+        return sum_below + (k - count_below) * self.bin_sums[index] / self.bin_counts[index]
+
+    def quantile(self, q: float) -> float:
+        """Mean of the bucket holding the q-quantile."""
+        if self.count == 0:
+            return np.nan
+        index = self._search(max(1, math.ceil(q * self.count)))
+        return self.bin_sums[index] / self.bin_counts[index]
+
+    def bottom_share(self, k: int) -> float:
+        """Share of the total held by the k smallest values."""
+        return self._bottom_sum(k) / self.total if self.total else np.nan
+
+    def top_share(self, k: int) -> float:
+        """Share of the total held by the k largest values."""
+        return (self.total - self._bottom_sum(self.count - k)) / self.total if self.total else np.nan
+
+
+class InequalityStats:
+    """
+    Order statistics of property values, landlord rents and landlord capital, kept up to date by the agents.
+    Apartments count once per unit.
+    """
+
+    def __init__(self):
+        self.property_values = OrderStatistics(0, 5_000_000)
+        self.rents = OrderStatistics(0, 30_000)
+        self.landlord_capital = OrderStatistics(1_000, 1e10, scale="log")
+
+    def track_rent(self, apartment):
+        if not apartment.rent_tracked:
+            apartment.rent_tracked = True
+            self.rents.add(apartment.rent, apartment.units)
+
+    def untrack_rent(self, apartment):
+        if apartment.rent_tracked:
+            apartment.rent_tracked = False
+            self.rents.remove(apartment.rent, apartment.units)
+
+    def remove_apartment(self, apartment):
+        if apartment.stats is None:
+            return
+        self.untrack_rent(apartment)
+        self.property_values.remove(apartment.price, apartment.units)
+        apartment.stats = None
@@ -0,0 +1,170 @@
+import numpy as np
+import pandas as pd
+
+from model_elements.landlord_agent import LandlordAgent
+from model_elements.resident_agent import ResidentAgent
+
+HOMELESS, RENTER, OWNER = 0, 1, 2
+DECILES = 10
+
+RESIDENT_FIELDS = {
+    "tenure": (np.int8, -1),  # HOMELESS, RENTER or OWNER; -1 when not recorded (e.g. the resident left the model)
+    "apartment": (np.int32, -1),  # uid of the rented or owned apartment
+    "rent_burden": (np.float32, np.nan),  # rent + bills (renters) or bills (owners) over income
+    "happiness": (np.float32, np.nan),
+    "x": (np.int16, -1),
+    "y": (np.int16, -1),
+}
+LANDLORD_FIELDS = {
+    "capital": (np.float64, np.nan),
+    "properties": (np.int32, -1),
+    "to_rent": (np.int32, -1),
+}
+
+
+def _allocate(fields, agents, capacity):
+    return {name: np.full((agents, capacity), fill, dtype=dtype) for name, (dtype, fill) in fields.items()}
+
+
+class PanelRecorder:
+    """
+    Trajectories of a sample of agents, recorded every `interval` steps into preallocated typed arrays
+    indexed by (agent, sample). The sample is stratified by income: `residents_per_decile` residents
+    from every income decile, plus all landlords. It is drawn from its own generator, so recording
+    does not change the simulation.
+    """
+
+    def __init__(self, model, interval: int = 10, residents_per_decile: int = 10, steps: int = None, seed: int = None):
+        self.interval = interval
+        rng = np.random.default_rng(seed)
+
+        residents = sorted(model.agents_by_type.get(ResidentAgent, []), key=lambda a: (a.income, a.unique_id))
+        self.residents = []
+        deciles = []
+        for decile, stratum in enumerate(np.array_split(np.arange(len(residents)), DECILES)):
+            chosen = rng.choice(stratum, size=min(residents_per_decile, len(stratum)), replace=False)
+            self.residents.extend(residents[index] for index in sorted(chosen))
+            deciles.extend([decile] * len(chosen))
+        self.landlords = list(model.agents_by_type.get(LandlordAgent, []))
+
+        self.resident_ids = np.array([a.unique_id for a in self.residents], dtype=np.int64)
+        self.resident_income = np.array([a.income for a in self.residents], dtype=np.float64)
+        self.resident_decile = np.array(deciles, dtype=np.int8)
+        self.landlord_ids = np.array([a.unique_id for a in self.landlords], dtype=np.int64)
+
+        capacity = steps // interval + 1 if steps else 256
+        self.steps = np.full(capacity, -1, dtype=np.int64)
+        self.resident_data = _allocate(RESIDENT_FIELDS, len(self.residents), capacity)
+        self.landlord_data = _allocate(LANDLORD_FIELDS, len(self.landlords), capacity)
+        self.samples = 0
+
+    def __len__(self):
+        return self.samples
+
+    def _grow(self):
+        capacity = max(2 * len(self.steps), 16)
+        self.steps = np.concatenate([self.steps, np.full(capacity - len(self.steps), -1, dtype=np.int64)])
+        for data, fields in ((self.resident_data, RESIDENT_FIELDS), (self.landlord_data, LANDLORD_FIELDS)):
+            for name, (dtype, fill) in fields.items():
+                grown = np.full((data[name].shape[0], capacity), fill, dtype=dtype)
+                grown[:, :self.samples] = data[name][:, :self.samples]
+                data[name] = grown
+
+    def step(self, model):
+        if model.step_count % self.interval == 0:
+            self.record(model)
+
+    def record(self, model):
+        if self.samples == len(self.steps):
+            self._grow()
+        column = self.samples
+        self.steps[column] = model.step_count
+
+        present = model.agents_by_type.get(ResidentAgent, [])
+        data = self.resident_data
+        for row, resident in enumerate(self.residents):
+            if resident not in present:
+                continue
+            if resident.rented_apartment:
+                apartment, tenure = resident.rented_apartment, RENTER
+                burden = apartment.full_cost() / resident.income
+            elif resident.owned_apartment:
+                apartment, tenure = resident.owned_apartment, OWNER
+                burden = apartment.bills / resident.income
+            else:
+                apartment, tenure, burden = None, HOMELESS, np.nan
+            data["tenure"][row, column] = tenure
+            data["apartment"][row, column] = apartment.uid if apartment is not None else -1
+            data["rent_burden"][row, column] = burden
+            data["happiness"][row, column] = resident.happiness_factor
+            if resident.pos is not None:
+                data["x"][row, column], data["y"][row, column] = resident.pos
+
+        data = self.landlord_data
+        for row, landlord in enumerate(self.landlords):
+            data["capital"][row, column] = landlord.capital
+            data["properties"][row, column] = len(landlord.owned_properties)
+            data["to_rent"][row, column] = landlord.apts_to_rent_count
+
+        self.samples += 1
+
+    def arrays(self) -> dict:
+        """The recorded samples as flat arrays (fields are prefixed with resident_ / landlord_)."""
+        arrays = {
+            "steps": self.steps[:self.samples],
+            "resident_ids": self.resident_ids,
+            "resident_income": self.resident_income,
+            "resident_decile": self.resident_decile,
+            "landlord_ids": self.landlord_ids,
+        }
+        arrays.update({f"resident_{name}": values[:, :self.samples] for name, values in self.resident_data.items()})
+        arrays.update({f"landlord_{name}": values[:, :self.samples] for name, values in self.landlord_data.items()})
+        return arrays
+
+    def save(self, path):
+        np.savez_compressed(path, **self.arrays())
+
+    def __getstate__(self):
+        # the recorded arrays are trimmed, so pickled models do not carry the unused capacity
+        state = self.__dict__.copy()
+        state["steps"] = self.steps[:self.samples].copy()
+        state["resident_data"] = {name: values[:, :self.samples].copy() for name, values in self.resident_data.items()}
+        state["landlord_data"] = {name: values[:, :self.samples].copy() for name, values in self.landlord_data.items()}
+        return state
+
+
+def panel_frames(arrays: dict) -> tuple[pd.DataFrame, pd.DataFrame]:
+    """Long (step, agent) DataFrames of residents and landlords from PanelRecorder.arrays() or a saved panel."""
+    steps = arrays["steps"]
+    frames = []
+    for kind, static in (("resident", ("income", "decile")), ("landlord", ())):
+        ids = arrays[f"{kind}_ids"]
+        frame = pd.DataFrame({"step": np.tile(steps, len(ids)), "agent": np.repeat(ids, len(steps))})
+        for name in static:
+            frame[name] = np.repeat(arrays[f"{kind}_{name}"], len(steps))
+        prefix = f"{kind}_"
+        for key, values in arrays.items():
+            name = key[len(prefix):]
+            if key.startswith(prefix) and name not in static and name != "ids":
+                frame[name] = values.reshape(-1)
+        frames.append(frame)
+    return frames[0], frames[1]
+
+
+def tenure_events(arrays: dict) -> pd.DataFrame:
+    """
+    Moves of the sampled residents between consecutive samples: (step, agent, from_tenure, to_tenure, displaced).
+    A resident is displaced when they lose their home. Several moves within one sampling interval appear as one.
+    """
+    tenure, apartment = arrays["resident_tenure"], arrays["resident_apartment"]
+    recorded = (tenure[:, 1:] >= 0) & (tenure[:, :-1] >= 0)
+    moved = recorded & ((apartment[:, 1:] != apartment[:, :-1]) | (tenure[:, 1:] != tenure[:, :-1]))
+    rows, columns = np.nonzero(moved)
+    before, after = tenure[rows, columns], tenure[rows, columns + 1]
+    return pd.DataFrame({
+        "step": arrays["steps"][columns + 1],
+        "agent": arrays["resident_ids"][rows],
+        "from_tenure": before,
+        "to_tenure": after,
+        "displaced": (before != HOMELESS) & (after == HOMELESS),
+    })
@@ -0,0 +1,267 @@
+import logging
+import multiprocessing
+import os
+import weakref
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from model_elements.constants import MORTGAGE_MONTHLY_FACTOR
+
+CELL_SKIP = 0.1  # share of the neighbourhood cells a resident does not look at, as in find_apt_to_rent_or_buy
+LISTING_SKIP = 0.2  # share of the listings of a visited cell a resident does not look at
+
+
+class ListingSnapshot:
+    """
+    Listings of all cells at the start of the search phase, as flat arrays in shared memory.
+
+    Listings are ordered by cell (cells in the order of the flattened grid, index x * height + y) and
+    `rent_offsets` / `sale_offsets` delimit the listings of every cell. The Apartment objects stay
+    in the parent, which maps chosen listing indices back to them.
+    """
+
+    def __init__(self):
+        self.memory = None
+        self.layout = None
+        self.rentals: list = []
+        self.sales: list = []
+
+    def update(self, model):
+        cells = model.cell_agents_layer.data.flatten()
+        self.rentals, self.sales = [], []
+        rent_offsets, sale_offsets = [0], [0]
+        for cell in cells:
+            self.rentals.extend(cell.apartments_to_rent)
+            self.sales.extend(cell.apartments_to_sell)
+            rent_offsets.append(len(self.rentals))
+            sale_offsets.append(len(self.sales))
+
+        columns = [
+            np.array(rent_offsets, dtype=np.float64),
+            np.array(sale_offsets, dtype=np.float64),
+            np.array([apartment.full_cost() for apartment in self.rentals], dtype=np.float64),
+            np.array([apartment.freshness for apartment in self.rentals], dtype=np.float64),
+            np.array([apartment.units for apartment in self.rentals], dtype=np.float64),
+            np.array([apartment.price for apartment in self.sales], dtype=np.float64),
+            np.array([apartment.bills for apartment in self.sales], dtype=np.float64),
+            np.array([apartment.freshness for apartment in self.sales], dtype=np.float64),
+            np.array([apartment.units for apartment in self.sales], dtype=np.float64),
+        ]
+        size = sum(len(column) for column in columns) * 8
+        if self.memory is None or self.memory.size < size:
+            self.close()
+            # grown with headroom, so the block is rarely reallocated
+            self.memory = shared_memory.SharedMemory(create=True, size=max(2 * size, 4096))
+        buffer = np.ndarray(size // 8, dtype=np.float64, buffer=self.memory.buf)
+        start = 0
+        for column in columns:
+            buffer[start:start + len(column)] = column
+            start += len(column)
+        self.layout = (self.memory.name, model.grid_width, model.grid_height, len(self.rentals), len(self.sales))
+        return self.layout
+
+    def close(self):
+        if self.memory is not None:
+            self.memory.close()
+            self.memory.unlink()
+            self.memory = None
+
+
+def _columns(buffer, layout):
+    _, width, height, rentals, sales = layout
+    sizes = (width * height + 1, width * height + 1, rentals, rentals, rentals, sales, sales, sales, sales)
+    columns, start = [], 0
+    for size in sizes:
+        columns.append(buffer[start:start + size])
+        start += size
+    rent_offsets, sale_offsets = columns[0].astype(np.int64), columns[1].astype(np.int64)
+    return rent_offsets, sale_offsets, *columns[2:]
+
+
+def _uniforms(seeds, counters):
+    """Uniform number for draw `counters` of stream `seeds` (splitmix64), element-wise for whole batches of residents."""
+    z = seeds.astype(np.uint64) + (counters.astype(np.uint64) + np.uint64(1)) * np.uint64(0x9E3779B97F4A7C15)
+    z = (z ^ (z >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+    z = (z ^ (z >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+    z ^= z >> np.uint64(31)
+    return (z >> np.uint64(11)) * 2.0 ** -53
+
+
+def _listings(offsets, cells, owners):
+    """Listing indices of the given cells (concatenated, in the order of the cells) and the resident each belongs to."""
+    starts = offsets[cells]
+    lengths = offsets[cells + 1] - starts
+    ends = np.cumsum(lengths)
+    indices = np.arange(ends[-1] if len(ends) else 0) + np.repeat(starts - ends + lengths, lengths)
+    return indices, np.repeat(owners, lengths)
+
+
+def _best(results, column, owners, listings, scores):
+    """Writes the best scoring listing of every resident (the first one on ties, like max())."""
+    order = np.lexsort((-scores, owners))
+    best_owners, first = np.unique(owners[order], return_index=True)
+    results[best_owners, column] = listings[order[first]]
+    results[best_owners, column + 1] = scores[order[first]]
+
+
+def score_residents(buffer, layout, requests):
+    """
+    Best rental and purchase listing of every searching resident, scored like ResidentAgent.rental_score
+    and purchase_score, among the listings with room for the resident's households. `requests` are rows
+    (x, y, radius, income, seed, weight); the seed drives the random skipping of cells and
+    listings, so the outcome does not depend on how residents are split among workers.
+    Returns rows (rental index, rental score, purchase index, purchase score), index -1 if none was found.
+    """
+    _, width, height, _, _ = layout
+    rent_offsets, sale_offsets, rent_cost, rent_freshness, rent_units, sale_price, sale_bills, sale_freshness, sale_units = _columns(buffer, layout)
+    results = np.full((len(requests), 4), -np.inf)
+    results[:, 0] = results[:, 2] = -1
+    if not len(requests):
+        return results
+    x, y, radius = (requests[:, column].astype(np.int64)[:, None] for column in range(3))
+    income, seeds, weight = requests[:, 3], requests[:, 4], requests[:, 5]
+
+    # the cells of every resident's neighbourhood box, row by row as in find_apt_to_rent_or_buy
+    reach = int(radius.max())
+    dx, dy = (d.ravel() for d in np.meshgrid(np.arange(-reach, reach + 1), np.arange(-reach, reach + 1), indexing="ij"))
+    cell_x, cell_y = x + dx, y + dy
+    box = 2 * radius + 1
+    draw = (dx + radius) * box + dy + radius  # position of the cell in the resident's own box
+    kept = (
+        (np.abs(dx) <= radius) & (np.abs(dy) <= radius)
+        & (cell_x >= 0) & (cell_x < width) & (cell_y >= 0) & (cell_y < height)
+        & (_uniforms(seeds[:, None], draw) >= CELL_SKIP)
+    )
+    owners = np.nonzero(kept)[0]
+    cells = cell_x[kept] * height + cell_y[kept]
+
+    # the listing draws of a resident follow its cell draws: first its rentals, then its sales
+    rentals, rental_owners = _listings(rent_offsets, cells, owners)
+    rental_counts = np.bincount(rental_owners, minlength=len(requests))
+    first_draw = (box * box).ravel()
+    draws = first_draw[rental_owners] + np.arange(len(rentals)) - np.repeat(np.cumsum(rental_counts) - rental_counts, rental_counts)
+    affordable = ((_uniforms(seeds[rental_owners], draws) >= LISTING_SKIP) & (rent_units[rentals] >= weight[rental_owners])
+                  & (rent_cost[rentals] <= income[rental_owners]))
+    rentals, rental_owners = rentals[affordable], rental_owners[affordable]
+    scores = (1 - rent_cost[rentals] / income[rental_owners]) * rent_freshness[rentals]
+    _best(results, 0, rental_owners, rentals, scores)
+
+    sales, sale_owners = _listings(sale_offsets, cells, owners)
+    sale_counts = np.bincount(sale_owners, minlength=len(requests))
+    first_draw += rental_counts
+    draws = first_draw[sale_owners] + np.arange(len(sales)) - np.repeat(np.cumsum(sale_counts) - sale_counts, sale_counts)
+    affordable = ((_uniforms(seeds[sale_owners], draws) >= LISTING_SKIP) & (sale_units[sales] >= weight[sale_owners])
+                  & (income[sale_owners] >= sale_price[sales] * MORTGAGE_MONTHLY_FACTOR))
+    sales, sale_owners = sales[affordable], sale_owners[affordable]
+    scores = (1 - sale_bills[sales] / income[sale_owners]) * sale_freshness[sales]
+    _best(results, 2, sale_owners, sales, scores)
+    return results
+
+
+_attached: dict = {}  # the shared memory block mapped by a worker process
+_TRACK_ARGUMENT = "track" in shared_memory.SharedMemory.__init__.__code__.co_varnames
+
+
+def _score_in_worker(task):
+    layout, requests = task
+    name = layout[0]
+    if name not in _attached:
+        for memory in _attached.values():
+            memory.close()
+        _attached.clear()
+        # the parent owns the block; a worker only maps it
+        _attached[name] = shared_memory.SharedMemory(name=name, track=False) if _TRACK_ARGUMENT else shared_memory.SharedMemory(name=name)
+    return score_residents(np.ndarray(_attached[name].size // 8, dtype=np.float64, buffer=_attached[name].buf), layout, requests)
+
+
+_searches = weakref.WeakSet()
+_inherited = []  # the parent's pools and blocks, kept referenced so a forked child never finalizes them
+
+
+def _after_fork_in_child():
+    # a forked child (see branching) starts its own workers and shared memory, closing it leaves the parent's alone
+    for search in list(_searches):
+        _inherited.append((search._pool, search.snapshot.memory))
+        search._pool = search.snapshot.memory = None
+
+
+os.register_at_fork(after_in_child=_after_fork_in_child)
+
+
+class ParallelSearch:
+    """
+    Two-phase search of the residents of one step.
+
+    Every resident due this step is scored in parallel against a snapshot of the listings taken at the
+    start of the resident phase (read-only phase). The residents are then stepped one by one in the
+    shuffled order, as in the serial loop: each makes its other decisions (begin_step) after the moves of
+    the residents before it, and one that searches takes its scored choice. A resident whose chosen
+    listing was taken earlier in the same step searches again against the live market, so no listing is
+    let twice.
+
+    This is a different engine from the serial loop, not a faster copy of it. A scored choice misses the
+    listings that appear during the phase (homes vacated by movers, split-off units) unless the resident
+    searches again after a conflict, and the random draws are not consumed in the serial order. Its
+    outcomes match the serial loop in distribution, not trajectory by trajectory (see equivalence).
+    """
+
+    def __init__(self, workers: int):
+        self.workers = workers
+        self.snapshot = ListingSnapshot()
+        self._pool = None
+        self.conflicts = 0
+        _searches.add(self)
+
+    def __getstate__(self):
+        # pools and shared memory belong to one process; a copy of the model creates its own
+        return {"workers": self.workers, "conflicts": self.conflicts}
+
+    def __setstate__(self, state):
+        self.__init__(state["workers"])
+        self.conflicts = state["conflicts"]
+
+    def _score(self, layout, requests):
+        # a branch running in a (daemonic) pool worker cannot start workers of its own, it scores in-process
+        if self.workers <= 1 or len(requests) < 2 * self.workers or multiprocessing.current_process().daemon:
+            return score_residents(np.ndarray(self.snapshot.memory.size // 8, dtype=np.float64, buffer=self.snapshot.memory.buf), layout, requests)
+        if self._pool is None:
+            # explicitly fork: importing mesa makes spawn the default start method
+            self._pool = multiprocessing.get_context("fork").Pool(self.workers)
+            logging.info("Started %d resident search workers.", self.workers)
+        chunks = np.array_split(requests, self.workers)
+        return np.concatenate(self._pool.map(_score_in_worker, [(layout, chunk) for chunk in chunks]))
+
+    def step(self, model, residents, step, avg_rent, avg_price):
+        if not residents:
+            return
+        # scored before any resident acts; the requests do not change in begin_step
+        layout = self.snapshot.update(model)
+        requests = np.array(
+            [(*resident.pos, resident.searching_radius, resident.income, model.rng.getrandbits(52, "search", resident.unique_id), resident.weight)
+             for resident in residents],
+            dtype=np.float64,
+        )
+        results = self._score(layout, requests)
+
+        taken = set()
+        rentals, sales = self.snapshot.rentals, self.snapshot.sales
+        for resident, (rental, rental_score, sale, sale_score) in zip(residents, results):
+            if resident.begin_step(step, avg_rent, avg_price):
+                rental = rentals[int(rental)] if rental >= 0 else None
+                sale = sales[int(sale)] if sale >= 0 else None
+                if (rental is not None and rental.uid in taken) or (sale is not None and sale.uid in taken):
+                    self.conflicts += 1
+                    resident.find_apt_to_rent_or_buy()
+                else:
+                    resident.choose_apartment(rental, rental_score, sale, sale_score)
+                home = resident.rented_apartment or resident.owned_apartment
+                if home is not None:
+                    taken.add(home.uid)
+            resident.schedule_wakeup(step)
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.terminate()
+            self._pool = None
+        self.snapshot.close()
@@ -0,0 +1,501 @@
+import logging
+import multiprocessing as mp
+import traceback
+from typing import NamedTuple
+
+import numpy as np
+import pandas as pd
+
+from helpers import apportion
+from model import GentrificationModel
+from order_statistics import InequalityStats
+from model_elements.developer_agent import DeveloperAgent
+from model_elements.landlord_agent import LandlordAgent
+from model_elements.resident_agent import ResidentAgent
+from model_elements.constants import DEVELOPER_CELL_LOOKUP_COUNT, GOV_DEVELOPER_BUILD_SITES, GOV_DEVELOPER_MAX_PROPERTIES, SEARCHING_RADIUS
+from scenarios import unwrap_params
+
+# How every collected metric is combined across regions: summed, or averaged with the given weight column
+SUMMED_METRICS = ("HousesToRent", "HousesToSell", "ResidentsCount")
+METRIC_WEIGHTS = {
+    "AverageRent": "rental_units",
+    "AverageSellPrice": "HousesToSell",
+    "AverageRentProfitMargin": "landlords",
+    "AverageDeveloperProfitMargin": "developers",
+    "DeveloperCapital": "developers",
+    "LandlordCapital": "landlords",
+    "LandlordOwnedProperties": "landlords",
+}  # everything else is a per-resident share and is weighted by ResidentsCount
+# inequality metrics are computed from the merged buckets of the regions' order statistics, as one model would
+INEQUALITY_STATS = ("property_values", "rents", "landlord_capital")
+CLOSE_TIMEOUT = 10  # seconds a region worker gets to close its model before it is terminated
+
+
+class Region(NamedTuple):
+    index: int
+    x0: int
+    y0: int
+    width: int
+    height: int
+
+    def distance(self, pos):
+        """Chebyshev distance from a global position to the region (0 inside)."""
+        x, y = pos
+        dx = max(self.x0 - x, 0, x - (self.x0 + self.width - 1))
+        dy = max(self.y0 - y, 0, y - (self.y0 + self.height - 1))
+        return max(dx, dy)
+
+    def to_global(self, pos):
+        return pos[0] + self.x0, pos[1] + self.y0
+
+
+def split_grid(width, height, columns, rows, min_cells=DEVELOPER_CELL_LOOKUP_COUNT):
+    """
+    Split a width x height grid into columns x rows rectangular regions of near-equal size.
+    Every region needs at least `min_cells` cells: landlords look for purchases among that many cells of their region.
+    """
+    if columns > width or rows > height:
+        raise ValueError(f"Cannot split a {width}x{height} grid into {columns}x{rows} regions.")
+
+    regions = []
+    for xs in np.array_split(np.arange(width), columns):
+        for ys in np.array_split(np.arange(height), rows):
+            regions.append(Region(len(regions), int(xs[0]), int(ys[0]), len(xs), len(ys)))
+
+    smallest = min(region.width * region.height for region in regions)
+    if smallest < min_cells:
+        raise ValueError(f"Splitting a {width}x{height} grid into {columns}x{rows} regions leaves regions of {smallest} cells, "
+                         f"every region needs at least {min_cells}.")
+    return regions
+
+
+class _RegionWorker:
+    """Owns the sub-model of one region inside a worker process."""
+
+    def __init__(self, model: GentrificationModel, region: Region, halo: int):
+        self.model = model
+        self.region = region
+        self.halo = halo
+        # residents never search further across a border than the listings published to the halo
+        self.model.max_searching_radius = halo
+        # truncation of the recent price windows happens in the coordinator after merging all regions
+        self.model.max_recent_prices = float("inf")
+
+        self.listings = {}  # listing key -> Apartment published to the neighbours after the last step
+        self.halo_listings = []  # listings of neighbouring regions visible from this one
+        self.pending = {}  # resident unique_id -> resident waiting for the outcome of a claim
+        self.synced = (0, 0)  # lengths of the global price windows handed over by the coordinator
+        self.local_end = (0, 0)  # lengths of the local price windows when the last step was reported
+
+    def resolve_claims(self, claims):
+        """Accept claims of foreign residents on listings of this region, first come first served; returns the accepted (source, resident)."""
+        accepted = []
+        for claim in claims:
+            apartment = self.listings.pop(claim["listing"], None)
+            if apartment is None or not self._still_listed(apartment, claim["owned"]):
+                continue
+
+            resident = ResidentAgent(self.model, 0, weight=claim["weight"])
+            resident.income = claim["income"]
+            self.model.grid.place_agent(resident, apartment.position)
+            self.model.num_residents += 1
+            self.model.residents_changed()
+            resident.assign_apartment(apartment, claim["owned"])
+            # resident ids are only unique within a region
+            accepted.append((claim["source"], claim["resident"]))
+
+        return accepted
+
+    def _still_listed(self, apartment, owned):
+        cell = self.model.cell_agents_layer.data[apartment.position]
+        return apartment in (cell.apartments_to_sell if owned else cell.apartments_to_rent)
+
+    def step(self, recent_sell_prices, recent_rent_prices, halo_listings, accepted):
+        model = self.model
+
+        for unique_id, resident in self.pending.items():
+            if unique_id in accepted:
+                model.grid.remove_agent(resident)
+                model.timer_wheel.remove(resident)
+                resident.remove()
+                model.num_residents -= 1
+                model.residents_changed()
+        self.pending = {}
+
+        # prices recorded while resolving claims belong to this step's contribution
+        carried_sell = model.recent_sell_prices[self.local_end[0]:]
+        carried_rent = model.recent_rent_prices[self.local_end[1]:]
+        model.recent_sell_prices = list(recent_sell_prices) + carried_sell
+        model.recent_rent_prices = list(recent_rent_prices) + carried_rent
+        self.synced = (len(recent_sell_prices), len(recent_rent_prices))
+        self.halo_listings = halo_listings
+
+        model.step()
+
+        new_sell_prices = model.recent_sell_prices[self.synced[0]:]
+        new_rent_prices = model.recent_rent_prices[self.synced[1]:]
+        self.local_end = (len(model.recent_sell_prices), len(model.recent_rent_prices))
+
+        return {
+            "sell_prices": new_sell_prices,
+            "rent_prices": new_rent_prices,
+            "listings": self._publish_border_listings(),
+            "claims": self._make_claims(),
+            "metrics": self._collect_metrics(),
+        }
+
+    def _publish_border_listings(self):
+        self.listings = {}
+        published = []
+        width, height = self.region.width, self.region.height
+        for cell in self.model.cell_agents_layer.data.flatten():
+            x, y = cell.position
+            if self.halo <= x < width - self.halo and self.halo <= y < height - self.halo:
+                continue
+
+            position = self.region.to_global(cell.position)
+            for owned, apartments in ((False, cell.apartments_to_rent), (True, cell.apartments_to_sell)):
+                for apartment in apartments:
+                    key = (self.region.index, id(apartment))
+                    self.listings[key] = apartment
+                    published.append((key, position, owned, apartment.full_cost(), apartment.price, apartment.bills, apartment.freshness, apartment.units))
+        return published
+
+    def _make_claims(self):
+        """Homeless residents near the border look at the halo listings published by their neighbours."""
+        if not self.halo_listings:
+            return []
+
+        claims = []
+        claimed = set()
+        residents = list(self.model.agents_by_type.get(ResidentAgent, []))
+        self.model.rng.shuffle(residents, "halo_claim_order")
+        for resident in residents:
+            if resident.rented_apartment or resident.owned_apartment:
+                continue
+
+            x, y = self.region.to_global(resident.pos)
+            radius = resident.searching_radius
+            best_rental, best_rental_happiness = None, float("-inf")
+            best_purchase, best_purchase_happiness = None, float("-inf")
+            for listing, (key, (lx, ly), owned, full_cost, price, bills, freshness, units) in enumerate(self.halo_listings):
+                if key in claimed or abs(lx - x) > radius or abs(ly - y) > radius:
+                    continue
+                if self.model.rng.random("skip_halo_listing", resident.unique_id, listing) < 0.2:
+                    continue
+                if units < resident.weight:
+                    continue
+
+                if owned:
+                    temp = resident.purchase_score(price, bills, freshness)
+                    if temp is not None and temp > best_purchase_happiness:
+                        best_purchase, best_purchase_happiness = key, temp
+                else:
+                    temp = resident.rental_score(full_cost, freshness)
+                    if temp is not None and temp > best_rental_happiness:
+                        best_rental, best_rental_happiness = key, temp
+
+            if best_purchase and resident.candidate_happiness(best_purchase_happiness) >= resident.candidate_happiness(best_rental_happiness):
+                best, owned, best_happiness = best_purchase, True, best_purchase_happiness
+            elif best_rental:
+                best, owned, best_happiness = best_rental, False, best_rental_happiness
+            else:
+                continue
+
+            if best_happiness > resident.happiness_factor:
+                claimed.add(best)
+                self.pending[resident.unique_id] = resident
+                claims.append({
+                    "listing": best,
+                    "owned": owned,
+                    "income": resident.income,
+                    "weight": resident.weight,
+                    "source": self.region.index,
+                    "resident": resident.unique_id,
+                })
+        return claims
+
+    def _collect_metrics(self):
+        row = {name: values[-1] for name, values in self.model.datacollector.model_vars.items()}
+        cells = self.model.cell_agents_layer.data.flatten()
+        row["rental_units"] = sum(
+            len(cell.apartments_to_rent) + sum(1 for a in cell.apartments if isinstance(a.owner, LandlordAgent) and a.occupied)
+            for cell in cells
+        )
+        row["landlords"] = len(self.model.agents_by_type.get(LandlordAgent, []))
+        row["developers"] = len(self.model.agents_by_type.get(DeveloperAgent, []))
+        row["inequality"] = {name: getattr(self.model.inequality, name).buckets() for name in INEQUALITY_STATS}
+        return row
+
+
+class RegionError(RuntimeError):
+    """A region worker failed; the message carries the worker's traceback."""
+
+
+def _region_worker(conn, region, model_params, halo, seed):
+    """Answers every command with ("ok", result), or ("error", traceback) and exits."""
+    model = None
+    try:
+        model = GentrificationModel(**model_params, grid_size=region.width, grid_height=region.height, seed=seed)
+        worker = _RegionWorker(model, region, halo)
+        conn.send(("ok", None))
+
+        while True:
+            command, payload = conn.recv()
+            if command == "resolve":
+                result = worker.resolve_claims(payload)
+            elif command == "step":
+                result = worker.step(*payload)
+            elif command == "add_gov_developer":
+                result = model.add_gov_developer(**payload)
+            elif command == "set":
+                result = setattr(model, *payload)
+            elif command == "close":
+                return
+            else:
+                raise ValueError(f"Unknown command: {command}")
+            conn.send(("ok", result))
+    except Exception:
+        conn.send(("error", traceback.format_exc()))
+    finally:
+        if model is not None:
+            model.close()
+        conn.close()
+
+
+class PartitionedGentrificationModel:
+    """
+    Runs one city as a set of rectangular regions, each stepped by its own process.
+
+    Every step has two phases: claims made by homeless residents on listings across region borders
+    (the halo) are resolved by the regions owning the listings, then all regions step in parallel
+    starting from the merged market price windows (the market synchronisation phase).
+    Residents, landlords and developers are split between regions proportionally to their area.
+
+    Only homeless residents cross borders, and only within the halo: listings within `halo` cells of a
+    border are published to the neighbouring regions, and the searching radius of the residents is
+    capped at `halo` so that they never reach further than what is published. Landlords and developers
+    buy only inside their own region, and the market synchronisation merges only the recent sell and
+    rent price windows; everything else (agents, their capital, the other listings) stays in its region.
+    """
+
+    def __init__(self, regions: tuple[int, int] = (2, 2), halo: int = 2, seed: int = None, **model_params):
+        model_params = unwrap_params(model_params)
+        self.grid_size = model_params.pop("grid_size", 10)
+        self.num_residents = model_params.pop("num_residents", 50)
+        num_developers = model_params.pop("num_developers", 5)
+        num_landlords = model_params.pop("num_landlords", 5)
+        gov_developer = model_params.pop("gov_developer", 0)
+        self._ad_valorem_tax = model_params.get("ad_valorem_tax", False)
+        self._tax_rules = list(model_params.get("tax_rules") or [])
+
+        if halo < SEARCHING_RADIUS:
+            raise ValueError(f"A halo of {halo} cells is narrower than the searching radius of the residents ({SEARCHING_RADIUS}).")
+        self.regions = split_grid(self.grid_size, self.grid_size, *regions)
+        self.halo = halo
+        self.step_count = 0
+        self.max_recent_prices = 20
+        self.recent_sell_prices: list[float] = []
+        self.recent_rent_prices: list[float] = []
+
+        areas = [region.width * region.height for region in self.regions]
+        residents = apportion(self.num_residents, areas)
+        # the target population is split like the residents (bracket by bracket)
+        households = model_params.pop("households", None)
+        if households is None:
+            region_households = [None] * len(self.regions)
+        elif isinstance(households, int):
+            region_households = apportion(households, residents)
+        else:
+            region_households = [list(shares) for shares in zip(*(apportion(target, residents) for target in households))]
+        developers = apportion(num_developers, areas, minimum=1)  # forced sales need a developer in every region
+        landlords = apportion(num_landlords, areas)
+        # the government programme is split as well, so the city as a whole builds as much as a single model
+        self._gov_quotas = [{"max_properties": max_properties, "build_sites": build_sites} for max_properties, build_sites in
+                            zip(apportion(GOV_DEVELOPER_MAX_PROPERTIES, areas), apportion(GOV_DEVELOPER_BUILD_SITES, areas))]
+
+        self._halo_listings = {region.index: [] for region in self.regions}
+        self._claims = {region.index: [] for region in self.regions}
+        self._accepted = {region.index: set() for region in self.regions}
+        self.model_vars: list[dict] = []
+
+        self._connections = []
+        self._processes = []
+        for region in self.regions:
+            params = dict(model_params, num_residents=residents[region.index],
+                          num_developers=developers[region.index], num_landlords=landlords[region.index])
+            if region_households[region.index] is not None:
+                params["households"] = region_households[region.index]
+            region_seed = None if seed is None else seed * len(self.regions) + region.index
+            parent_conn, child_conn = mp.Pipe()
+            process = mp.Process(target=_region_worker, args=(child_conn, region, params, halo, region_seed), daemon=True)
+            process.start()
+            self._connections.append(parent_conn)
+            self._processes.append(process)
+        # the workers report once their sub-models are built
+        self._receive_all()
+
+        logging.info(f"Partitioned GentrificationModel into {len(self.regions)} regions of the {self.grid_size}x{self.grid_size} grid.")
+
+        if gov_developer:
+            self.add_gov_developer()
+
+    def _broadcast(self, command, payloads=None):
+        for index, conn in enumerate(self._connections):
+            conn.send((command, None if payloads is None else payloads[index]))
+        return self._receive_all()
+
+    def _receive_all(self):
+        results = []
+        for region, conn in zip(self.regions, self._connections):
+            try:
+                status, result = conn.recv()
+            except EOFError:
+                status, result = "error", "the worker exited without a traceback"
+            if status == "error":
+                self._terminate()
+                raise RegionError(f"Region {region.index} failed:\n{result}")
+            results.append(result)
+        return results
+
+    def _terminate(self):
+        for process in self._processes:
+            process.terminate()
+        for process in self._processes:
+            process.join()
+        self._connections = []
+        self._processes = []
+
+    def add_gov_developer(self):
+        self._broadcast("add_gov_developer", self._gov_quotas)
+
+    @property
+    def ad_valorem_tax(self):
+        return self._ad_valorem_tax
+
+    @ad_valorem_tax.setter
+    def ad_valorem_tax(self, value):
+        self._ad_valorem_tax = value
+        self._broadcast("set", [("ad_valorem_tax", value)] * len(self.regions))
+
+    @property
+    def tax_rules(self):
+        return list(self._tax_rules)
+
+    @tax_rules.setter
+    def tax_rules(self, rules):
+        self._tax_rules = list(rules)
+        self._broadcast("set", [("tax_rules", self._tax_rules)] * len(self.regions))
+
+    def step(self):
+        self.step_count += 1
+
+        # --- Halo exchange: the owners of claimed listings accept or reject the claims ---
+        results = self._broadcast("resolve", [self._claims[region.index] for region in self.regions])
+        accepted = {region.index: set() for region in self.regions}
+        for accepted_claims in results:
+            for source, resident in accepted_claims:
+                accepted[source].add(resident)
+
+        # --- Regions step in parallel ---
+        results = self._broadcast("step", [
+            (self.recent_sell_prices, self.recent_rent_prices, self._halo_listings[region.index], accepted[region.index])
+            for region in self.regions
+        ])
+
+        # --- Market synchronisation ---
+        for result in results:
+            self.recent_sell_prices.extend(result["sell_prices"])
+            self.recent_rent_prices.extend(result["rent_prices"])
+        self.recent_sell_prices = self.recent_sell_prices[-self.max_recent_prices:]
+        self.recent_rent_prices = self.recent_rent_prices[-self.max_recent_prices:]
+
+        self._route_listings([result["listings"] for result in results])
+        self._claims = {region.index: [] for region in self.regions}
+        for result in results:
+            for claim in result["claims"]:
+                self._claims[claim["listing"][0]].append(claim)
+
+        self.model_vars.append(self._aggregate_metrics([result["metrics"] for result in results]))
+
+    def _route_listings(self, listings_by_region):
+        self._halo_listings = {region.index: [] for region in self.regions}
+        for source, listings in enumerate(listings_by_region):
+            for listing in listings:
+                for region in self.regions:
+                    if region.index != source and region.distance(listing[1]) <= self.halo:
+                        self._halo_listings[region.index].append(listing)
+
+    @staticmethod
+    def _aggregate_metrics(rows):
+        aggregated = {}
+        for name in rows[0]:
+            if name in ("rental_units", "landlords", "developers", "inequality"):
+                continue
+            values = np.array([row[name] for row in rows], dtype=np.float64)
+            if name in SUMMED_METRICS:
+                aggregated[name] = values.sum()
+                continue
+
+            weights = np.array([row[METRIC_WEIGHTS.get(name, "ResidentsCount")] for row in rows], dtype=np.float64)
+            mask = ~np.isnan(values) & (weights > 0)
+            aggregated[name] = np.average(values[mask], weights=weights[mask]) if mask.any() else np.nan
+
+        stats = InequalityStats()
+        for row in rows:
+            for name in INEQUALITY_STATS:
+                getattr(stats, name).add_buckets(row["inequality"][name])
+        aggregated.update(
+            PropertyValueGini=stats.property_values.gini(),
+            PropertyValueMedian=stats.property_values.quantile(0.5),
+            PropertyValueTop10PercentShare=stats.property_values.top_share(max(1, len(stats.property_values) // 10)),
+            RentGini=stats.rents.gini(),
+            LandlordCapitalGini=stats.landlord_capital.gini(),
+        )
+        return aggregated
+
+    def get_model_vars_dataframe(self):
+        return pd.DataFrame(self.model_vars)
+
+    def close(self):
+        for conn in self._connections:
+            try:
+                conn.send(("close", None))
+            except (BrokenPipeError, OSError):
+                pass  # the worker is gone already
+        for process in self._processes:
+            process.join(timeout=CLOSE_TIMEOUT)
+            if process.is_alive():
+                logging.warning("Region worker %s did not close in %d s, terminating it.", process.name, CLOSE_TIMEOUT)
+                process.terminate()
+                process.join()
+        for conn in self._connections:
+            conn.close()
+        self._connections = []
+        self._processes = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        try:
+            self.close()
+        except Exception:
+            if exc_type is None:
+                raise
+            # the error that ended the block is the one worth reporting
+            logging.exception("Closing the region workers failed.")
+
+
+def validate_against_single_process(model_params, regions=(2, 2), seeds=range(5), steps=300, burn_in=100, tolerance=0.5, scenarios=("no_gov",)):
+    """
+    Runs the single-process and the partitioned model on the same seeds and compares every metric after
+    the burn-in with the equivalence harness (see equivalence.compare_engines); returns its report.
+    """
+    from equivalence import compare_engines
+
+    def partitioned(seed, **params):
+        return PartitionedGentrificationModel(regions=regions, seed=seed, **params)
+
+    return compare_engines(partitioned, model_params, scenarios=scenarios, seeds=seeds, warmup=0, steps=steps,
+                           burn_in=burn_in, tolerance=tolerance)
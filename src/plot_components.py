@@ -0,0 +1,56 @@
+import weakref
+
+import matplotlib.pyplot as plt
+import solara
+from matplotlib.figure import Figure
+from mesa.visualization.utils import update_counter
+
+from downsampling import MinMaxPyramid
+
+POINT_BUDGET = 1000  # points drawn per chart, however long the run
+
+
+def make_downsampled_plot_component(measure, post_process=None, budget: int = POINT_BUDGET, save_format="png"):
+    """
+    Drop-in replacement of mesa's make_plot_component (matplotlib backend) for long runs: every metric keeps
+    a min/max pyramid that is extended by the steps collected since the last render, and the chart draws
+    a fixed budget of points from it instead of the whole history.
+    """
+    if isinstance(measure, str):
+        measure = {measure: None}
+    elif not isinstance(measure, dict):
+        measure = {name: None for name in measure}
+    pyramids = weakref.WeakKeyDictionary()  # model -> {metric: MinMaxPyramid}
+
+    def MakeDownsampledPlot(model):
+        return DownsampledPlot(model, measure, pyramids, budget, post_process, save_format)
+
+    return MakeDownsampledPlot
+
+
+@solara.component
+def DownsampledPlot(model, measure, pyramids, budget, post_process=None, save_format="png"):
+    update_counter.get()
+    fig = Figure()
+    ax = fig.subplots()
+
+    series = pyramids.setdefault(model, {})
+    model_vars = model.datacollector.model_vars
+    # with sparse collection (see convergence) the collected rows are not the steps, the pyramids keep both
+    steps = model_vars["Step"]
+    for name, color in measure.items():
+        values = model_vars.get(name, [])
+        pyramid = series.get(name)
+        if pyramid is None or len(pyramid) > len(values):
+            pyramid = series[name] = MinMaxPyramid()
+        pyramid.extend(values[len(pyramid):], steps[len(pyramid):])
+        x, y = pyramid.points(budget // len(measure))
+        ax.plot(x, y, label=name, color=color)
+    ax.legend(loc="best")
+
+    if post_process is not None:
+        post_process(ax)
+
+    ax.set_xlabel("Step")
+    ax.xaxis.set_major_locator(plt.MaxNLocator(integer=True))
+    solara.FigureMatplotlib(fig, format=save_format, bbox_inches="tight")
@@ -0,0 +1,114 @@
+import functools
+import math
+import random
+import zlib
+
+import numpy as np
+
+_MASK = 2**64 - 1
+_GOLDEN = 0x9E3779B97F4A7C15
+
+
+def _mix(z: int) -> int:
+    # splitmix64 finalizer
+    z = ((z ^ (z >> 30)) * 0xBF58476D1CE4E5B9) & _MASK
+    z = ((z ^ (z >> 27)) * 0x94D049BB133111EB) & _MASK
+    return z ^ (z >> 31)
+
+
+@functools.lru_cache(maxsize=None)
+def _purpose_code(purpose: str) -> int:
+    return _mix(zlib.crc32(purpose.encode()))
+
+
+class GlobalRandom:
+    """
+    The model's default random source: the random module, numpy's global generator and model.random for the
+    activation order, drawn in call order. The purpose and keys of a draw are ignored.
+    """
+
+    def __init__(self, model):
+        self.model = model
+
+    def reseed(self, seed: int):
+        pass  # the global generators are reseeded by whoever reseeds the model
+
+    def random(self, purpose: str, *keys) -> float:
+        return random.random()
+
+    def uniform(self, a: float, b: float, purpose: str, *keys) -> float:
+        return random.uniform(a, b)
+
+    def normal(self, loc: float, scale: float, purpose: str, *keys) -> float:
+        return np.random.normal(loc=loc, scale=scale)
+
+    def choice(self, items, purpose: str, *keys):
+        return random.choice(items)
+
+    def sample(self, items, k: int, purpose: str, *keys) -> list:
+        return random.sample(items, k)
+
+    def getrandbits(self, bits: int, purpose: str, *keys) -> int:
+        return self.model.random.getrandbits(bits)
+
+    def shuffle(self, agents: list, purpose: str):
+        self.model.random.shuffle(agents)
+
+
+class CommonRandomNumbers:
+    """
+    Counter-based random streams for common random numbers: a draw is a hash of the seed, the model's step,
+    the purpose of the draw and the keys naming what is decided (agent ids, apartment uids, cells).
+
+    A draw does not depend on how many draws were made before it, so scenarios branched from the same
+    model get the same random inputs wherever their decisions coincide: a landlord's renovation cost of an
+    apartment in a step is the same whether or not a government developer builds elsewhere. Shuffles sort
+    the agents by a hash of their id, so the relative order of the agents two scenarios share is the same.
+    """
+
+    def __init__(self, model, seed: int):
+        self.model = model
+        self.reseed(seed)
+
+    def reseed(self, seed: int):
+        self.seed = _mix(seed & _MASK)
+
+    def _bits(self, purpose: str, keys) -> int:
+        z = _mix(self.seed ^ _purpose_code(purpose))
+        z = _mix((z + (self.model.step_count + 1) * _GOLDEN) & _MASK)
+        for key in keys:
+            z = _mix((z + (key + 1) * _GOLDEN) & _MASK)
+        return z
+
+    def random(self, purpose: str, *keys) -> float:
+        return (self._bits(purpose, keys) >> 11) * 2.0**-53
+
+    def uniform(self, a: float, b: float, purpose: str, *keys) -> float:
+        return a + (b - a) * self.random(purpose, *keys)
+
+    def normal(self, loc: float, scale: float, purpose: str, *keys) -> float:
+        # Box-Muller from two draws of the same key
+        u = 1.0 - self.random(purpose, *keys, 0)
+        v = self.random(purpose, *keys, 1)
+        return loc + scale * math.sqrt(-2.0 * math.log(u)) * math.cos(2.0 * math.pi * v)
+
+    def choice(self, items, purpose: str, *keys):
+        if not len(items):
+            raise IndexError("Cannot choose from an empty sequence")
+        return items[min(int(self.random(purpose, *keys) * len(items)), len(items) - 1)]
+
+    def sample(self, items, k: int, purpose: str, *keys) -> list:
+        """Partial Fisher-Yates shuffle, one draw per chosen position."""
+        pool = list(items)
+        if not 0 <= k <= len(pool):
+            raise ValueError("Sample larger than population or is negative")
+        for i in range(k):
+            j = i + min(int(self.random(purpose, *keys, i) * (len(pool) - i)), len(pool) - i - 1)
+            pool[i], pool[j] = pool[j], pool[i]
+        return pool[:k]
+
+    def getrandbits(self, bits: int, purpose: str, *keys) -> int:
+        return self._bits(purpose, keys) >> (64 - bits)
+
+    def shuffle(self, agents: list, purpose: str):
+        agents.sort(key=lambda agent: self._bits(purpose, (agent.unique_id,)))
@@ -0,0 +1,189 @@
+import json
+import logging
+import os
+import re
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from helpers import RESULTS_DIR
+
+RUN_NAME = re.compile(r"^(?:(?P<landlords>\d+)lords|(?P<label>[A-Za-z]\w*?))?_?(?P<replicate>\d+)$")
+RESULTS_FILE = re.compile(r"^results_(?P<scenario>\w+)\.pkl$")
+INDEX_FILE = "index.json"
+PANEL_FILE = "panel.npz"
+
+
+def parse_run_name(name: str) -> dict:
+    """Parameters encoded in a results folder name: "50lords_3" -> num_landlords=50, replicate=3; "first_1" -> label="first"."""
+    match = RUN_NAME.match(name)
+    if match is None:
+        return {"label": name}
+    params = {"replicate": int(match["replicate"])}
+    if match["landlords"] is not None:
+        params["num_landlords"] = int(match["landlords"])
+    if match["label"] is not None:
+        params["label"] = match["label"]
+    return params
+
+
+def _column_file(name: str) -> str:
+    return re.sub(r"[^\w.-]", "_", name) + ".npy"
+
+
+class ResultsCatalog:
+    """
+    Columnar store of the collected metrics of all runs.
+
+    Every (run, scenario) DataFrame is stored as one .npy file per column under `<root>/<run>/<scenario>/`
+    and indexed in `<root>/index.json` with its parameters. Queries open the columns memory-mapped, so only
+    the requested step range of the requested column is read from disk.
+    """
+
+    def __init__(self, root=RESULTS_DIR / "catalog"):
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.entries: list[dict] = []
+        index = self.root / INDEX_FILE
+        if index.exists():
+            self.entries = json.loads(index.read_text())
+
+    def _save_index(self):
+        # replace atomically, so a reader never sees a half-written index
+        temporary = self.root / f"{INDEX_FILE}.tmp"
+        temporary.write_text(json.dumps(self.entries, indent=1, default=str))
+        os.replace(temporary, self.root / INDEX_FILE)
+
+    def __contains__(self, run_scenario: tuple[str, str]):
+        return self._entry(*run_scenario) is not None
+
+    def _entry(self, run, scenario):
+        return next((entry for entry in self.entries if entry["run"] == run and entry["scenario"] == scenario), None)
+
+    def add(self, run: str, scenario: str, df: pd.DataFrame, params: dict = None, source: str = None, source_mtime: float = None,
+            panel: dict = None):
+        """
+        Stores the metrics of one run (replacing an earlier version) and indexes it.
+        `panel` are the agent trajectories of PanelRecorder.arrays(); without it a stored panel is kept.
+        """
+        folder = self.root / run / scenario
+        if folder.exists():
+            for path in folder.iterdir():
+                if panel is not None or path.name != PANEL_FILE:
+                    path.unlink()
+        folder.mkdir(parents=True, exist_ok=True)
+        if panel is not None:
+            np.savez_compressed(folder / PANEL_FILE, **panel)
+
+        # legacy results have no Step column: one row was collected after every step, starting at step 1
+        steps = df["Step"].to_numpy(dtype=np.int64) if "Step" in df.columns else np.arange(1, len(df) + 1, dtype=np.int64)
+        np.save(folder / _column_file("Step"), steps)
+        columns = {}
+        for name in df.columns:
+            if name == "Step":
+                continue
+            values = pd.to_numeric(df[name], errors="coerce").to_numpy()
+            np.save(folder / _column_file(name), values)
+            columns[name] = _column_file(name)
+
+        params = dict(parse_run_name(run), **(df.attrs.get("model_params") or {}), **(params or {}))
+        # runs taxed under different rules are not comparable, so the version is queryable like a parameter;
+        # results saved before it was recorded ran under the original rules
+        metadata = df.attrs.get("run_metadata") or {}
+        params.setdefault("tax_semantics", metadata.get("tax_semantics", 1))
+        entry = {
+            "run": run,
+            "scenario": scenario,
+            "params": params,
+            "rows": len(df),
+            "first_step": int(steps[0]) if len(steps) else None,
+            "last_step": int(steps[-1]) if len(steps) else None,
+            "columns": columns,
+            "panel": PANEL_FILE if (folder / PANEL_FILE).exists() else None,
+            "metadata": df.attrs.get("run_metadata", {}),
+            "source": source,
+            "source_mtime": source_mtime,
+        }
+        self.entries = [other for other in self.entries if not (other["run"] == run and other["scenario"] == scenario)]
+        self.entries.append(entry)
+        self._save_index()
+        return entry
+
+    def convert(self, source=RESULTS_DIR, force: bool = False) -> int:
+        """Converts `<source>/<run>/results_<scenario>.pkl` files that are new or changed since their conversion."""
+        converted = 0
+        for path in sorted(Path(source).glob("*/results_*.pkl")):
+            match = RESULTS_FILE.match(path.name)
+            if match is None or path.parent.resolve() == self.root.resolve():
+                continue
+            run, scenario = path.parent.name, match["scenario"]
+            entry = self._entry(run, scenario)
+            mtime = path.stat().st_mtime
+            if not force and entry is not None and entry.get("source_mtime") == mtime:
+                continue
+            self.add(run, scenario, pd.read_pickle(path), source=str(path), source_mtime=mtime)
+            converted += 1
+            logging.info("Converted %s into the results catalog.", path)
+        return converted
+
+    def runs(self, scenario: str = None, **params) -> pd.DataFrame:
+        """The indexed runs matching the scenario and parameter values, one row per (run, scenario)."""
+        rows = [
+            dict(run=entry["run"], scenario=entry["scenario"], rows=entry["rows"], first_step=entry["first_step"],
+                 last_step=entry["last_step"], **entry["params"])
+            for entry in self._select(scenario, params)
+        ]
+        return pd.DataFrame(rows)
+
+    def _select(self, scenario, params):
+        return [
+            entry for entry in self.entries
+            if (scenario is None or entry["scenario"] == scenario)
+            and all(entry["params"].get(key) == value for key, value in params.items())
+        ]
+
+    def columns(self) -> list[str]:
+        return sorted({name for entry in self.entries for name in entry["columns"]})
+
+    def column(self, run: str, scenario: str, name: str, steps: tuple[int, int] = None) -> pd.Series:
+        """One column of one run, indexed by step; with `steps=(first, last)` only that range is read."""
+        entry = self._entry(run, scenario)
+        if entry is None:
+            raise KeyError(f"No run {run!r} with scenario {scenario!r} in the catalog.")
+        if name not in entry["columns"]:
+            raise KeyError(f"Run {run!r} ({scenario}) has no column {name!r}.")
+
+        folder = self.root / run / scenario
+        step_numbers = np.load(folder / _column_file("Step"), mmap_mode="r")
+        start, stop = 0, len(step_numbers)
+        if steps is not None:
+            first, last = steps
+            start = int(np.searchsorted(step_numbers, first, side="left")) if first is not None else 0
+            stop = int(np.searchsorted(step_numbers, last, side="right")) if last is not None else len(step_numbers)
+        values = np.load(folder / entry["columns"][name], mmap_mode="r")
+        return pd.Series(np.array(values[start:stop]), index=pd.Index(np.array(step_numbers[start:stop]), name="Step"), name=name)
+
+    def panel(self, run: str, scenario: str) -> dict:
+        """Agent trajectories of one run as saved by PanelRecorder (see panel.panel_frames and panel.tenure_events)."""
+        entry = self._entry(run, scenario)
+        if entry is None or not entry.get("panel"):
+            raise KeyError(f"No panel of run {run!r} with scenario {scenario!r} in the catalog.")
+        with np.load(self.root / run / scenario / entry["panel"]) as panel:
+            return dict(panel)
+
+    def query(self, name: str, scenario: str = None, steps: tuple[int, int] = None, **params) -> pd.DataFrame:
+        """
+        One column across all matching runs, e.g.
+        `catalog.query("AverageRent", scenario="ad_valorem", num_landlords=50, steps=(2500, 12500))`.
+        Columns of the result are (run, scenario), rows are steps.
+        """
+        series = {
+            (entry["run"], entry["scenario"]): self.column(entry["run"], entry["scenario"], name, steps)
+            for entry in self._select(scenario, params) if name in entry["columns"]
+        }
+        if not series:
+            return pd.DataFrame()
+        frame = pd.concat(series, axis=1)
+        frame.columns.names = ["run", "scenario"]
+        return frame
@@ -0,0 +1,150 @@
+import ast
+import functools
+import hashlib
+import json
+import logging
+import os
+import pickle
+import tempfile
+import time
+from pathlib import Path
+
+from convergence import run_options
+from helpers import RESULTS_DIR
+from model_elements import constants
+from scenarios import SCENARIOS, unwrap_params
+
+SRC_DIR = Path(__file__).resolve().parent
+# the sources a run executes: the model, the scenarios and the run options, and everything they import
+FINGERPRINT_ROOTS = ("model.py", "scenarios.py", "convergence.py")
+
+
+def _local_module(name: str):
+    """Source file of a module of this tree, None for installed packages."""
+    path = SRC_DIR.joinpath(*name.split("."))
+    for candidate in (path.with_suffix(".py"), path / "__init__.py"):
+        if candidate.is_file():
+            return candidate
+    return None
+
+
+@functools.lru_cache(maxsize=None)
+def fingerprinted_sources() -> tuple[Path, ...]:
+    """The root sources and every module of this tree they import, directly or not (including imports inside functions)."""
+    pending = [SRC_DIR / root for root in FINGERPRINT_ROOTS]
+    sources = set()
+    while pending:
+        path = pending.pop()
+        if path in sources:
+            continue
+        sources.add(path)
+        for node in ast.walk(ast.parse(path.read_bytes(), filename=str(path))):
+            if isinstance(node, ast.Import):
+                names = [alias.name for alias in node.names]
+            elif isinstance(node, ast.ImportFrom) and node.module and not node.level:
+                names = [node.module] + [f"{node.module}.{alias.name}" for alias in node.names]
+            else:
+                continue
+            pending.extend(module for module in map(_local_module, names) if module is not None)
+    return tuple(sorted(sources))
+
+
+def code_fingerprint() -> str:
+    """Hash of the sources a run executes, so cached runs are invalidated by any change to the code they ran."""
+    digest = hashlib.sha256()
+    for path in fingerprinted_sources():
+        digest.update(path.relative_to(SRC_DIR).as_posix().encode())
+        digest.update(path.read_bytes())
+    return digest.hexdigest()
+
+
+def constants_snapshot() -> dict:
+    return {name: getattr(constants, name) for name in dir(constants) if name.isupper()}
+
+
+def run_key(model_params: dict, scenario: str = None, seed: int = None, warmup: int = 0, steps: int = 0, options: dict = None) -> str:
+    """
+    Content address of a run: model parameters, scenario flags, constants (incl. the AD_VALOREM_TAX
+    brackets), seed, number of warm-up and scenario steps, run options and the model code fingerprint.
+    A key with steps=0 and no scenario addresses a warm-up prefix.
+    """
+    description = {
+        "model_params": unwrap_params(model_params),
+        "scenario": SCENARIOS[scenario] if scenario is not None else None,
+        "constants": constants_snapshot(),
+        "seed": seed,
+        "warmup": warmup,
+        "steps": steps,
+        "options": run_options(options),  # unknown options are rejected, not keyed
+        "code": code_fingerprint(),
+    }
+    canonical = json.dumps(description, sort_keys=True, default=str)
+    return hashlib.sha256(canonical.encode()).hexdigest()
+
+
+class RunCache:
+    """
+    On-disk cache of complete runs (results DataFrames) and warm-up prefixes (pickled models) keyed by `run_key`.
+    Least recently used entries are evicted once the cache exceeds `max_bytes`.
+    """
+
+    def __init__(self, root=RESULTS_DIR / "cache", max_bytes: int = 20 * 2**30):
+        self.root = Path(root)
+        self.max_bytes = max_bytes
+        self.root.mkdir(parents=True, exist_ok=True)
+
+    def _path(self, key):
+        return self.root / key[:2] / f"{key}.pkl"
+
+    def __contains__(self, key):
+        return self._path(key).exists()
+
+    def get(self, key):
+        path = self._path(key)
+        try:
+            with open(path, "rb") as file:
+                value = pickle.load(file)
+        except FileNotFoundError:
+            return None
+        os.utime(path)  # the modification time doubles as the last access time for eviction
+        return value
+
+    def put(self, key, value):
+        path = self._path(key)
+        path.parent.mkdir(exist_ok=True)
+        # write to a temporary file first, so concurrent readers never see a partial entry
+        with tempfile.NamedTemporaryFile(dir=path.parent, delete=False) as file:
+            pickle.dump(value, file, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(file.name, path)
+        self.evict()
+
+    def get_or_run(self, key, run):
+        value = self.get(key)
+        if value is None:
+            value = run()
+            self.put(key, value)
+        return value
+
+    def entries(self):
+        """(path, size, last access) of every entry, least recently used first."""
+        entries = []
+        for path in self.root.glob("*/*.pkl"):
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((path, stat.st_size, stat.st_mtime))
+        return sorted(entries, key=lambda entry: entry[2])
+
+    def size(self):
+        return sum(size for _, size, _ in self.entries())
+
+    def evict(self):
+        entries = self.entries()
+        total = sum(size for _, size, _ in entries)
+        for path, size, last_access in entries:
+            if total <= self.max_bytes:
+                break
+            path.unlink(missing_ok=True)
+            total -= size
+            logging.info("Evicted cached run %s (last used %s).", path.stem, time.ctime(last_access))
@@ -0,0 +1,32 @@
+from copy import deepcopy
+
+# Policy scenarios compared in the experiments; each one branches from the same warmed-up model.
+# Further policies can be declared with "tax_rules" (see model_elements.tax_policy), e.g.
+# "vacancy": {"gov_developer": False, "ad_valorem_tax": False, "tax_rules": [VacancyTax()]}
+SCENARIOS = {
+    "no_gov": {"gov_developer": False, "ad_valorem_tax": False},
+    "gov": {"gov_developer": True, "ad_valorem_tax": False},
+    "ad_valorem": {"gov_developer": False, "ad_valorem_tax": True},
+    "both": {"gov_developer": True, "ad_valorem_tax": True},
+}
+
+
+def apply_scenario(model, scenario: str):
+    flags = SCENARIOS[scenario]
+    if flags["gov_developer"]:
+        model.add_gov_developer()
+    if flags["ad_valorem_tax"]:
+        model.ad_valorem_tax = True
+    if flags.get("tax_rules"):
+        model.tax_rules = model.tax_rules + list(flags["tax_rules"])
+    return model
+
+
+def branch_scenario(model, scenario: str):
+    """Copy of a (warmed-up) model with the scenario's interventions applied."""
+    return apply_scenario(deepcopy(model), scenario)
+
+
+def unwrap_params(model_params: dict) -> dict:
+    """Plain model parameters from the app's `model_params` (sliders are replaced by their values)."""
+    return {key: getattr(value, "value", value) for key, value in model_params.items()}
@@ -0,0 +1,188 @@
+import itertools
+import logging
+
+import numpy as np
+import pandas as pd
+from sklearn.ensemble import GradientBoostingRegressor
+from sklearn.gaussian_process import GaussianProcessRegressor
+from sklearn.gaussian_process.kernels import ConstantKernel, RBF, WhiteKernel
+
+from results_catalog import ResultsCatalog
+from scenarios import SCENARIOS
+
+DEFAULT_TARGETS = ("HomelessnessRate", "AverageRent", "HouseOwnershipRate", "LandlordCapital")
+SCENARIO_FEATURES = ("gov_developer", "ad_valorem_tax")
+BASELINE_SCENARIO = "no_gov"
+QUANTILES = (0.16, 0.5, 0.84)  # +-1 standard deviation of a normal distribution
+
+
+def end_state(catalog: ResultsCatalog, targets=DEFAULT_TARGETS, tail: int = 1000, scenario: str = None, **params) -> pd.DataFrame:
+    """
+    One row per catalogued run with its parameters, scenario flags and the mean of every target
+    over its last `tail` steps.
+    """
+    runs = catalog.runs(scenario, **params)
+    rows = []
+    for run in runs.to_dict("records"):
+        row = dict(run, **{flag: float(SCENARIOS[run["scenario"]][flag]) for flag in SCENARIO_FEATURES})
+        for target in targets:
+            try:
+                row[target] = catalog.column(run["run"], run["scenario"], target, steps=(run["last_step"] - tail + 1, None)).mean()
+            except KeyError:
+                row[target] = np.nan
+        rows.append(row)
+    return pd.DataFrame(rows)
+
+
+class Surrogate:
+    """
+    Fast emulator of the end state of a run from its parameters, trained on the results catalog.
+
+    Every target gets its own regressor: a Gaussian process (kind="gp", the predictive standard deviation
+    is the uncertainty) or gradient-boosted trees (kind="gbr", the uncertainty is half the distance between
+    the 16% and 84% quantile regressions). The scenario enters through its flags, so the policy effect
+    at a parameter point is the difference of the predictions under two scenarios.
+    """
+
+    def __init__(self, features=("num_landlords",), targets=DEFAULT_TARGETS, kind: str = "gp", tail: int = 1000, random_state: int = 0):
+        if kind not in ("gp", "gbr"):
+            raise ValueError(f"Unknown surrogate kind: {kind}")
+        self.features = list(features)
+        self.targets = list(targets)
+        self.kind = kind
+        self.tail = tail
+        self.random_state = random_state
+        self.models: dict = {}
+        self.training_data: pd.DataFrame = None
+
+    @property
+    def columns(self) -> list[str]:
+        return self.features + list(SCENARIO_FEATURES)
+
+    def fit(self, data):
+        """Trains on a ResultsCatalog or on a DataFrame of end_state() rows."""
+        if isinstance(data, ResultsCatalog):
+            data = end_state(data, self.targets, self.tail)
+        missing = [feature for feature in self.columns if feature not in data.columns]
+        if missing:
+            raise ValueError(f"No training data for the features {missing}.")
+        data = data.dropna(subset=self.columns)
+        self.training_data = data
+
+        x = data[self.columns].to_numpy(dtype=np.float64)
+        self._mean, self._scale = x.mean(axis=0), x.std(axis=0)
+        self._scale[self._scale == 0] = 1.0
+        x = (x - self._mean) / self._scale
+
+        for target in self.targets:
+            known = data[target].notna().to_numpy()
+            if known.sum() < 2:
+                logging.warning("Surrogate: too few runs with %s, it is not modelled.", target)
+                continue
+            self.models[target] = self._fit_target(x[known], data[target].to_numpy(dtype=np.float64)[known])
+            logging.info("Surrogate: fitted %s on %d runs.", target, known.sum())
+        return self
+
+    def _fit_target(self, x, y):
+        if self.kind == "gp":
+            kernel = ConstantKernel() * RBF(length_scale=np.ones(x.shape[1])) + WhiteKernel()
+            return GaussianProcessRegressor(kernel, normalize_y=True, n_restarts_optimizer=2, random_state=self.random_state).fit(x, y)
+        return [
+            GradientBoostingRegressor(loss="quantile", alpha=alpha, n_estimators=200, max_depth=3, random_state=self.random_state).fit(x, y)
+            for alpha in QUANTILES
+        ]
+
+    def _features(self, points: pd.DataFrame) -> np.ndarray:
+        points = points.copy()
+        if "scenario" in points.columns:
+            for flag in SCENARIO_FEATURES:
+                points[flag] = [float(SCENARIOS[scenario][flag]) for scenario in points["scenario"]]
+        return (points[self.columns].to_numpy(dtype=np.float64) - self._mean) / self._scale
+
+    def predict(self, points: pd.DataFrame) -> pd.DataFrame:
+        """Predicted mean and standard deviation (`<target>_std`) of every target at the given points."""
+        x = self._features(points)
+        prediction = pd.DataFrame(index=points.index)
+        for target, model in self.models.items():
+            if self.kind == "gp":
+                mean, std = model.predict(x, return_std=True)
+            else:
+                low, mean, high = (quantile.predict(x) for quantile in model)
+                std = np.abs(high - low) / 2
+            prediction[target] = mean
+            prediction[f"{target}_std"] = std
+        return prediction
+
+    def propose(self, candidates: pd.DataFrame, n: int = 8, scenarios=tuple(SCENARIOS), sensitivity_weight: float = 1.0,
+                min_distance: float = 0.5) -> pd.DataFrame:
+        """
+        The `n` candidate parameter points (rows of feature values) most worth simulating next: highest
+        predicted uncertainty in any scenario plus `sensitivity_weight` times the largest predicted policy
+        effect against the baseline, both in units of the target's spread in the training runs.
+        Points closer than `min_distance` (in training standard deviations) to a chosen one are skipped,
+        so a batch is not spent on one corner of the parameter space.
+        """
+        candidates = candidates.reset_index(drop=True)
+        predictions = {
+            scenario: self.predict(candidates.assign(scenario=scenario)) for scenario in scenarios
+        }
+        score = np.zeros(len(candidates))
+        for target in self.models:
+            spread = self.training_data[target].std() or 1.0
+            uncertainty = np.max([prediction[f"{target}_std"] for prediction in predictions.values()], axis=0) / spread
+            sensitivity = np.zeros(len(candidates))
+            if BASELINE_SCENARIO in predictions:
+                baseline = predictions[BASELINE_SCENARIO][target]
+                sensitivity = np.max([np.abs(prediction[target] - baseline) for prediction in predictions.values()], axis=0) / spread
+            score = np.maximum(score, uncertainty + sensitivity_weight * sensitivity)
+
+        x = (candidates[self.features].to_numpy(dtype=np.float64) - self._mean[:len(self.features)]) / self._scale[:len(self.features)]
+        chosen = []
+        for index in np.argsort(-score, kind="stable"):
+            if len(chosen) == n:
+                break
+            if all(np.linalg.norm(x[index] - x[other]) >= min_distance for other in chosen):
+                chosen.append(index)
+        return candidates.iloc[chosen].assign(score=score[chosen])
+
+
+def parameter_grid(**values) -> pd.DataFrame:
+    """Candidate points for Surrogate.propose, e.g. parameter_grid(num_landlords=range(10, 200, 5))."""
+    names = list(values)
+    return pd.DataFrame(list(itertools.product(*(values[name] for name in names))), columns=names)
+
+
+def submit_proposals(queue, proposals: pd.DataFrame, model_params: dict, scenarios=tuple(SCENARIOS), seeds=range(3), warmup: int = 0, steps: int = 0) -> list[str]:
+    """
+    Queues the proposed points (see work_queue) with the remaining parameters from `model_params`; returns the
+    job keys. Once workers have run them, ingest(catalog, store, keys) adds the results to the training data.
+    """
+    from work_queue import submit_sweep
+
+    keys = []
+    for point in proposals.drop(columns=["score"], errors="ignore").to_dict("records"):
+        params = dict(model_params, **{name: value.item() if hasattr(value, "item") else value for name, value in point.items()})
+        keys.extend(submit_sweep(queue, params, scenarios, seeds, warmup, steps))
+    return keys
+
+
+def ingest(catalog: ResultsCatalog, store, keys) -> int:
+    """
+    Adds the finished jobs among `keys` from the results store of the work queue to the catalog, with their
+    parameters and seed, so that the next fit trains on them. Jobs already catalogued are skipped; returns how many were added.
+    """
+    from work_queue import collect
+
+    added = 0
+    for key, df in collect(store, keys).items():
+        spec = df.attrs.get("spec")
+        if spec is None:
+            logging.warning("Surrogate: the result of job %s does not carry its spec, it is not catalogued.", key)
+            continue
+        run = f"job_{key[:16]}"
+        if (run, spec["scenario"]) in catalog:
+            continue
+        catalog.add(run, spec["scenario"], df, params={"seed": spec["seed"], "warmup": spec["warmup"], "steps": spec["steps"], "job": key})
+        added += 1
+    logging.info("Surrogate: catalogued %d finished jobs.", added)
+    return added
@@ -0,0 +1,50 @@
+class TimerWheel:
+    """
+    Hashed timer wheel of agent wake-ups.
+
+    Awake agents are stepped every tick. An agent with nothing to do until a known step goes to sleep
+    with `sleep(agent, wake_step)` and is moved back to the awake set when that step is due,
+    or earlier by `wake(agent)` when an event concerns it. Wake-ups further away than the wheel size
+    stay in their slot until their step comes round; superseded entries are dropped lazily.
+    """
+
+    def __init__(self, slots: int = 64):
+        self.slots: list[list] = [[] for _ in range(slots)]
+        self.awake: dict = {}  # insertion ordered set of awake agents
+
+    def __len__(self):
+        return len(self.awake)
+
+    def add(self, agent):
+        agent.wake_step = None
+        self.awake[agent] = None
+
+    def remove(self, agent):
+        agent.wake_step = None
+        self.awake.pop(agent, None)
+
+    def sleep(self, agent, wake_step: int):
+        self.awake.pop(agent, None)
+        agent.wake_step = wake_step
+        self.slots[wake_step % len(self.slots)].append((wake_step, agent))
+
+    def wake(self, agent):
+        if agent.wake_step is not None:
+            agent.wake_step = None
+            self.awake[agent] = None
+
+    def due(self, step: int) -> list:
+        """Wakes the agents due at `step` and returns all awake agents."""
+        index = step % len(self.slots)
+        slot = self.slots[index]
+        if slot:
+            pending = []
+            for wake_step, agent in slot:
+                if agent.wake_step != wake_step:
+                    continue  # woken earlier, removed or rescheduled
+                if wake_step <= step:
+                    self.wake(agent)
+                else:
+                    pending.append((wake_step, agent))
+            self.slots[index] = pending
+        return list(self.awake)
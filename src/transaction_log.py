@@ -0,0 +1,216 @@
+from array import array
+from enum import IntEnum
+
+import numpy as np
+import pandas as pd
+
+
+class MarketEvent(IntEnum):
+    BUILD = 0         # developer built an apartment and listed it for sale (amount: asking price)
+    LIST = 1          # landlord listed an apartment for rent (amount: asking rent)
+    RENT = 2          # resident rented an apartment from a landlord (amount: rent)
+    VACATE = 3        # resident moved out of a rented or an owned apartment (amount: rent, 0 for owners)
+    BUY = 4           # resident or landlord bought an apartment (amount: price)
+    FORCED_SALE = 5   # landlord out of capital sold a vacant apartment to a developer (amount: price)
+    RENT_CHANGE = 6   # landlord changed the rent of an apartment (amount: new rent)
+    RENOVATION = 7    # landlord renovated an apartment (amount: cost)
+    PRICE_CHANGE = 8  # developer cut the asking price of an apartment (amount: new price)
+
+
+class AgentKind(IntEnum):
+    RESIDENT = 0
+    LANDLORD = 1
+    DEVELOPER = 2
+    GOV_DEVELOPER = 3
+
+
+COLUMNS = {
+    "step": "i",
+    "event": "B",
+    "apartment": "q",
+    "x": "h",
+    "y": "h",
+    "actor": "q",
+    "counterparty": "q",
+    "amount": "d",
+}
+NO_AGENT = -1
+
+
+class TransactionLog:
+    """
+    Append-only columnar log of every market event of a simulation.
+
+    Events are appended to typed arrays while the model runs and saved as one compressed .npz file,
+    together with a table of the agents, so new metrics can be computed after the run from the log alone.
+    """
+
+    def __init__(self):
+        self._columns = {name: array(typecode) for name, typecode in COLUMNS.items()}
+        self.agents: dict[str, np.ndarray] = {}
+        self._kinds = None
+
+    def __len__(self):
+        return len(self._columns["step"])
+
+    def record(self, step, event, apartment, actor=None, counterparty=None, amount=0.0):
+        columns = self._columns
+        x, y = apartment.position if apartment.position is not None else (-1, -1)
+        columns["step"].append(step)
+        columns["event"].append(event)
+        columns["apartment"].append(apartment.uid)
+        columns["x"].append(x)
+        columns["y"].append(y)
+        columns["actor"].append(actor.unique_id if actor is not None else NO_AGENT)
+        columns["counterparty"].append(counterparty.unique_id if counterparty is not None else NO_AGENT)
+        columns["amount"].append(amount)
+
+    def column(self, name) -> np.ndarray:
+        column = self._columns[name]
+        if isinstance(column, np.ndarray):
+            return column
+        return np.frombuffer(column, dtype=np.dtype(COLUMNS[name])) if len(column) else np.empty(0, dtype=COLUMNS[name])
+
+    def register_agents(self, model):
+        """Snapshot id, kind and income of every agent, needed to join events with agent attributes."""
+        from model_elements.developer_agent import DeveloperAgent
+        from model_elements.gov_developer import GovDeveloper
+        from model_elements.landlord_agent import LandlordAgent
+        from model_elements.resident_agent import ResidentAgent
+
+        kinds = {ResidentAgent: AgentKind.RESIDENT, LandlordAgent: AgentKind.LANDLORD,
+                 DeveloperAgent: AgentKind.DEVELOPER, GovDeveloper: AgentKind.GOV_DEVELOPER}
+        agents = [agent for agent in model.agents if type(agent) in kinds]
+        self.agents = {
+            "unique_id": np.array([agent.unique_id for agent in agents], dtype=np.int64),
+            "kind": np.array([kinds[type(agent)] for agent in agents], dtype=np.uint8),
+            "income": np.array([getattr(agent, "income", np.nan) for agent in agents], dtype=np.float64),
+        }
+        self._kinds = None
+
+    def save(self, path, model=None):
+        if model is not None:
+            self.register_agents(model)
+        np.savez_compressed(
+            path,
+            **{name: self.column(name) for name in COLUMNS},
+            **{f"agents_{name}": values for name, values in self.agents.items()},
+        )
+
+    @classmethod
+    def load(cls, path):
+        log = cls()
+        with np.load(path) as data:
+            log._columns = {name: data[name] for name in COLUMNS}
+            log.agents = {name[len("agents_"):]: data[name] for name in data.files if name.startswith("agents_")}
+        return log
+
+    def _require_agents(self):
+        if "unique_id" not in self.agents:
+            raise ValueError("The log has no agent table; call register_agents(model) or save(path, model=model) first.")
+
+    # --- Replay / query API ---
+
+    def to_frame(self) -> pd.DataFrame:
+        frame = pd.DataFrame({name: self.column(name) for name in COLUMNS})
+        frame["event"] = pd.Categorical.from_codes(frame["event"], [event.name for event in MarketEvent])
+        return frame
+
+    def events(self, *events: MarketEvent) -> np.ndarray:
+        """Indexes of the records of the given event types, in log order."""
+        return np.flatnonzero(np.isin(self.column("event"), [int(event) for event in events]))
+
+    def tenancies(self, end_step=None):
+        """
+        Replays rents and tenancies per apartment.
+        Returns a DataFrame of tenancies with the tenant, landlord, start/end step and the total rent paid.
+        """
+        step, event, apartment = self.column("step"), self.column("event"), self.column("apartment")
+        actor, counterparty, amount = self.column("actor"), self.column("counterparty"), self.column("amount")
+        end_step = int(step.max()) if end_step is None and len(step) else end_step
+
+        current_rent = {}
+        open_tenancies = {}  # apartment -> [tenant, landlord, start, rent paid so far, last change step]
+        tenancies = []
+        for index in self.events(MarketEvent.LIST, MarketEvent.RENT, MarketEvent.VACATE, MarketEvent.RENT_CHANGE):
+            apt, kind, at = apartment[index], event[index], step[index]
+            if kind == MarketEvent.RENT:
+                open_tenancies[apt] = [actor[index], counterparty[index], at, 0.0, at]
+                current_rent[apt] = amount[index]
+            elif kind == MarketEvent.RENT_CHANGE:
+                if apt in open_tenancies:
+                    tenancy = open_tenancies[apt]
+                    tenancy[3] += current_rent.get(apt, 0.0) * (at - tenancy[4])
+                    tenancy[4] = at
+                current_rent[apt] = amount[index]
+            elif kind == MarketEvent.VACATE and apt in open_tenancies:
+                tenant, landlord, start, paid, since = open_tenancies.pop(apt)
+                tenancies.append((apt, tenant, landlord, start, at, paid + current_rent.get(apt, 0.0) * (at - since)))
+            elif kind == MarketEvent.LIST:
+                current_rent[apt] = amount[index]
+
+        for apt, (tenant, landlord, start, paid, since) in open_tenancies.items():
+            tenancies.append((apt, tenant, landlord, start, end_step, paid + current_rent.get(apt, 0.0) * (end_step - since)))
+
+        return pd.DataFrame(tenancies, columns=["apartment", "tenant", "landlord", "start", "end", "rent_paid"])
+
+    def rent_by_income_decile(self) -> pd.Series:
+        """Average monthly rent paid by tenants grouped by income decile."""
+        self._require_agents()
+        tenancies = self.tenancies()
+        incomes = pd.Series(self.agents["income"], index=self.agents["unique_id"])
+        residents = incomes[self.agents["kind"] == AgentKind.RESIDENT]
+        deciles = pd.Series(pd.qcut(residents.rank(method="first"), 10, labels=range(1, 11)), index=residents.index)
+
+        tenancies["decile"] = tenancies["tenant"].map(deciles)
+        months = (tenancies["end"] - tenancies["start"]).clip(lower=1)
+        grouped = tenancies.assign(months=months).groupby("decile", observed=False)
+        # deciles without tenancies (or a log without any) average to NaN
+        return grouped["rent_paid"].sum().astype(np.float64) / grouped["months"].sum().astype(np.float64)
+
+    def landlord_portfolios(self, step=None) -> pd.Series:
+        """Number of apartments held by every landlord after the given step (end of the log by default)."""
+        self._require_agents()
+        holdings = {}
+        step_column, event, actor = self.column("step"), self.column("event"), self.column("actor")
+        for index in self.events(MarketEvent.BUY, MarketEvent.FORCED_SALE):
+            if step is not None and step_column[index] > step:
+                break
+            if event[index] == MarketEvent.FORCED_SALE:
+                holdings[actor[index]] = holdings.get(actor[index], 0) - 1
+            elif self._kind(actor[index]) == AgentKind.LANDLORD:
+                holdings[actor[index]] = holdings.get(actor[index], 0) + 1
+        return pd.Series(holdings, dtype=np.int64).sort_values(ascending=False)
+
+    def portfolio_concentration(self, step=None) -> dict:
+        """Herfindahl-Hirschman index and top-decile share of landlord portfolios."""
+        portfolios = self.landlord_portfolios(step)
+        total = portfolios.sum()
+        if total <= 0:
+            return {"hhi": np.nan, "top10_share": np.nan}
+        shares = portfolios / total
+        top = max(1, len(portfolios) // 10)
+        return {"hhi": float((shares ** 2).sum()), "top10_share": float(shares.iloc[:top].sum())}
+
+    def time_on_market(self) -> pd.DataFrame:
+        """Time between a listing (BUILD, FORCED_SALE or LIST) and the sale or rental that closed it."""
+        step, event, apartment = self.column("step"), self.column("event"), self.column("apartment")
+        listed = {}
+        durations = []
+        for index in self.events(MarketEvent.BUILD, MarketEvent.FORCED_SALE, MarketEvent.LIST, MarketEvent.BUY, MarketEvent.RENT):
+            kind, apt = event[index], apartment[index]
+            if kind in (MarketEvent.BUILD, MarketEvent.FORCED_SALE):
+                listed[("sale", apt)] = step[index]
+            elif kind == MarketEvent.LIST:
+                listed[("rent", apt)] = step[index]
+            else:
+                market = "sale" if kind == MarketEvent.BUY else "rent"
+                start = listed.pop((market, apt), None)
+                if start is not None:
+                    durations.append((market, apt, start, step[index] - start))
+        return pd.DataFrame(durations, columns=["market", "apartment", "listed", "time_on_market"])
+
+    def _kind(self, unique_id):
+        if self._kinds is None:
+            self._kinds = dict(zip(self.agents["unique_id"], self.agents["kind"]))
+        return self._kinds.get(unique_id)
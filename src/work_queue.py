@@ -0,0 +1,323 @@
+import json
+import logging
+import os
+import socket
+import sqlite3
+import threading
+import time
+import traceback
+from pathlib import Path
+
+from convergence import run_options, run_steps
+from helpers import RESULTS_DIR
+from model import GentrificationModel
+from run_cache import RunCache, run_key
+from scenarios import SCENARIOS, apply_scenario, unwrap_params
+
+QUEUED, LEASED, DONE, FAILED = "queued", "leased", "done", "failed"
+
+
+def make_spec(model_params: dict, scenario: str = "no_gov", seed: int = None, warmup: int = 0, steps: int = 0, options: dict = None) -> dict:
+    """A job: `warmup` steps, the scenario's interventions, then `steps` steps under the run options (see convergence.run_options)."""
+    if scenario not in SCENARIOS:
+        raise ValueError(f"Unknown scenario: {scenario}")
+    return {"model_params": unwrap_params(model_params), "scenario": scenario, "seed": seed,
+            "warmup": warmup, "steps": steps, "options": run_options(options)}
+
+
+def spec_key(spec: dict) -> str:
+    """Jobs are keyed like the run cache, so a finished job is found in the results store under its key."""
+    return run_key(spec["model_params"], spec["scenario"], spec["seed"], spec["warmup"], spec["steps"], spec["options"])
+
+
+class MemoryQueue:
+    """In-process queue with the same interface as SQLiteQueue, a local stand-in for tests and single-host runs."""
+
+    def __init__(self, max_attempts: int = 3):
+        self.max_attempts = max_attempts
+        self.jobs: dict[str, dict] = {}
+        self._lock = threading.Lock()
+
+    def submit(self, key: str, spec: dict) -> bool:
+        with self._lock:
+            if key in self.jobs:
+                return False
+            self.jobs[key] = {"spec": spec, "state": QUEUED, "worker": None, "lease_expires": None, "attempts": 0, "error": None}
+            return True
+
+    def lease(self, worker: str, lease_seconds: float):
+        with self._lock:
+            for key, job in self.jobs.items():
+                if job["state"] == QUEUED:
+                    job.update(state=LEASED, worker=worker, lease_expires=time.time() + lease_seconds, attempts=job["attempts"] + 1)
+                    return key, job["spec"]
+        return None
+
+    def heartbeat(self, key: str, worker: str, lease_seconds: float) -> bool:
+        with self._lock:
+            job = self.jobs.get(key)
+            if job is None or job["state"] != LEASED or job["worker"] != worker:
+                return False
+            job["lease_expires"] = time.time() + lease_seconds
+            return True
+
+    def complete(self, key: str, worker: str) -> bool:
+        with self._lock:
+            job = self.jobs.get(key)
+            if job is None or job["state"] != LEASED or job["worker"] != worker:
+                return False
+            job.update(state=DONE, lease_expires=None)
+            return True
+
+    def fail(self, key: str, worker: str, error: str):
+        with self._lock:
+            job = self.jobs.get(key)
+            if job is not None and job["state"] == LEASED and job["worker"] == worker:
+                job.update(state=FAILED if job["attempts"] >= self.max_attempts else QUEUED, worker=None, lease_expires=None, error=error)
+
+    def requeue_expired(self) -> int:
+        now = time.time()
+        requeued = 0
+        with self._lock:
+            for job in self.jobs.values():
+                if job["state"] == LEASED and job["lease_expires"] < now:
+                    job.update(state=FAILED if job["attempts"] >= self.max_attempts else QUEUED, worker=None,
+                               lease_expires=None, error="lease expired")
+                    requeued += 1
+        return requeued
+
+    def status(self) -> dict:
+        with self._lock:
+            counts = {state: 0 for state in (QUEUED, LEASED, DONE, FAILED)}
+            for job in self.jobs.values():
+                counts[job["state"]] += 1
+            return counts
+
+
+class SQLiteQueue:
+    """
+    Work queue in a SQLite file, usable by workers on several hosts through shared storage.
+    Every operation is one IMMEDIATE transaction, so SQLite's file lock serialises the workers.
+    The rollback journal is used instead of WAL, which needs shared memory and does not work on network file systems.
+    """
+
+    def __init__(self, path=RESULTS_DIR / "queue.sqlite", max_attempts: int = 3, timeout: float = 60.0):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.max_attempts = max_attempts
+        self.timeout = timeout
+        with self._transaction() as connection:
+            connection.execute("""
+                CREATE TABLE IF NOT EXISTS jobs (
+                    key TEXT PRIMARY KEY,
+                    spec TEXT NOT NULL,
+                    state TEXT NOT NULL,
+                    worker TEXT,
+                    lease_expires REAL,
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    error TEXT,
+                    submitted REAL,
+                    finished REAL
+                )""")
+            connection.execute("CREATE INDEX IF NOT EXISTS jobs_state ON jobs (state, submitted)")
+
+    def _transaction(self):
+        connection = sqlite3.connect(self.path, timeout=self.timeout, isolation_level=None)
+        connection.execute("PRAGMA journal_mode=DELETE")
+        return _Transaction(connection)
+
+    def submit(self, key: str, spec: dict) -> bool:
+        with self._transaction() as connection:
+            cursor = connection.execute(
+                "INSERT OR IGNORE INTO jobs (key, spec, state, submitted) VALUES (?, ?, ?, ?)",
+                (key, json.dumps(spec, sort_keys=True), QUEUED, time.time()),
+            )
+            return cursor.rowcount == 1
+
+    def lease(self, worker: str, lease_seconds: float):
+        with self._transaction() as connection:
+            row = connection.execute(
+                "SELECT key, spec FROM jobs WHERE state = ? ORDER BY submitted, key LIMIT 1", (QUEUED,)
+            ).fetchone()
+            if row is None:
+                return None
+            connection.execute(
+                "UPDATE jobs SET state = ?, worker = ?, lease_expires = ?, attempts = attempts + 1 WHERE key = ?",
+                (LEASED, worker, time.time() + lease_seconds, row[0]),
+            )
+            return row[0], json.loads(row[1])
+
+    def heartbeat(self, key: str, worker: str, lease_seconds: float) -> bool:
+        with self._transaction() as connection:
+            cursor = connection.execute(
+                "UPDATE jobs SET lease_expires = ? WHERE key = ? AND state = ? AND worker = ?",
+                (time.time() + lease_seconds, key, LEASED, worker),
+            )
+            return cursor.rowcount == 1
+
+    def complete(self, key: str, worker: str) -> bool:
+        with self._transaction() as connection:
+            cursor = connection.execute(
+                "UPDATE jobs SET state = ?, lease_expires = NULL, finished = ? WHERE key = ? AND state = ? AND worker = ?",
+                (DONE, time.time(), key, LEASED, worker),
+            )
+            return cursor.rowcount == 1
+
+    def fail(self, key: str, worker: str, error: str):
+        with self._transaction() as connection:
+            connection.execute(
+                "UPDATE jobs SET state = CASE WHEN attempts >= ? THEN ? ELSE ? END, worker = NULL, lease_expires = NULL, error = ? "
+                "WHERE key = ? AND state = ? AND worker = ?",
+                (self.max_attempts, FAILED, QUEUED, error, key, LEASED, worker),
+            )
+
+    def requeue_expired(self) -> int:
+        with self._transaction() as connection:
+            cursor = connection.execute(
+                "UPDATE jobs SET state = CASE WHEN attempts >= ? THEN ? ELSE ? END, worker = NULL, lease_expires = NULL, "
+                "error = 'lease expired' WHERE state = ? AND lease_expires < ?",
+                (self.max_attempts, FAILED, QUEUED, LEASED, time.time()),
+            )
+            return cursor.rowcount
+
+    def status(self) -> dict:
+        with self._transaction() as connection:
+            counts = dict(connection.execute("SELECT state, COUNT(*) FROM jobs GROUP BY state").fetchall())
+        return {state: counts.get(state, 0) for state in (QUEUED, LEASED, DONE, FAILED)}
+
+
+class _Transaction:
+    def __init__(self, connection):
+        self.connection = connection
+
+    def __enter__(self):
+        self.connection.execute("BEGIN IMMEDIATE")
+        return self.connection
+
+    def __exit__(self, exc_type, exc, tb):
+        try:
+            self.connection.execute("ROLLBACK" if exc_type else "COMMIT")
+        finally:
+            self.connection.close()
+
+
+class LeaseLost(Exception):
+    """The job's lease expired and it was handed to another worker."""
+
+
+def submit_sweep(queue, model_params: dict, scenarios=tuple(SCENARIOS), seeds=range(10), warmup: int = 0, steps: int = 0, options: dict = None) -> list[str]:
+    """Queues one job per (scenario, seed); jobs already in the queue are not added twice. Returns the keys."""
+    keys = []
+    for seed in seeds:
+        for scenario in scenarios:
+            spec = make_spec(model_params, scenario, seed, warmup, steps, options)
+            key = spec_key(spec)
+            queue.submit(key, spec)
+            keys.append(key)
+    return keys
+
+
+def execute_spec(spec: dict, heartbeat=None, on_step=None):
+    """
+    Runs one job: warm-up, the scenario's interventions and the scenario steps under the spec's run options;
+    `heartbeat()` is called between steps and `on_step(model)` after every step. The metrics carry the spec in their attrs.
+    """
+    options = run_options(spec["options"])
+
+    def after_step(model):
+        if heartbeat is not None:
+            heartbeat()
+        if on_step is not None:
+            on_step(model)
+
+    model = GentrificationModel(**spec["model_params"], seed=spec["seed"])
+    try:
+        for _ in range(spec["warmup"]):
+            model.step()
+            after_step(model)
+        apply_scenario(model, spec["scenario"])
+        run_steps(model, spec["steps"], options, on_step=after_step)
+        df = model.datacollector.get_model_vars_dataframe()
+    finally:
+        # search workers, shared memory and the metrics thread are released even when the job fails
+        model.close()
+
+    df.attrs["run_metadata"] = model.run_metadata
+    df.attrs["model_params"] = spec["model_params"]
+    df.attrs["spec"] = spec  # what the result is of, e.g. to catalogue it (see surrogate.ingest)
+    return df
+
+
+def run_worker(queue, store: RunCache, worker: str = None, lease_seconds: float = 300, heartbeat_every: float = 30,
+               max_jobs: int = None, poll_interval: float = 5.0, idle_timeout: float = 0.0) -> int:
+    """
+    Leases jobs from the queue until it is empty (or `max_jobs` are done) and puts their results into the store.
+    While a job runs its lease is renewed every `heartbeat_every` seconds; leases of crashed workers
+    expire and are re-queued by any worker. An idle worker keeps polling for `idle_timeout` seconds.
+    Returns the number of completed jobs.
+    """
+    worker = worker or f"{socket.gethostname()}:{os.getpid()}"
+    completed = 0
+    idle_since = time.monotonic()
+    while max_jobs is None or completed < max_jobs:
+        queue.requeue_expired()
+        leased = queue.lease(worker, lease_seconds)
+        if leased is None:
+            if time.monotonic() - idle_since >= idle_timeout:
+                break
+            time.sleep(poll_interval)
+            continue
+
+        key, spec = leased
+        last_beat = time.monotonic()
+
+        def heartbeat():
+            nonlocal last_beat
+            if time.monotonic() - last_beat >= heartbeat_every:
+                last_beat = time.monotonic()
+                if not queue.heartbeat(key, worker, lease_seconds):
+                    raise LeaseLost(key)
+
+        try:
+            # a job finished elsewhere (e.g. after its lease expired) is not run twice
+            if key not in store:
+                store.put(key, execute_spec(spec, heartbeat))
+        except LeaseLost:
+            logging.warning("Worker %s lost the lease of job %s.", worker, key)
+            continue
+        except Exception:
+            logging.exception("Worker %s failed job %s.", worker, key)
+            queue.fail(key, worker, traceback.format_exc())
+            continue
+
+        if queue.complete(key, worker):
+            completed += 1
+        idle_since = time.monotonic()
+    return completed
+
+
+def collect(store: RunCache, keys) -> dict:
+    """Results of the finished jobs among `keys`, by key."""
+    results = {}
+    for key in keys:
+        df = store.get(key)
+        if df is not None:
+            results[key] = df
+    return results
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Runs queued simulation jobs; start one per core on every host sharing the queue.")
+    parser.add_argument("--queue", default=RESULTS_DIR / "queue.sqlite", help="SQLite queue file on shared storage")
+    parser.add_argument("--store", default=RESULTS_DIR / "cache", help="results store (run cache) on shared storage")
+    parser.add_argument("--lease", type=float, default=300, help="lease duration in seconds")
+    parser.add_argument("--heartbeat", type=float, default=30, help="lease renewal interval in seconds")
+    parser.add_argument("--idle-timeout", type=float, default=0, help="seconds to keep polling an empty queue")
+    arguments = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING, format="%(asctime)s %(levelname)-8s %(message)s", datefmt="%Y-%m-%d %H:%M:%S")
+    done = run_worker(SQLiteQueue(arguments.queue), RunCache(arguments.store, max_bytes=2**62), lease_seconds=arguments.lease,
+                      heartbeat_every=arguments.heartbeat, idle_timeout=arguments.idle_timeout)
+    print(f"Completed {done} jobs.")
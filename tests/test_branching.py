@@ -0,0 +1,51 @@
+import random
+
+import numpy as np
+
+from model import GentrificationModel
+from scenarios import branch_scenario
+
+PARAMS = dict(grid_size=5, num_residents=80, num_landlords=5, seed=5)
+SCENARIOS = ["no_gov", "gov", "both"]
+
+
+def _warm_model(steps=50):
+    model = GentrificationModel(**PARAMS)
+    for _ in range(steps):
+        model.step()
+    return model
+
+
+def _in_process(model, scenario, steps):
+    state = random.getstate(), np.random.get_state()
+    copy = branch_scenario(model, scenario)
+    try:
+        for _ in range(steps):
+            copy.step()
+        return copy.datacollector.get_model_vars_dataframe()
+    finally:
+        copy.close()
+        random.setstate(state[0])
+        np.random.set_state(state[1])
+
+
+def test_forked_branches_match_continuing_copies_in_process():
+    model = _warm_model()
+    expected = [_in_process(model, scenario, 60) for scenario in SCENARIOS]
+    results = model.branch(SCENARIOS, steps=60)
+    for scenario, [df], reference in zip(SCENARIOS, results, expected):
+        assert df.equals(reference), scenario
+        assert df.attrs["run_metadata"]["branch"]["intervention"] == scenario
+    model.close()
+
+
+def test_seeded_replicates_do_not_depend_on_forking(monkeypatch):
+    model = _warm_model()
+    forked = model.branch(["no_gov", "gov"], n=2, steps=40, seed=11)
+    monkeypatch.setattr("multiprocessing.get_all_start_methods", lambda: ["spawn"])
+    copied = model.branch(["no_gov", "gov"], n=2, steps=40, seed=11)
+    for forked_replicates, copied_replicates in zip(forked, copied):
+        for forked_df, copied_df in zip(forked_replicates, copied_replicates):
+            assert forked_df.equals(copied_df)
+        assert not forked_replicates[0].equals(forked_replicates[1])
+    model.close()
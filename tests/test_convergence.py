@@ -0,0 +1,68 @@
+import random
+
+import pytest
+
+from convergence import ConvergenceDetector, run_options, run_steps, run_until_stationary
+from model import GentrificationModel
+
+PARAMS = dict(grid_size=8, num_residents=200, num_landlords=10, seed=7)
+DETECTOR = dict(window=40, check_every=10, drift_tolerance=2.0, variance_ratio=10.0)
+
+
+def _feed(detector, values):
+    return [detector.update({"x": value}) for value in values]
+
+
+def test_noise_around_a_level_is_stationary():
+    rng = random.Random(1)
+    detector = ConvergenceDetector(metrics=("x",), window=200, check_every=50)
+    verdicts = _feed(detector, [rng.gauss(5, 1) for _ in range(200)])
+    assert not any(verdicts[:-1])  # nothing is tested before a full window
+    assert verdicts[-1] and detector.last_diagnostics["x"]["stationary"]
+
+
+def test_a_trend_is_not_stationary():
+    rng = random.Random(1)
+    detector = ConvergenceDetector(metrics=("x",), window=200, check_every=50)
+    _feed(detector, [0.05 * step + rng.gauss(0, 1) for step in range(400)])
+    assert not detector.stationary
+    assert detector.last_diagnostics["x"]["drift"] > detector.drift_tolerance
+
+
+def test_fixed_horizon_runs_every_step_without_watching():
+    model = run_until_stationary(GentrificationModel(**PARAMS), 80)
+    reference = GentrificationModel(**PARAMS)
+    for _ in range(80):
+        reference.step()
+    assert model.step_count == 80 and "convergence" not in model.run_metadata
+    assert model.datacollector.get_model_vars_dataframe().equals(reference.datacollector.get_model_vars_dataframe())
+    model.close()
+    reference.close()
+
+
+def test_stop_mode_ends_the_run_at_the_stationary_step():
+    model = run_until_stationary(GentrificationModel(**PARAMS), 400, ConvergenceDetector(**DETECTOR), mode="stop")
+    convergence = model.run_metadata["convergence"]
+    assert convergence["stationary_step"] == convergence["stopped_step"] == model.step_count < 400
+    assert convergence["steps_to_stationary"] % DETECTOR["check_every"] == 0
+    model.close()
+
+
+def test_sparse_mode_keeps_running_with_sparse_collection():
+    model = run_until_stationary(GentrificationModel(**PARAMS), 400, ConvergenceDetector(**DETECTOR), mode="sparse", sparse_every=50)
+    convergence = model.run_metadata["convergence"]
+    stationary = convergence["stationary_step"]
+    assert model.step_count == convergence["stopped_step"] == 400
+    steps = list(model.datacollector.get_model_vars_dataframe()["Step"])
+    assert stationary < 400
+    assert steps == list(range(1, stationary + 1)) + [step for step in range(stationary + 1, 401) if step % 50 == 0]
+    model.close()
+
+
+def test_run_options_drop_defaults_and_reject_unknown_options():
+    assert run_options({"convergence": None, "sparse_every": 50}) == {}
+    assert run_steps(GentrificationModel(**PARAMS), 5, {}).step_count == 5
+    with pytest.raises(ValueError):
+        run_options({"convergence": "sometimes"})
+    with pytest.raises(ValueError):
+        run_options({"early_stop": True})
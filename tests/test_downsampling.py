@@ -0,0 +1,50 @@
+import random
+
+import numpy as np
+import pytest
+
+from downsampling import MinMaxPyramid
+
+
+def _series(length, seed=3):
+    rng = random.Random(seed)
+    return [rng.gauss(0, 1) for _ in range(length)]
+
+
+@pytest.mark.parametrize("length", [1, 7, 1000, 12_345])
+def test_points_keep_the_extrema_within_the_budget(length):
+    values = _series(length)
+    pyramid = MinMaxPyramid()
+    pyramid.extend(values)
+    x, y = pyramid.points(budget=200)
+    assert len(x) <= 2 * 200
+    assert y.max() == max(values) and y.min() == min(values)
+    assert np.all(np.diff(x) > 0)
+    assert all(values[position] == value for position, value in zip(x, y))
+
+
+def test_incremental_extension_matches_one_pass():
+    values = _series(5000)
+    whole, pieces = MinMaxPyramid(), MinMaxPyramid()
+    whole.extend(values)
+    for start in range(0, len(values), 37):
+        pieces.extend(values[start:start + 37])
+    for budget in (10, 100, 1000, 20_000):
+        assert all(np.array_equal(a, b) for a, b in zip(whole.points(budget), pieces.points(budget)))
+
+
+def test_points_carry_the_given_x():
+    values = _series(3000)
+    steps = list(range(0, 3000 * 50, 50))  # sparse collection, every 50 steps
+    pyramid = MinMaxPyramid()
+    pyramid.extend(values, steps)
+    x, y = pyramid.points(budget=100)
+    assert set(x) <= set(steps)
+    assert all(values[step // 50] == value for step, value in zip(x, y))
+
+
+def test_nan_samples_do_not_hide_numbers():
+    pyramid = MinMaxPyramid()
+    pyramid.extend([np.nan, 1.0, np.nan, 5.0, None, -2.0, np.nan, np.nan])
+    _, y = pyramid.points(budget=2)
+    assert np.nanmax(y) == 5.0 and np.nanmin(y) == -2.0
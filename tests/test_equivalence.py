@@ -0,0 +1,19 @@
+from model import GentrificationModel
+from equivalence import compare_engines
+
+PARAMS = dict(grid_size=5, num_residents=40, num_developers=2, num_landlords=5)
+SETTINGS = dict(scenarios=("no_gov", "gov"), seeds=range(6), warmup=20, steps=60, burn_in=20)
+
+
+def test_reference_is_equivalent_to_itself_on_other_seeds():
+    report = compare_engines(lambda seed, **params: GentrificationModel(seed=seed + 1000, **params), PARAMS, **SETTINGS)
+    assert report.passed, report.format()
+
+
+def test_a_different_economy_fails():
+    def richer(seed, **params):
+        return GentrificationModel(seed=seed, residents_income=[30000, 40000, 50000], **params)
+
+    report = compare_engines(richer, PARAMS, **SETTINGS)
+    assert not report.passed
+    assert not report.metrics.loc[("no_gov", "AverageIncome"), "passed"]
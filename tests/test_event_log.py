@@ -0,0 +1,66 @@
+import logging
+
+from event_log import EventLog
+from model import GentrificationModel
+
+
+class Unformattable:
+    def __str__(self):
+        raise AssertionError("formatted an event that was not emitted")
+
+
+def _log(caplog, **params):
+    caplog.set_level(logging.INFO, logger="test.events")
+    return EventLog(logging.getLogger("test.events"), **params)
+
+
+def test_events_beyond_the_window_limit_are_counted_not_logged(caplog):
+    events = _log(caplog, max_per_window=3, window=10)
+    for step in range(10):
+        events.step = step
+        events.log("negative_capital", "Landlord %s has negative capital.", step)
+    assert len(caplog.records) == 3
+    assert events.counts["negative_capital"] == 10
+    assert events.suppressed["negative_capital"] == 7
+
+
+def test_suppressed_events_are_formatted_lazily(caplog):
+    events = _log(caplog, max_per_window=1)
+    events.log("noisy", "first")
+    events.log("noisy", "value %s", Unformattable())
+    assert [record.getMessage() for record in caplog.records] == ["first"]
+
+
+def test_a_new_window_reports_the_suppressed_count(caplog):
+    events = _log(caplog, max_per_window=1, window=10)
+    for step in (1, 2, 3, 12):
+        events.step = step
+        events.log("noisy", "step %d", step)
+    assert "Suppressed 2 'noisy' events in steps 0-9." in [record.getMessage() for record in caplog.records]
+
+
+def test_close_reports_the_last_window(caplog):
+    events = _log(caplog, max_per_window=1, window=100)
+    for step in range(5):
+        events.step = step
+        events.log("noisy", "step %d", step)
+    events.close()
+    assert caplog.records[-1].getMessage() == "Suppressed 4 'noisy' events in steps 0-4."
+
+
+def test_ring_buffer_keeps_the_last_events(caplog):
+    events = _log(caplog, buffer_size=3)
+    for step in range(5):
+        events.step = step
+        events.log("event", "step %d", step)
+    assert events.records() == [(step, "event", logging.INFO, f"step {step}") for step in (2, 3, 4)]
+
+
+def test_model_close_flushes_its_event_log(caplog):
+    model = GentrificationModel(num_residents=10, seed=1)
+    model.events.logger = logging.getLogger("test.events")
+    caplog.set_level(logging.INFO, logger="test.events")
+    for _ in range(model.events.max_per_window + 2):
+        model.events.log("noisy", "event")
+    model.close()
+    assert caplog.records[-1].getMessage().startswith("Suppressed 2 'noisy' events")
@@ -0,0 +1,53 @@
+from model import GentrificationModel
+from model_elements.apartment import Apartment
+from model_elements.cell_agent import CellAgent
+from model_elements.constants import FRESHNESS_DECAY_RATE
+
+PARAMS = dict(grid_size=5, num_residents=80, num_landlords=5, seed=4)
+
+
+def _run(steps=200):
+    model = GentrificationModel(**PARAMS)
+    try:
+        for step in range(steps):
+            if step == 100:
+                model.add_gov_developer()
+            model.step()
+        freshness = {apartment.uid: apartment.freshness for cell in model.cell_agents_layer.data.flatten() for apartment in cell.apartments}
+        return model.datacollector.get_model_vars_dataframe(), freshness
+    finally:
+        model.close()
+
+
+def _eager_freshness(monkeypatch):
+    """The per-step pass the lazy freshness replaced: the cells decay every apartment they hold each step."""
+    monkeypatch.setattr(Apartment, "freshness", property(lambda apartment: apartment._freshness,
+                                                         lambda apartment, value: setattr(apartment, "_freshness", value)))
+    cell_step = CellAgent.step
+
+    def step(cell, step):
+        for apartment in cell.apartments:
+            apartment.freshness = apartment.freshness * FRESHNESS_DECAY_RATE
+        cell_step(cell, step)
+
+    monkeypatch.setattr(CellAgent, "step", step)
+
+
+def test_lazy_freshness_matches_the_eager_decay(monkeypatch):
+    lazy_frame, lazy = _run()
+    _eager_freshness(monkeypatch)
+    eager_frame, eager = _run()
+    assert lazy == eager
+    assert lazy_frame.equals(eager_frame)
+
+
+def test_freshness_catches_up_month_by_month_on_read():
+    model = GentrificationModel(**PARAMS)
+    apartment = Apartment((0, 0), 100_000, 1000, model=model)
+    apartment.freshness = 0.9
+    model.step_count += 7
+    expected = 0.9
+    for _ in range(7):
+        expected = expected * FRESHNESS_DECAY_RATE
+    assert apartment.freshness == expected
+    model.close()
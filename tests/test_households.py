@@ -0,0 +1,81 @@
+import numpy as np
+import pytest
+
+from model import GentrificationModel
+from model_elements.landlord_agent import LandlordAgent
+from model_elements.resident_agent import ResidentAgent
+from transaction_log import MarketEvent
+
+TARGETS = [6000, 4000, 2000]
+
+
+def _model(**params):
+    return GentrificationModel(num_residents=30, num_landlords=5, households=TARGETS, seed=1, **params)
+
+
+def _residents(model):
+    return list(model.agents_by_type.get(ResidentAgent, []))
+
+
+def test_weights_add_up_to_the_target_of_every_bracket():
+    model = _model()
+    residents = _residents(model)
+    for income, target in zip(model.residents_income, TARGETS):
+        assert sum(a.weight for a in residents if a.income == income * 0.6) == target
+    assert len({a.weight for a in residents}) > 1
+    assert model.num_households == sum(TARGETS)
+    model.close()
+
+
+def test_unweighted_residents_stand_for_one_household():
+    model = GentrificationModel(num_residents=30, seed=1)
+    assert {a.weight for a in _residents(model)} == {1}
+    assert model.num_households == 30
+    model.close()
+
+
+def test_too_few_households_for_the_agents_are_rejected():
+    with pytest.raises(ValueError):
+        GentrificationModel(num_residents=30, households=[5, 100, 100])
+
+
+@pytest.mark.parametrize("search_workers", [0, 1])
+def test_homes_have_as_many_units_as_their_households(search_workers):
+    model = _model(search_workers=search_workers, gov_developer=1)
+    for _ in range(60):
+        model.step()
+    residents = _residents(model)
+    homes = [(a, a.rented_apartment or a.owned_apartment) for a in residents]
+    assert any(home is not None for _, home in homes)
+    assert all(home.units == a.weight for a, home in homes if home is not None)
+
+    # the statistics count every unit once
+    apartments = [apartment for cell in model.cell_agents_layer.data.flatten() for apartment in cell.apartments]
+    assert len(model.inequality.property_values) == sum(apartment.units for apartment in apartments)
+    assert model.datacollector.get_model_vars_dataframe()["ResidentsCount"].eq(sum(TARGETS)).all()
+    model.close()
+
+
+def test_split_units_are_listed_in_the_transaction_log():
+    model = _model(transaction_log=True, gov_developer=1)
+    for _ in range(60):
+        model.step()
+    event, apartment = model.transactions.column("event"), model.transactions.column("apartment")
+    listed = set(apartment[np.isin(event, [MarketEvent.BUILD, MarketEvent.LIST, MarketEvent.FORCED_SALE])])
+    closed = set(apartment[np.isin(event, [MarketEvent.BUY, MarketEvent.RENT])])
+    assert closed and closed <= listed
+    model.close()
+
+
+def test_landlord_portfolios_count_per_represented_landlord():
+    model = _model()
+    for _ in range(30):
+        model.step()
+    landlords = list(model.agents_by_type[LandlordAgent])
+    units = [landlord.owned_units() for landlord in landlords]
+    assert model.households_per_resident > 1
+    assert model.datacollector.get_model_vars_dataframe()["LandlordOwnedProperties"].iloc[-1] == pytest.approx(np.mean(units) / model.households_per_resident)
+    # taxed like the portfolio of one represented landlord
+    assert landlords[0].portfolio_size(round(model.households_per_resident)) == 1
+    assert landlords[0].portfolio_size(round(3 * model.households_per_resident)) == 3
+    model.close()
@@ -0,0 +1,92 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from job_service import CANCELLED, RUNNING, JobClient, JobServiceError, serve
+from run_cache import RunCache
+from work_queue import DONE, QUEUED
+
+PARAMS = {"num_residents": 20}
+LONG_RUN = 10**6
+
+
+@pytest.fixture
+def client(tmp_path):
+    """A job service with one worker on a Unix socket, served from a background thread."""
+    path = tmp_path / "jobs.sock"
+    loop = asyncio.new_event_loop()
+    task = loop.create_task(serve(path, workers=1, store=RunCache(tmp_path / "cache")))
+
+    def run():
+        try:
+            loop.run_until_complete(task)
+        except asyncio.CancelledError:
+            pass
+
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    deadline = time.monotonic() + 30
+    while not path.exists():
+        assert time.monotonic() < deadline, "the job service did not start"
+        time.sleep(0.01)
+
+    yield JobClient(path, timeout=60)
+    loop.call_soon_threadsafe(task.cancel)
+    thread.join()
+    loop.close()
+
+
+def _wait_for(client, key, states):
+    deadline = time.monotonic() + 60
+    while (status := client.status(key))["state"] not in states:
+        assert time.monotonic() < deadline, f"job stayed {status['state']}"
+        time.sleep(0.02)
+    return status
+
+
+def test_submit_and_stream(client):
+    key = client.submit(PARAMS, "no_gov", seed=1, steps=5)
+    rows = list(client.stream(key))
+    assert [row["Step"] for row in rows] == [1, 2, 3, 4, 5]
+    assert client.status(key)["state"] == DONE
+
+    # the same spec is the same job; a late subscriber gets the rows replayed
+    assert client.submit(PARAMS, "no_gov", seed=1, steps=5) == key
+    assert list(client.stream(key, since=3)) == rows[3:]
+    assert [job["key"] for job in client.status()] == [key]
+
+
+def test_cancel_and_resubmit(client):
+    running = client.submit(PARAMS, seed=2, steps=LONG_RUN)
+    queued = client.submit(PARAMS, seed=3, steps=LONG_RUN)
+    _wait_for(client, running, (RUNNING,))
+    assert client.status(queued)["state"] == QUEUED
+
+    assert client.cancel(queued)["state"] == CANCELLED
+    assert client.cancel(running)["state"] == CANCELLED
+    # a stream of a cancelled job ends without an error
+    list(client.stream(running))
+    _wait_for(client, running, (CANCELLED,))
+
+    # a cancelled job can be submitted again, and runs anew
+    assert client.submit(PARAMS, seed=2, steps=LONG_RUN) == running
+    _wait_for(client, running, (RUNNING,))
+    client.cancel(running)
+
+
+def test_invalid_requests(client):
+    with pytest.raises(JobServiceError):
+        client.status("no such job")
+    with pytest.raises(JobServiceError):
+        client._request({"op": "submit", "model_params": PARAMS, "scenario": "no such scenario"})
+    with pytest.raises(JobServiceError):
+        client._request({"op": "submit", "model_params": PARAMS, "options": {"convergance": "stop"}})
+
+
+def test_failed_job(client):
+    key = client.submit({"num_residents": 20, "residents_income": "not a list"}, seed=4, steps=5)
+    with pytest.raises(JobServiceError, match="failed"):
+        list(client.stream(key))
+    assert client.status(key)["error"]
@@ -0,0 +1,56 @@
+import tracemalloc
+
+from memory_report import MemoryMonitor, find_deleted_apartment_leaks, model_object_counts
+from model import GentrificationModel
+from model_elements.apartment import Apartment
+
+PARAMS = dict(grid_size=5, num_residents=40, num_landlords=5, seed=2)
+
+
+def _run(steps=30, **params):
+    model = GentrificationModel(**PARAMS, **params)
+    for _ in range(steps):
+        model.step()
+    return model
+
+
+def test_monitor_samples_every_interval_and_stops_its_tracing():
+    assert not tracemalloc.is_tracing()
+    model = _run(memory_interval=10)
+    samples = model.memory.samples
+    assert [sample["step"] for sample in samples] == [10, 20, 30]
+    last = samples[-1]
+    assert last["rss"] > 0 and last["traced"]["apartments"] > 0
+    assert last["model_objects"] == model_object_counts(model)
+    assert last["live_objects"]["Apartment"] >= last["model_objects"]["Apartment"]
+    assert "RSS" in model.memory.format_report(model)
+    model.close()
+    assert not tracemalloc.is_tracing()
+
+
+def test_monitor_leaves_tracing_started_by_others_running():
+    tracemalloc.start()
+    try:
+        monitor = MemoryMonitor(every=1)
+        monitor.close()
+        assert tracemalloc.is_tracing()
+    finally:
+        tracemalloc.stop()
+
+
+def test_monitoring_does_not_change_the_run():
+    monitored, plain = _run(memory_interval=10), _run()
+    assert monitored.datacollector.get_model_vars_dataframe().equals(plain.datacollector.get_model_vars_dataframe())
+    monitored.close()
+    plain.close()
+
+
+def test_deleted_apartments_kept_alive_are_reported_with_their_referrer():
+    model = _run()
+    before = find_deleted_apartment_leaks(model)["deleted_alive"]
+    kept = [Apartment((0, 0), 100_000, 1000, model=model)]
+    kept[0].deleted = True
+    leaks = find_deleted_apartment_leaks(model)
+    assert leaks["deleted_alive"] == before + 1
+    assert leaks["referrers"].get("list (e.g. owned_properties)", 0) >= 1
+    model.close()
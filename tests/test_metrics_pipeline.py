@@ -0,0 +1,69 @@
+import pytest
+
+from convergence import ConvergenceDetector, run_until_stationary
+from metrics_pipeline import capture, collected_model_vars, snapshot_reporters
+from model import GentrificationModel
+
+PARAMS = dict(grid_size=8, num_residents=200, num_landlords=10, seed=7)
+
+
+def _frame(metrics_pipeline, steps=300):
+    model = GentrificationModel(metrics_pipeline=metrics_pipeline, **PARAMS)
+    try:
+        for step in range(steps):
+            if step == 100:
+                model.add_gov_developer()
+                model.ad_valorem_tax = True
+            model.step()
+        return model.datacollector.get_model_vars_dataframe()
+    finally:
+        model.close()
+
+
+def test_pipelined_collection_matches_the_synchronous_collector():
+    synchronous = _frame(0)
+    pipelined = _frame(2)
+    assert synchronous.equals(pipelined)
+
+
+def test_snapshot_reporters_match_the_model_reporters():
+    model = GentrificationModel(gov_developer=1, ad_valorem_tax=True, **PARAMS)
+    for _ in range(50):
+        model.step()
+    reporters = model._model_reporters()
+    snapshot_reporters_ = snapshot_reporters()
+    assert list(reporters) == list(snapshot_reporters_)
+
+    snapshot = capture(model)
+    for name, reporter in reporters.items():
+        expected, value = reporter(model), snapshot_reporters_[name](snapshot)
+        assert value == pytest.approx(expected, nan_ok=True), name
+    model.close()
+
+
+def test_collected_model_vars_do_not_wait_for_the_pipeline():
+    model = GentrificationModel(metrics_pipeline=4, **PARAMS)
+    for _ in range(20):
+        model.step()
+    collected = collected_model_vars(model.datacollector)
+    assert all(len(values) <= 20 for values in collected.values())
+    assert len(model.datacollector.model_vars["HomelessnessRate"]) == 20
+    model.close()
+
+
+@pytest.mark.parametrize("metrics_pipeline", [0, 2])
+def test_convergence_stops_at_the_same_step_with_either_collector(metrics_pipeline):
+    model = GentrificationModel(metrics_pipeline=metrics_pipeline, **PARAMS)
+    detector = ConvergenceDetector(window=40, check_every=10, drift_tolerance=2.0, variance_ratio=10.0)
+    run_until_stationary(model, 300, detector=detector, mode="stop")
+    convergence = model.run_metadata["convergence"]
+    # the reference run of the synchronous collector
+    reference = GentrificationModel(**PARAMS)
+    reference_detector = ConvergenceDetector(window=40, check_every=10, drift_tolerance=2.0, variance_ratio=10.0)
+    for _ in range(convergence["stopped_step"]):
+        reference.step()
+        if reference_detector.update({name: reference.datacollector.model_vars[name][-1] for name in reference_detector.metrics}):
+            break
+    assert convergence["stationary_step"] == reference.step_count
+    model.close()
+    reference.close()
@@ -0,0 +1,62 @@
+import random
+
+import numpy as np
+import pytest
+
+from helpers import gini_coefficient
+from order_statistics import OrderStatistics
+
+
+def test_gini_matches_helpers_on_bucket_aligned_values():
+    # one bucket per integer: values in a bucket are equal, so the Gini coefficient is exact
+    rng = random.Random(1)
+    stats = OrderStatistics(0, 1000, bins=1000)
+    values = [rng.randrange(1000) + 0.5 for _ in range(500)]
+    for value in values:
+        stats.add(value)
+    assert stats.gini() == pytest.approx(gini_coefficient(values), rel=1e-6)
+
+
+def test_gini_tracks_adds_removes_and_updates():
+    rng = random.Random(2)
+    stats = OrderStatistics(0, 5_000_000)
+    values = []
+    for _ in range(2000):
+        operation = rng.random()
+        if operation < 0.5 or not values:
+            value = rng.uniform(100_000, 4_000_000)
+            stats.add(value)
+            values.append(value)
+        elif operation < 0.75:
+            stats.remove(values.pop(rng.randrange(len(values))))
+        else:
+            index = rng.randrange(len(values))
+            new = values[index] * rng.uniform(0.9, 1.1)
+            stats.update(values[index], new)
+            values[index] = new
+
+    assert len(stats) == len(values)
+    assert stats.total == pytest.approx(sum(values))
+    # values within one bucket count as equal, the error is bounded by the bucket width
+    assert stats.gini() == pytest.approx(gini_coefficient(values), abs=1e-3)
+
+
+def test_log_scale_gini_and_shares():
+    values = np.random.default_rng(3).lognormal(14, 1.5, size=1000).clip(1_000, 1e10)
+    stats = OrderStatistics(1_000, 1e10, bins=8192, scale="log")
+    for value in values:
+        stats.add(float(value))
+
+    assert stats.gini() == pytest.approx(gini_coefficient(values), abs=5e-3)
+    top = np.sort(values)[-100:].sum() / values.sum()
+    assert stats.top_share(100) == pytest.approx(top, abs=5e-3)
+    assert stats.bottom_share(900) == pytest.approx(1 - top, abs=5e-3)
+
+
+def test_empty_statistics_are_nan():
+    stats = OrderStatistics(0, 100)
+    assert np.isnan(stats.gini())
+    assert np.isnan(stats.quantile(0.5))
+    stats.add(10.0)
+    stats.remove(10.0)
+    assert np.isnan(stats.gini())
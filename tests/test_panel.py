@@ -0,0 +1,79 @@
+import pickle
+
+import numpy as np
+
+from model import GentrificationModel
+from panel import HOMELESS, OWNER, RENTER, PanelRecorder, panel_frames, tenure_events
+
+PARAMS = dict(grid_size=5, num_residents=80, num_landlords=5, seed=3)
+
+
+def _run(steps=50, **params):
+    model = GentrificationModel(**PARAMS, **params)
+    for _ in range(steps):
+        model.step()
+    return model
+
+
+def test_recording_does_not_change_the_run():
+    recorded, plain = _run(panel_interval=5), _run()
+    assert recorded.datacollector.get_model_vars_dataframe().equals(plain.datacollector.get_model_vars_dataframe())
+    assert len(recorded.panel) == 10
+
+
+def test_sample_is_stratified_by_income_and_records_the_agents():
+    model = GentrificationModel(panel_interval=10, panel_residents_per_decile=3, **PARAMS)
+    panel = model.panel
+    assert len(panel.residents) == 30
+    assert np.bincount(panel.resident_decile).tolist() == [3] * 10
+    incomes = [panel.resident_income[panel.resident_decile == decile] for decile in range(10)]
+    assert all(lower.max() <= higher.min() for lower, higher in zip(incomes, incomes[1:]))
+
+    for _ in range(10):
+        model.step()
+    arrays = panel.arrays()
+    assert arrays["steps"].tolist() == [10]
+    for row, resident in enumerate(panel.residents):
+        apartment = resident.rented_apartment or resident.owned_apartment
+        tenure = RENTER if resident.rented_apartment else OWNER if resident.owned_apartment else HOMELESS
+        assert arrays["resident_tenure"][row, 0] == tenure
+        assert arrays["resident_apartment"][row, 0] == (apartment.uid if apartment else -1)
+    for row, landlord in enumerate(panel.landlords):
+        assert arrays["landlord_properties"][row, 0] == len(landlord.owned_properties)
+
+
+def test_arrays_grow_past_the_preallocated_capacity_and_pickle_trimmed():
+    model = _run(steps=0)
+    panel = PanelRecorder(model, interval=1, residents_per_decile=2, steps=2, seed=0)
+    for _ in range(7):
+        model.step()
+        panel.step(model)
+    assert panel.arrays()["steps"].tolist() == list(range(1, 8))
+    assert len(panel.steps) > 7
+
+    restored = pickle.loads(pickle.dumps(panel))
+    assert len(restored.steps) == 7
+    for name, values in panel.arrays().items():
+        np.testing.assert_array_equal(restored.arrays()[name], values, err_msg=name)
+
+
+def test_frames_and_tenure_events():
+    arrays = {
+        "steps": np.array([10, 20, 30]),
+        "resident_ids": np.array([1, 2]),
+        "resident_income": np.array([1000.0, 2000.0]),
+        "resident_decile": np.array([0, 9], dtype=np.int8),
+        "landlord_ids": np.array([5]),
+        "resident_tenure": np.array([[RENTER, RENTER, HOMELESS], [HOMELESS, OWNER, -1]], dtype=np.int8),
+        "resident_apartment": np.array([[7, 8, -1], [-1, 9, -1]]),
+        "landlord_capital": np.array([[1.0, 2.0, 3.0]]),
+    }
+    residents, landlords = panel_frames(arrays)
+    assert len(residents) == 6 and len(landlords) == 3
+    assert residents.loc[residents.agent == 2, "income"].tolist() == [2000.0] * 3
+    assert residents.loc[residents.agent == 1, "tenure"].tolist() == [RENTER, RENTER, HOMELESS]
+
+    events = tenure_events(arrays)
+    # resident 1 moves at 20 and is displaced at 30; resident 2 buys at 20 and is not recorded at 30
+    assert events[["step", "agent", "from_tenure", "to_tenure", "displaced"]].values.tolist() == [
+        [20, 1, RENTER, RENTER, False], [30, 1, RENTER, HOMELESS, True], [20, 2, HOMELESS, OWNER, False]]
@@ -0,0 +1,36 @@
+from model import GentrificationModel
+from equivalence import compare_engines
+from model_elements.resident_agent import ResidentAgent
+
+PARAMS = dict(grid_size=6, num_residents=60, num_developers=2, num_landlords=6)
+
+
+def _run(search_workers, steps=40, **params):
+    model = GentrificationModel(seed=5, search_workers=search_workers, **params)
+    try:
+        for _ in range(steps):
+            model.step()
+        return model.datacollector.get_model_vars_dataframe(), model
+    finally:
+        model.close()
+
+
+def test_no_listing_is_let_twice():
+    _, model = _run(1, **PARAMS)
+    homes = [agent.rented_apartment or agent.owned_apartment for agent in model.agents_by_type[ResidentAgent]]
+    homes = [home.uid for home in homes if home is not None]
+    assert homes and len(homes) == len(set(homes))
+
+
+def test_scoring_in_workers_matches_scoring_in_process():
+    frame, _ = _run(1, **PARAMS)
+    pooled, _ = _run(2, **PARAMS)
+    assert frame.equals(pooled)
+
+
+def test_search_workers_match_the_serial_step_in_distribution():
+    def parallel(seed, **params):
+        return GentrificationModel(seed=seed, search_workers=1, **params)
+
+    report = compare_engines(parallel, PARAMS, scenarios=("no_gov", "gov"), seeds=range(6), warmup=20, steps=60, burn_in=20)
+    assert report.passed, report.format()
@@ -0,0 +1,40 @@
+import pytest
+
+from partitioning import PartitionedGentrificationModel, _RegionWorker, split_grid
+from model import GentrificationModel
+from model_elements.resident_agent import ResidentAgent
+
+PARAMS = dict(grid_size=6, num_residents=40, num_developers=2, num_landlords=4, seed=1)
+
+
+def test_residents_never_search_beyond_the_halo():
+    model = GentrificationModel(grid_size=3, num_residents=5)
+    _RegionWorker(model, split_grid(6, 6, 2, 2)[0], halo=3)
+    resident = next(iter(model.agents_by_type[ResidentAgent]))
+    for _ in range(5):
+        resident.find_apt_to_rent()
+    assert resident.searching_radius <= 3
+    model.close()
+
+
+def test_a_halo_narrower_than_the_search_is_rejected():
+    with pytest.raises(ValueError):
+        PartitionedGentrificationModel(regions=(2, 2), halo=1, **PARAMS)
+
+
+def test_close_survives_dead_workers():
+    model = PartitionedGentrificationModel(regions=(2, 1), **PARAMS)
+    model.step()
+    model._processes[0].kill()
+    model._processes[0].join()
+    model.close()
+    assert not model._processes
+
+
+def test_exit_does_not_mask_the_error_of_the_block():
+    with pytest.raises(KeyError):
+        with PartitionedGentrificationModel(regions=(2, 1), **PARAMS) as model:
+            model.step()
+            for process in model._processes:
+                process.kill()
+            raise KeyError("step failed")
@@ -0,0 +1,82 @@
+import random
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+from random_streams import CommonRandomNumbers
+
+DRAWS = [("skip_listing", resident, apartment) for resident in range(20) for apartment in range(10)] + \
+        [("renter_search", resident) for resident in range(20)]
+
+
+def _streams(seed=7, step=3):
+    model = SimpleNamespace(step_count=step)
+    return model, CommonRandomNumbers(model, seed)
+
+
+def test_draws_do_not_depend_on_draw_order():
+    _, first = _streams()
+    _, second = _streams()
+    expected = {draw: first.random(*draw) for draw in DRAWS}
+
+    shuffled = list(DRAWS)
+    random.Random(1).shuffle(shuffled)
+    for draw in shuffled:
+        second.random("unrelated", 99)  # draws of other decisions in between
+        assert second.random(*draw) == expected[draw]
+
+
+def test_draws_depend_on_seed_step_purpose_and_keys():
+    model, streams = _streams()
+    value = streams.random("skip_listing", 1, 2)
+    assert streams.random("skip_listing", 2, 1) != value
+    assert streams.random("skip_cell", 1, 2) != value
+    assert _streams(seed=8)[1].random("skip_listing", 1, 2) != value
+    model.step_count += 1
+    assert streams.random("skip_listing", 1, 2) != value
+    model.step_count -= 1
+    assert streams.random("skip_listing", 1, 2) == value
+
+
+def test_reseed_restarts_the_streams():
+    _, streams = _streams(seed=1)
+    value = streams.random("purpose", 5)
+    streams.reseed(2)
+    assert streams.random("purpose", 5) != value
+    streams.reseed(1)
+    assert streams.random("purpose", 5) == value
+
+
+def test_draws_are_uniform():
+    _, streams = _streams()
+    values = np.array([streams.random("uniformity", key) for key in range(20000)])
+    assert values.min() >= 0 and values.max() < 1
+    assert values.mean() == pytest.approx(0.5, abs=0.01)
+    assert np.histogram(values, bins=10, range=(0, 1))[0].min() > 1800
+    normals = np.array([streams.normal(1.0, 2.0, "normality", key) for key in range(20000)])
+    assert normals.mean() == pytest.approx(1.0, abs=0.05)
+    assert normals.std() == pytest.approx(2.0, abs=0.05)
+
+
+def test_shuffle_keeps_the_relative_order_of_shared_agents():
+    _, streams = _streams()
+    agents = [SimpleNamespace(unique_id=unique_id) for unique_id in range(50)]
+    everyone = list(agents)
+    streams.shuffle(everyone, "resident_order")
+    some = [agent for agent in agents if agent.unique_id % 3]
+    streams.shuffle(some, "resident_order")
+    assert some == [agent for agent in everyone if agent.unique_id % 3]
+
+
+def test_sample_and_choice():
+    _, streams = _streams()
+    items = list(range(30))
+    sample = streams.sample(items, 10, "purchase_cells", 4)
+    assert len(set(sample)) == 10 and set(sample) <= set(items)
+    assert streams.sample(items, 10, "purchase_cells", 4) == sample
+    assert streams.choice(items, "build_cell", 1) in items
+    with pytest.raises(ValueError):
+        streams.sample(items, 31, "purchase_cells", 4)
+    with pytest.raises(IndexError):
+        streams.choice([], "build_cell", 1)
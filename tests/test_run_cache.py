@@ -0,0 +1,78 @@
+import inspect
+import os
+import pickle
+from pathlib import Path
+
+import pytest
+
+from model import GentrificationModel
+from results_catalog import ResultsCatalog
+from run_cache import RunCache, run_key
+from work_queue import SQLiteQueue
+
+PARAMS = dict(grid_size=5, num_residents=30, num_landlords=5)
+REPOSITORY = Path(__file__).resolve().parent.parent
+
+
+def test_keys_address_every_input():
+    key = run_key(PARAMS, "gov", seed=1, warmup=10, steps=20)
+    assert key == run_key(dict(PARAMS), "gov", seed=1, warmup=10, steps=20)
+    others = [
+        run_key(dict(PARAMS, num_residents=31), "gov", seed=1, warmup=10, steps=20),
+        run_key(PARAMS, "ad_valorem", seed=1, warmup=10, steps=20),
+        run_key(PARAMS, "gov", seed=2, warmup=10, steps=20),
+        run_key(PARAMS, "gov", seed=1, warmup=11, steps=20),
+        run_key(PARAMS, "gov", seed=1, warmup=10, steps=21),
+        run_key(PARAMS, "gov", seed=1, warmup=10, steps=20, options={"convergence": "stop"}),
+        run_key(PARAMS, seed=1, warmup=10),  # the warm-up prefix
+    ]
+    assert len({key, *others}) == len(others) + 1
+    with pytest.raises(ValueError):
+        run_key(PARAMS, "gov", seed=1, options={"unknown": 1})
+
+
+def test_hits_return_the_stored_value(tmp_path):
+    cache = RunCache(tmp_path)
+    calls = []
+    key = run_key(PARAMS, "gov", seed=1, steps=5)
+    assert cache.get(key) is None and key not in cache
+    assert cache.get_or_run(key, lambda: calls.append(1) or {"rows": 5}) == {"rows": 5}
+    assert cache.get_or_run(key, lambda: calls.append(1) or {"rows": 6}) == {"rows": 5}
+    assert calls == [1] and key in cache
+
+
+def test_a_cached_warm_up_continues_like_an_uninterrupted_run(tmp_path):
+    cache = RunCache(tmp_path)
+    key = run_key(PARAMS, seed=3, warmup=20)
+    model = GentrificationModel(seed=3, **PARAMS)
+    for _ in range(20):
+        model.step()
+    cache.put(key, model)
+
+    uninterrupted = GentrificationModel(seed=3, **PARAMS)
+    for _ in range(40):
+        uninterrupted.step()
+    restored = cache.get(key)
+    for _ in range(20):
+        restored.step()
+    assert restored.datacollector.get_model_vars_dataframe().equals(uninterrupted.datacollector.get_model_vars_dataframe())
+
+
+def test_least_recently_used_entries_are_evicted_over_budget(tmp_path):
+    size = len(pickle.dumps(b"x" * 1000, protocol=pickle.HIGHEST_PROTOCOL))
+    cache = RunCache(tmp_path, max_bytes=int(2.5 * size))
+    keys = [run_key(PARAMS, seed=seed) for seed in range(3)]
+    for age, key in enumerate(keys[:2]):
+        cache.put(key, b"x" * 1000)
+        os.utime(cache._path(key), (age, age))
+    cache.get(keys[0])  # used again, so the second entry is the least recently used
+    cache.put(keys[2], b"x" * 1000)
+    assert keys[0] in cache and keys[1] not in cache and keys[2] in cache
+    assert cache.size() <= cache.max_bytes
+
+
+def test_stores_default_to_the_repository_results_whatever_the_working_directory():
+    results = REPOSITORY / "results"
+    assert inspect.signature(RunCache).parameters["root"].default == results / "cache"
+    assert inspect.signature(ResultsCatalog).parameters["root"].default == results / "catalog"
+    assert inspect.signature(SQLiteQueue).parameters["path"].default == results / "queue.sqlite"
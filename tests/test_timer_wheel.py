@@ -0,0 +1,47 @@
+from model import GentrificationModel
+from model_elements.resident_agent import ResidentAgent
+from timer_wheel import TimerWheel
+
+# common random numbers order the shuffled residents by id, so a full pass steps them in the same relative order
+PARAMS = dict(grid_size=5, num_residents=80, num_landlords=5, seed=4, common_random_numbers=True)
+
+
+def _frame(steps=200):
+    model = GentrificationModel(**PARAMS)
+    try:
+        for step in range(steps):
+            if step == 100:
+                model.add_gov_developer()
+                model.ad_valorem_tax = True
+            model.step()
+        return model.datacollector.get_model_vars_dataframe()
+    finally:
+        model.close()
+
+
+def test_sleeping_residents_give_the_same_run_as_stepping_all_of_them(monkeypatch):
+    wheel = _frame()
+    monkeypatch.setattr(ResidentAgent, "schedule_wakeup", lambda self, step: None)
+    every_step = _frame()
+    assert wheel.equals(every_step)
+
+
+class _Agent:
+    wake_step = None
+
+
+def test_agents_wake_at_their_step_or_when_woken():
+    wheel = TimerWheel(slots=4)
+    early, late, woken = _Agent(), _Agent(), _Agent()
+    for agent in (early, late, woken):
+        wheel.add(agent)
+    wheel.sleep(early, 2)
+    wheel.sleep(late, 9)  # further away than the wheel size
+    wheel.sleep(woken, 3)
+    assert wheel.due(1) == []
+    assert wheel.due(2) == [early]
+    wheel.wake(woken)
+    assert wheel.due(3) == [early, woken]
+    assert wheel.due(5) == [early, woken]
+    assert wheel.due(9) == [early, woken, late]
+    assert late.wake_step is None
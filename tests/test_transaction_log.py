@@ -0,0 +1,69 @@
+from types import SimpleNamespace
+
+import pandas as pd
+import pytest
+
+from model import GentrificationModel
+from model_elements.resident_agent import ResidentAgent
+from transaction_log import MarketEvent, TransactionLog
+
+RENTAL = SimpleNamespace(uid=1, position=(0, 0))
+HOUSE = SimpleNamespace(uid=2, position=(1, 1))
+TENANT, LANDLORD, BUYER, DEVELOPER = (SimpleNamespace(unique_id=i) for i in (10, 20, 11, 30))
+
+
+def _log():
+    log = TransactionLog()
+    log.record(1, MarketEvent.BUILD, HOUSE, DEVELOPER, amount=300_000)
+    log.record(2, MarketEvent.LIST, RENTAL, LANDLORD, amount=100)
+    log.record(4, MarketEvent.BUY, HOUSE, BUYER, DEVELOPER, 300_000)
+    log.record(5, MarketEvent.RENT, RENTAL, TENANT, LANDLORD, 100)
+    log.record(8, MarketEvent.RENT_CHANGE, RENTAL, LANDLORD, amount=120)
+    log.record(10, MarketEvent.VACATE, RENTAL, TENANT, LANDLORD, 120)
+    log.record(12, MarketEvent.LIST, RENTAL, LANDLORD, amount=110)
+    log.record(15, MarketEvent.RENT, RENTAL, TENANT, LANDLORD, 110)
+    return log
+
+
+def test_tenancies_replay_rent_changes_and_open_leases():
+    tenancies = _log().tenancies(end_step=20)
+    assert tenancies.to_dict("records") == [
+        {"apartment": 1, "tenant": 10, "landlord": 20, "start": 5, "end": 10, "rent_paid": 100 * 3 + 120 * 2},
+        {"apartment": 1, "tenant": 10, "landlord": 20, "start": 15, "end": 20, "rent_paid": 110 * 5},
+    ]
+
+
+def test_time_on_market_pairs_listings_with_the_deal_that_closed_them():
+    durations = _log().time_on_market()
+    assert durations.to_dict("records") == [
+        {"market": "sale", "apartment": 2, "listed": 1, "time_on_market": 3},
+        {"market": "rent", "apartment": 1, "listed": 2, "time_on_market": 3},
+        {"market": "rent", "apartment": 1, "listed": 12, "time_on_market": 3},
+    ]
+
+
+def test_saved_logs_replay_the_same(tmp_path):
+    log = _log()
+    log.save(tmp_path / "log.npz")
+    loaded = TransactionLog.load(tmp_path / "log.npz")
+    pd.testing.assert_frame_equal(loaded.to_frame(), log.to_frame())
+    pd.testing.assert_frame_equal(loaded.tenancies(), log.tenancies())
+
+
+def test_replayed_leases_match_the_model():
+    model = GentrificationModel(grid_size=6, num_residents=80, num_landlords=8, seed=2, transaction_log=True)
+    for _ in range(120):
+        model.step()
+    end = model.step_count + 1
+    tenancies = model.transactions.tenancies(end_step=end)
+    open_leases = set(map(tuple, tenancies.loc[tenancies["end"] == end, ["apartment", "tenant"]].to_numpy()))
+    renters = {(resident.rented_apartment.uid, resident.unique_id)
+               for resident in model.agents_by_type[ResidentAgent] if resident.rented_apartment}
+    assert renters and open_leases == renters
+    assert (model.transactions.time_on_market()["time_on_market"] >= 0).all()
+
+    with pytest.raises(ValueError):
+        model.transactions.rent_by_income_decile()  # needs the agent table
+    model.transactions.register_agents(model)
+    assert len(model.transactions.rent_by_income_decile()) == 10
+    model.close()
@@ -0,0 +1,120 @@
+import time
+
+import pytest
+
+from run_cache import RunCache
+from work_queue import DONE, FAILED, LEASED, QUEUED, MemoryQueue, SQLiteQueue, make_spec, run_worker, spec_key
+
+
+@pytest.fixture(params=["sqlite", "memory"])
+def queues(request, tmp_path):
+    """Two handles on one queue, as two workers see it: two SQLite connections, or the same in-process queue."""
+    if request.param == "sqlite":
+        path = tmp_path / "queue.sqlite"
+        return SQLiteQueue(path, max_attempts=2), SQLiteQueue(path, max_attempts=2)
+    queue = MemoryQueue(max_attempts=2)
+    return queue, queue
+
+
+def _submit(queue, seed=0, steps=3):
+    spec = make_spec({"num_residents": 20}, "no_gov", seed, 0, steps)
+    key = spec_key(spec)
+    return key, spec, queue.submit(key, spec)
+
+
+def test_submit_is_idempotent(queues):
+    first, second = queues
+    submitted = _submit(first)[2]
+    assert submitted
+    assert not _submit(second)[2]
+    assert second.status()[QUEUED] == 1
+
+
+def test_a_leased_job_is_not_leased_again(queues):
+    first, second = queues
+    key, spec, _ = _submit(first)
+    assert first.lease("a", 60) == (key, spec)
+    assert second.lease("b", 60) is None
+    assert second.status()[LEASED] == 1
+    # only the holder of the lease renews or completes it
+    assert not second.heartbeat(key, "b", 60)
+    assert not second.complete(key, "b")
+    assert first.heartbeat(key, "a", 60)
+    assert first.complete(key, "a")
+    assert second.status()[DONE] == 1
+
+
+def test_expired_leases_are_requeued_until_max_attempts(queues):
+    first, second = queues
+    key, _, _ = _submit(first)
+    assert first.lease("a", 0.01)[0] == key
+    time.sleep(0.05)
+    assert second.requeue_expired() == 1
+    assert second.status()[QUEUED] == 1
+
+    # the crashed worker lost the job to the next one
+    assert second.lease("b", 0.01)[0] == key
+    assert not first.heartbeat(key, "a", 60)
+    assert not first.complete(key, "a")
+
+    time.sleep(0.05)
+    assert first.requeue_expired() == 1
+    assert first.status()[FAILED] == 1  # second attempt of max_attempts=2
+    assert second.lease("c", 60) is None
+
+
+def test_failed_jobs_are_retried_until_max_attempts(queues):
+    first, second = queues
+    key, _, _ = _submit(first)
+    first.lease("a", 60)
+    first.fail(key, "a", "boom")
+    assert second.status()[QUEUED] == 1
+    assert second.lease("b", 60)[0] == key
+    second.fail(key, "b", "boom")
+    assert first.status()[FAILED] == 1
+
+
+def test_run_worker_stores_results(queues, tmp_path):
+    first, second = queues
+    store = RunCache(tmp_path / "cache")
+    keys = [_submit(first, seed)[0] for seed in range(2)]
+    assert run_worker(second, store, worker="w", max_jobs=5) == 2
+    assert first.status()[DONE] == 2
+    assert all(len(store.get(key)) == 3 for key in keys)
+
+
+def test_unknown_run_options_are_rejected():
+    with pytest.raises(ValueError):
+        make_spec({"num_residents": 20}, options={"convergance": "stop"})
+
+
+def test_collected_results_are_catalogued_with_their_parameters(queues, tmp_path):
+    from results_catalog import ResultsCatalog
+    from surrogate import ingest
+
+    queue = queues[0]
+    store = RunCache(tmp_path / "cache")
+    catalog = ResultsCatalog(tmp_path / "catalog")
+    keys = [_submit(queue, seed=seed)[0] for seed in range(2)]
+    run_worker(queue, store, max_jobs=len(keys))
+
+    assert ingest(catalog, store, keys) == 2
+    assert ingest(catalog, store, keys) == 0
+    runs = catalog.runs(scenario="no_gov")
+    assert sorted(runs["seed"]) == [0, 1]
+    assert (runs["num_residents"] == 20).all()
+
+
+def test_execute_spec_releases_the_model_when_the_job_fails(monkeypatch):
+    import model as model_module
+    from work_queue import execute_spec
+
+    closed = []
+    monkeypatch.setattr(model_module.GentrificationModel, "close", lambda self: closed.append(self))
+
+    def fail(model):
+        raise RuntimeError("job failed")
+
+    with pytest.raises(RuntimeError):
+        execute_spec(make_spec({"num_residents": 20}, "no_gov", 0, 2, 2), on_step=fail)
+    assert len(closed) == 1